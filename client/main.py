@@ -2,7 +2,11 @@ import streamlit as st
 from dotenv import load_dotenv
 import requests
 import os
+import json
+import uuid
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ConnectionError, Timeout, RequestException
+from urllib3.util.retry import Retry
 
 
 load_dotenv()
@@ -66,6 +70,8 @@ st.markdown("""
 
 API_URL = os.getenv("API_URL") or "http://127.0.0.1:8000"
 REQUEST_TIMEOUT = 10
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+UPLOAD_CHUNK_BYTES = 256 * 1024
 
 if not os.getenv("API_URL"):
     st.warning("⚠️ API_URL not configured. Using localhost.")
@@ -77,9 +83,29 @@ if "access_token" not in st.session_state:
     st.session_state.username = ""
     st.session_state.role = ""
     st.session_state.logged_in = False
+    st.session_state.chat_session_id = None
 
 
 # Helper functions
+def http():
+    """This browser session's pooled keep-alive session, so reruns reuse open connections.
+
+    Kept in st.session_state rather than shared through st.cache_resource:
+    requests.Session is not thread-safe, and Streamlit runs each browser
+    session's script on its own thread. Connection failures are retried with
+    backoff for any method; 502/503/504 responses only for idempotent ones,
+    so a chat or upload is never sent twice.
+    """
+    if "http_session" not in st.session_state:
+        session = requests.Session()
+        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, max_retries=retries)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        st.session_state.http_session = session
+    return st.session_state.http_session
+
+
 def make_auth_header():
     """Create authorization header with JWT token"""
     if st.session_state.access_token:
@@ -131,7 +157,7 @@ def auth_ui():
                 else:
                     try:
                         with st.spinner("🔍 Authenticating..."):
-                            res = requests.post(
+                            res = http().post(
                                 f"{API_URL}/login",
                                 params={"username": username, "password": password},
                                 timeout=REQUEST_TIMEOUT
@@ -179,7 +205,7 @@ def auth_ui():
                     try:
                         with st.spinner("📝 Creating account..."):
                             payload = {"username": new_user, "password": new_pass, "role": new_role}
-                            res = requests.post(
+                            res = http().post(
                                 f"{API_URL}/signup",
                                 json=payload,
                                 timeout=REQUEST_TIMEOUT
@@ -200,6 +226,33 @@ def auth_ui():
                         st.error(f"❌ Unexpected error: {str(e)[:150]}")
 
 
+def multipart_stream(fields, file_field, file, content_type, on_progress):
+    """Yield a multipart/form-data body piece by piece, reading the file UPLOAD_CHUNK_BYTES at a time.
+
+    Returns (boundary, generator); requests sends a generator body with chunked
+    transfer encoding, so the file is never held in memory as one request.
+    """
+    boundary = uuid.uuid4().hex
+    filename = file.name.replace('"', "%22")
+
+    def parts():
+        for name, value in fields.items():
+            yield (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n').encode()
+        yield (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        file.seek(0)
+        sent = 0
+        while chunk := file.read(UPLOAD_CHUNK_BYTES):
+            sent += len(chunk)
+            on_progress(sent)
+            yield chunk
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    return boundary, parts()
+
+
 # Upload Documents (Admin only)
 def upload_docs():
     with st.expander("📤 Upload Documents", expanded=False):
@@ -220,21 +273,27 @@ def upload_docs():
                 st.warning("⚠️ Please select a PDF file")
             else:
                 try:
-                    with st.spinner("📤 Uploading document..."):
-                        files = {"file": (uploaded_file.name, uploaded_file.getvalue(), "application/pdf")}
-                        data = {"role": role_for_doc}
-                        res = requests.post(
-                            f"{API_URL}/upload_docs",
-                            files=files,
-                            data=data,
-                            headers=make_auth_header(),
-                            timeout=REQUEST_TIMEOUT
-                        )
+                    total = uploaded_file.size or 1
+                    progress = st.progress(0.0, text=f"📤 Uploading {uploaded_file.name}...")
+                    boundary, body = multipart_stream(
+                        {"role": role_for_doc}, "file", uploaded_file, "application/pdf",
+                        lambda sent: progress.progress(min(sent / total, 1.0), text=f"📤 {sent // 1024} / {total // 1024} KB")
+                    )
+                    res = http().post(
+                        f"{API_URL}/upload_docs",
+                        data=body,
+                        headers={**make_auth_header(), "Content-Type": f"multipart/form-data; boundary={boundary}"},
+                        timeout=REQUEST_TIMEOUT
+                    )
+                    progress.empty()
                     
-                    if res.status_code == 200:
+                    if res.status_code in (200, 202):
                         doc_info = res.json()
-                        st.success(f"✅ Uploaded: {uploaded_file.name}")
-                        st.info(f"📄 Doc ID: {doc_info['doc_id']}\n📊 Access: {doc_info['accessible_to']}")
+                        st.success(f"✅ Uploaded: {uploaded_file.name} (ingesting in background)")
+                        st.info(
+                            f"📄 Doc ID: {doc_info['doc_id']}\n📊 Access: {doc_info['accessible_to']}"
+                            f"\n🧾 Job ID: {doc_info.get('job_id', '-')}"
+                        )
                     elif res.status_code == 401:
                         st.error("❌ Session expired. Please login again.")
                     elif res.status_code == 403:
@@ -250,6 +309,46 @@ def upload_docs():
                     st.error(f"❌ Unexpected error: {str(e)[:150]}")
 
 
+def chat_session_id(new=False):
+    """Server-side conversation used for follow-up questions; started on first use"""
+    if new or not st.session_state.get("chat_session_id"):
+        res = http().post(f"{API_URL}/chat/sessions", headers=make_auth_header(), timeout=REQUEST_TIMEOUT)
+        st.session_state.chat_session_id = res.json()["session_id"] if res.status_code == 200 else None
+    return st.session_state.chat_session_id
+
+
+def post_chat(message):
+    """Stream an answer within the conversation, starting a new one if the server has expired it"""
+    for new_session in (False, True):
+        res = http().post(
+            f"{API_URL}/chat/stream",
+            data={"message": message, "session_id": chat_session_id(new=new_session)},
+            headers=make_auth_header(),
+            timeout=REQUEST_TIMEOUT,
+            stream=True
+        )
+        if res.status_code != 404:
+            break
+        res.close()
+    return res
+
+
+def iter_sse_events(response):
+    """Yield (event, data) pairs from a Server-Sent Events response"""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+
 # Chat Interface
 def chat_interface():
     st.markdown("### 💬 Ask a Question")
@@ -268,32 +367,40 @@ def chat_interface():
         else:
             try:
                 with st.spinner("🔍 Processing your question..."):
-                    res = requests.post(
-                        f"{API_URL}/chat",
-                        data={"message": message},
-                        headers=make_auth_header(),
-                        timeout=REQUEST_TIMEOUT
-                    )
+                    res = post_chat(message)
                 
-                if res.status_code == 200:
-                    reply = res.json()
-                    st.markdown('<div class="chat-response">', unsafe_allow_html=True)
-                    st.markdown("### 💡 Answer")
-                    st.markdown(reply["answer"])
-                    
-                    if reply.get("sources"):
-                        st.markdown("**📚 Sources:**")
-                        for src in reply["sources"]:
-                            st.markdown(f"- {src}")
-                    st.markdown('</div>', unsafe_allow_html=True)
-                
-                elif res.status_code == 401:
-                    st.error("❌ Session expired. Please login again.")
-                elif res.status_code == 403:
-                    st.error("❌ You don't have access to this query.")
-                else:
-                    detail = handle_api_error(res, "Chat")
-                    st.error(f"❌ {detail}")
+                # Closing hands the keep-alive connection back to the pool even if the stream is cut short
+                with res:
+                    if res.status_code == 200:
+                        st.markdown('<div class="chat-response">', unsafe_allow_html=True)
+                        st.markdown("### 💡 Answer")
+                        answer_placeholder = st.empty()
+                        sources_placeholder = st.empty()
+                        answer, sources = "", []
+
+                        for event, data in iter_sse_events(res):
+                            if event == "sources":
+                                sources = data
+                            elif event == "token":
+                                answer += data
+                                answer_placeholder.markdown(answer + "▌")
+                            elif event == "error":
+                                st.error(f"❌ {data}")
+                        answer_placeholder.markdown(answer)
+
+                        if sources:
+                            sources_placeholder.markdown(
+                                "**📚 Sources:**\n" + "\n".join(f"- {src}" for src in sources)
+                            )
+                        st.markdown('</div>', unsafe_allow_html=True)
+
+                    elif res.status_code == 401:
+                        st.error("❌ Session expired. Please login again.")
+                    elif res.status_code == 403:
+                        st.error("❌ You don't have access to this query.")
+                    else:
+                        detail = handle_api_error(res, "Chat")
+                        st.error(f"❌ {detail}")
             
             except (ConnectionError, Timeout, RequestException) as e:
                 error_msg = handle_connection_error(e, "Chat")
@@ -330,8 +437,12 @@ else:
                 st.session_state.username = ""
                 st.session_state.role = ""
                 st.session_state.logged_in = False
+                st.session_state.chat_session_id = None
                 st.success("✅ Logged out successfully")
                 st.rerun()
+
+        if st.button("🆕 New conversation", use_container_width=True):
+            st.session_state.chat_session_id = None
     
     # Main content
     st.markdown("---")
@@ -1,8 +1,48 @@
+import os
+import asyncio
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+
+# bcrypt releases the GIL, so a small dedicated pool keeps hashing off FastAPI's
+# default threadpool and the event loop without starving other requests.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+# Hash/verify calls allowed to wait or run at once before new ones are rejected
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "32"))
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_pending = 0
+
+
+class HashingBusy(Exception):
+    """The hashing pool is saturated; the caller should answer 429"""
+
 
 def hash_password(password:str)->str:
     return bcrypt.hashpw(password.encode('utf-8'),bcrypt.gensalt()).decode('utf=8')
 
 
 def verify_password(password:str,hashed:str)->bool:
-    return bcrypt.checkpw(password.encode('utf-8'),hashed.encode('utf-8'))
\ No newline at end of file
+    return bcrypt.checkpw(password.encode('utf-8'),hashed.encode('utf-8'))
+
+
+async def _run_bounded(func, *args):
+    global _pending
+    if _pending >= HASH_MAX_PENDING:
+        raise HashingBusy()
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password_async(password:str)->str:
+    return await _run_bounded(hash_password,password)
+
+
+async def verify_password_async(password:str,hashed:str)->bool:
+    return await _run_bounded(verify_password,password,hashed)
+
+
+def hashing_stats()->dict:
+    return {"workers":HASH_WORKERS,"pending":_pending,"max_pending":HASH_MAX_PENDING}
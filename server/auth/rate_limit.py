@@ -0,0 +1,57 @@
+import os
+import time
+from collections import OrderedDict, deque
+
+
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "5"))
+LOGIN_FAILURE_WINDOW_SECONDS = float(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", "300"))
+LOGIN_TRACKED_USERS = 10000
+
+
+class FailedLoginLimiter:
+    """Per-username sliding window of failed logins.
+
+    Once a username has `max_failures` failures inside the window, further
+    attempts are refused until the oldest failure ages out, before any bcrypt
+    work is done. Only the most recently failing usernames are tracked.
+    """
+
+    def __init__(self, max_failures: int = LOGIN_MAX_FAILURES, window_seconds: float = LOGIN_FAILURE_WINDOW_SECONDS,
+                 max_tracked: int = LOGIN_TRACKED_USERS):
+        self.max_failures = max_failures
+        self.window_seconds = window_seconds
+        self.max_tracked = max_tracked
+        self._failures = OrderedDict()
+
+    def _recent(self, username: str, now: float) -> deque:
+        failures = self._failures.get(username)
+        if failures is None:
+            return deque()
+        while failures and now - failures[0] > self.window_seconds:
+            failures.popleft()
+        if not failures:
+            del self._failures[username]
+        return failures
+
+    def retry_after(self, username: str) -> float:
+        """Seconds until the username may try again; 0 when not locked out"""
+        now = time.monotonic()
+        failures = self._recent(username, now)
+        if len(failures) < self.max_failures:
+            return 0.0
+        return self.window_seconds - (now - failures[0])
+
+    def record_failure(self, username: str):
+        now = time.monotonic()
+        failures = self._recent(username, now)
+        failures.append(now)
+        self._failures[username] = failures
+        self._failures.move_to_end(username)
+        while len(self._failures) > self.max_tracked:
+            self._failures.popitem(last=False)
+
+    def reset(self, username: str):
+        self._failures.pop(username, None)
+
+
+login_limiter = FailedLoginLimiter()
@@ -1,14 +1,19 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from fastapi.requests import Request
 from .models import SignupRequest
-from .hash_utils import hash_password, verify_password
+from .hash_utils import hash_password_async, verify_password_async, HashingBusy
+from .rate_limit import login_limiter
 from .jwt_utils import create_access_token, verify_token
-from config.db import users_collection
+from .user_cache import claims_cache, user_cache, invalidate_user, new_token_version, token_is_current
+from config.db import get_db
+from pymongo.errors import DuplicateKeyError
+import math
+import time
 
 router = APIRouter()
 
 
-def get_current_user(request: Request):
+async def get_current_user(request: Request):
     """Dependency to extract and verify JWT token from Authorization header"""
     auth_header = request.headers.get("Authorization")
     
@@ -22,7 +27,11 @@ def get_current_user(request: Request):
     except ValueError:
         raise HTTPException(status_code=401, detail="Invalid authorization header format")
     
-    payload = verify_token(token)
+    payload = claims_cache.get(token)
+    if payload is None:
+        payload = verify_token(token)
+        if payload:
+            claims_cache.set(token, payload, ttl_seconds=payload["exp"] - time.time())
     
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
@@ -31,37 +40,73 @@ def get_current_user(request: Request):
     if not username:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user = users_collection.find_one({"username": username})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+    # Hot path: the user (and their token version) is cached, so MongoDB is only read on a miss
+    user = user_cache.get(username)
+    if user is None:
+        record = await get_db().users.find_one({"username": username})
+        if not record:
+            raise HTTPException(status_code=401, detail="User not found")
+        user = {"username": record["username"], "role": record["role"], "token_version": record.get("token_version")}
+        user_cache.set(username, user)
+    
+    # Role changes and deletions bump the stored version, revoking tokens issued before them
+    if not token_is_current(payload, user):
+        raise HTTPException(status_code=401, detail="Token revoked, please log in again")
     
     return {"username": user["username"], "role": user["role"]}
 
 
 @router.post("/signup")
-def signup(req: SignupRequest):
+async def signup(req: SignupRequest):
     """Register a new user"""
-    if users_collection.find_one({"username": req.username}):
+    users = get_db().users
+    if await users.find_one({"username": req.username}):
         raise HTTPException(status_code=400, detail="User already exists")
     
-    users_collection.insert_one({
-        "username": req.username,
-        "password": hash_password(req.password),
-        "role": req.role
-    })
+    try:
+        hashed = await hash_password_async(req.password)
+    except HashingBusy:
+        raise HTTPException(status_code=429, detail="Server busy, please retry", headers={"Retry-After": "1"})
+    
+    try:
+        await users.insert_one({
+            "username": req.username,
+            "password": hashed,
+            "role": req.role,
+            "token_version": new_token_version()
+        })
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="User already exists")
+    # A fresh token version also keeps tokens of a deleted account with the same name out
+    invalidate_user(req.username)
     return {"message": "User created successfully", "username": req.username}
 
 
 @router.post("/login")
-def login(username: str = Query(...), password: str = Query(...)):
+async def login(username: str = Query(...), password: str = Query(...)):
     """Login and get JWT token"""
-    user = users_collection.find_one({"username": username})
+    retry_after = login_limiter.retry_after(username)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many failed login attempts, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    
+    user = await get_db().users.find_one({"username": username})
+    
+    try:
+        valid = bool(user) and await verify_password_async(password, user["password"])
+    except HashingBusy:
+        raise HTTPException(status_code=429, detail="Server busy, please retry", headers={"Retry-After": "1"})
     
-    if not user or not verify_password(password, user["password"]):
+    if not valid:
+        login_limiter.record_failure(username)
         raise HTTPException(status_code=401, detail="Invalid username or password")
+    login_limiter.reset(username)
     
-    # Create JWT token
-    access_token = create_access_token(data={"sub": username})
+    # The role is read from the user record on each request, so only the name and token version are signed
+    access_token = create_access_token(data={"sub": username, "ver": user.get("token_version")})
     
     return {
         "access_token": access_token,
@@ -72,8 +117,33 @@ def login(username: str = Query(...), password: str = Query(...)):
 
 
 @router.get("/me")
-def get_current_user_info(user=Depends(get_current_user)):
+async def get_current_user_info(user=Depends(get_current_user)):
     """Get current authenticated user info"""
     return user
 
-    
\ No newline at end of file
+
+async def require_admin(user=Depends(get_current_user)):
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+
+@router.patch("/users/{username}/role")
+async def change_user_role(username: str, role: str = Query(...), admin=Depends(require_admin)):
+    """Change a user's role; their existing tokens are revoked"""
+    result = await get_db().users.update_one(
+        {"username": username}, {"$set": {"role": role, "token_version": new_token_version()}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(username)
+    return {"username": username, "role": role}
+
+
+@router.delete("/users/{username}")
+async def delete_user(username: str, admin=Depends(require_admin)):
+    result = await get_db().users.delete_one({"username": username})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(username)
+    return {"message": f"User {username} deleted"}
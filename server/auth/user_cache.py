@@ -0,0 +1,91 @@
+import os
+import time
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+# invalidate_user only clears this process's cache, so with several workers a revoked token or
+# changed role is still honoured elsewhere for up to this long; a miss costs one indexed user read
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a per-entry TTL"""
+
+    def __init__(self, ttl_seconds: float = AUTH_CACHE_TTL_SECONDS, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+# token -> verified JWT payload
+claims_cache = TTLCache()
+# username -> {"username", "role", "token_version"} as stored in the database
+user_cache = TTLCache()
+
+
+def new_token_version() -> str:
+    """Stored on the user and signed into each token; changing it revokes every token issued before"""
+    return secrets.token_hex(8)
+
+
+def invalidate_user(username: str):
+    """Forget cached data for a user after their role changed or they were deleted.
+
+    Other workers notice once their cached entry expires (AUTH_CACHE_TTL_SECONDS),
+    since the token version is re-read from the database on a cache miss.
+    """
+    user_cache.pop(username)
+
+
+def token_is_current(payload: dict, user: dict) -> bool:
+    """Whether a token was issued for the user's current account and role"""
+    return payload.get("ver") == user.get("token_version")
+
+
+def auth_cache_stats() -> dict:
+    return {"claims": claims_cache.stats(), "users": user_cache.stats()}
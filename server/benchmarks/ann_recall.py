@@ -0,0 +1,119 @@
+"""Measure recall@k and latency of the IVF local index against exact search.
+
+Run from the server directory:
+
+    python -m benchmarks.ann_recall --chunks 50000 --dimension 768 --output ann.json
+
+Both indexes are built from the same synthetic chunks (offline hash
+embedder, no network access). For each fixed nprobe and each probe
+fraction (share of a role's lists scanned) the report gives recall@k of
+the IVF results against the exact float32 scan for the same role filter,
+the mean share of the role's rows a query scores, and per-query latency.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+import numpy as np
+from benchmarks.compact_index import make_chunks
+from config.fake_providers import HashEmbeddings
+from vectordb.local_store import LocalVectorStore
+from vectordb.ivf_store import IVFVectorStore
+
+
+def build(store_class, path: Path, dimension: int, records) -> tuple:
+    started = time.perf_counter()
+    store = store_class(str(path), dimension)
+    # Batches of the size load_vectorstore upserts, so the IVF index trains and grows incrementally
+    for offset in range(0, len(records), 1000):
+        store.upsert(records[offset:offset + 1000])
+    build_seconds = time.perf_counter() - started
+    del store
+    started = time.perf_counter()
+    store = store_class(str(path), dimension)
+    return store, build_seconds, time.perf_counter() - started
+
+
+def timed_queries(store, query_vectors, top_k: int, role_filter: dict) -> tuple:
+    started = time.perf_counter()
+    results = [[match["id"] for match in store.query(vector, top_k, role_filter)] for vector in query_vectors]
+    return results, (time.perf_counter() - started) / len(query_vectors) * 1000
+
+
+def run(args) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix="ann-bench-"))
+    try:
+        texts = make_chunks(workdir, args.chunks)
+        embedder = HashEmbeddings(args.dimension)
+        vectors = np.asarray(embedder.embed_documents(texts), dtype=np.float32)
+        records = [
+            (f"chunk-{i}", vectors[i], {"text": text, "source": "synthetic.pdf", "doc_id": "bench",
+                                       "role": "doctor" if i % 2 else "nurse", "page": i // 10})
+            for i, text in enumerate(texts)
+        ]
+        rng = np.random.default_rng(0)
+        queries = [" ".join(texts[i].split()[:12]) for i in rng.choice(len(texts), args.queries, replace=False)]
+        query_vectors = np.asarray(embedder.embed_documents(queries), dtype=np.float32)
+        role_filter = {"role": {"$eq": "doctor"}}
+
+        exact, exact_build, exact_load = build(LocalVectorStore, workdir / "exact", args.dimension, records)
+        truth, exact_ms = timed_queries(exact, query_vectors, args.top_k, role_filter)
+        del exact
+        ivf, ivf_build, ivf_load = build(IVFVectorStore, workdir / "ivf", args.dimension, records)
+        role_rows = len(ivf._field_rows["role"]["doctor"])
+
+        report = {
+            "chunks": len(texts), "dimension": args.dimension, "top_k": args.top_k, "queries": args.queries,
+            "role_rows": role_rows, "partitions": ivf.index_stats(),
+            "exact": {"build_seconds": round(exact_build, 3), "load_seconds": round(exact_load, 3),
+                      "query_ms": round(exact_ms, 3)},
+            "ivf": {"build_seconds": round(ivf_build, 3), "load_seconds": round(ivf_load, 3), "nprobe": []},
+        }
+        # Fixed list counts first, then shares of each role's lists (the default IVF_PROBE_FRACTION setting)
+        settings = [(nprobe, None) for nprobe in args.nprobe or []] + [(0, fraction) for fraction in args.probe_fraction]
+        for nprobe, fraction in settings:
+            ivf.nprobe = nprobe
+            if fraction is not None:
+                ivf.probe_fraction = fraction
+            found, ivf_ms = timed_queries(ivf, query_vectors, args.top_k, role_filter)
+            recall = [len(set(a) & set(b)) / len(a) for a, b in zip(truth, found) if a]
+            scanned = np.mean([len(ivf._probe_rows("doctor", vector)) for vector in ivf._normalize(query_vectors)])
+            report["ivf"]["nprobe"].append({
+                "nprobe": ivf.probes_for(len(ivf._centroids["doctor"])),
+                "probe_fraction": fraction,
+                "recall_at_k": round(float(np.mean(recall)), 4),
+                "scanned_fraction": round(float(scanned) / role_rows, 4),
+                "query_ms": round(ivf_ms, 3),
+                "speedup": round(exact_ms / ivf_ms, 2),
+            })
+        return report
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=int(os.getenv("PINECONE_DIMENSION", "768")))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="*", default=[8, 16, 32, 64], help="fixed IVF_NPROBE values")
+    parser.add_argument("--probe-fraction", type=float, nargs="*", default=[0.2, 0.3, 0.4, 0.5],
+                        help="IVF_PROBE_FRACTION values")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    text = json.dumps(run(args), indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
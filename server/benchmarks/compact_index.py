@@ -0,0 +1,138 @@
+"""Compare the float32 local index with the compact int8 one: memory, disk and I/O per chunk, recall@k and latency.
+
+Run from the server directory:
+
+    python -m benchmarks.compact_index --chunks 20000 --dimension 768 --output compact.json
+
+Chunks come from synthetic PDFs and are embedded with the offline hash
+embedder, so the run needs no network access.
+
+Per chunk, `scan_bytes` is what every unfiltered query reads, and
+`resident_bytes` adds the Python-side structures of a loaded index.
+`disk_bytes` covers every file of the index (vectors, rescoring copy, text,
+log). `rescore_bytes_per_query` is what the int8 store additionally reads to
+re-score its shortlist. The `*_reduction` ratios are float32 over int8.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+import numpy as np
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from config.fake_providers import HashEmbeddings
+from docs.parsing import parse_shard
+from vectordb.local_store import LocalVectorStore
+from vectordb.compact_store import CompactVectorStore
+
+
+def make_chunks(directory: Path, count: int) -> list:
+    texts, seed = [], 0
+    while len(texts) < count:
+        path = write_synthetic_pdf(directory / f"synthetic-{seed}.pdf", 100, seed=seed)
+        texts += [chunk.page_content for chunk in parse_shard(str(path), 0, 100)[1]]
+        seed += 1
+    return texts[:count]
+
+
+def build(store_class, path: Path, dimension: int, records) -> dict:
+    started = time.perf_counter()
+    store = store_class(str(path), dimension)
+    for offset in range(0, len(records), 1000):
+        store.upsert(records[offset:offset + 1000])
+    build_seconds = time.perf_counter() - started
+    del store
+
+    # Resident Python-side memory of a freshly loaded index (metadata, id maps), excluding mmapped pages
+    tracemalloc.start()
+    store = store_class(str(path), dimension)
+    python_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    disk_bytes = sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+    return {"store": store, "build_seconds": build_seconds, "python_bytes": python_bytes, "disk_bytes": disk_bytes}
+
+
+def run(args) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix="compact-bench-"))
+    try:
+        texts = make_chunks(workdir, args.chunks)
+        embedder = HashEmbeddings(args.dimension)
+        vectors = np.asarray(embedder.embed_documents(texts), dtype=np.float32)
+        records = [
+            (f"chunk-{i}", vectors[i], {"text": text, "source": "synthetic.pdf", "doc_id": "bench",
+                                       "role": "doctor" if i % 2 else "nurse", "page": i // 10})
+            for i, text in enumerate(texts)
+        ]
+        rng = np.random.default_rng(0)
+        # Queries are fragments of stored chunks, so they sit near real data like user questions do
+        queries = [" ".join(texts[i].split()[:12]) for i in rng.choice(len(texts), args.queries, replace=False)]
+        query_vectors = np.asarray(embedder.embed_documents(queries), dtype=np.float32)
+        role_filter = {"role": {"$eq": "doctor"}}
+
+        report = {"chunks": len(texts), "dimension": args.dimension, "top_k": args.top_k, "queries": args.queries}
+        results = {}
+        for name, store_class in (("float32", LocalVectorStore), ("int8", CompactVectorStore)):
+            built = build(store_class, workdir / name, args.dimension, records)
+            store = built["store"]
+            scan_bytes = args.dimension * 4 if name == "float32" else args.dimension + 4
+            rescore_bytes = 0 if name == "float32" else args.top_k * store.rescore_factor * args.dimension * 2
+            started = time.perf_counter()
+            results[name] = [
+                [match["id"] for match in matches]
+                for matches in store.query_many(query_vectors, args.top_k, role_filter)
+            ]
+            batch_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            for vector in query_vectors[:50]:
+                store.query(vector, args.top_k, role_filter)
+            single_ms = (time.perf_counter() - started) / min(50, len(query_vectors)) * 1000
+            report[name] = {
+                "build_seconds": round(built["build_seconds"], 3),
+                "scan_bytes_per_chunk": scan_bytes,
+                "python_bytes_per_chunk": round(built["python_bytes"] / len(texts), 1),
+                "resident_bytes_per_chunk": round(scan_bytes + built["python_bytes"] / len(texts), 1),
+                "disk_bytes_per_chunk": round(built["disk_bytes"] / len(texts), 1),
+                "rescore_bytes_per_query": rescore_bytes,
+                "query_ms": round(single_ms, 3),
+                "batch_query_ms_per_query": round(batch_seconds / len(query_vectors) * 1000, 3),
+            }
+            del store
+
+        recall = [
+            len(set(exact) & set(compact)) / len(exact)
+            for exact, compact in zip(results["float32"], results["int8"]) if exact
+        ]
+        report["recall_at_k"] = round(float(np.mean(recall)), 4)
+        for measure in ("scan", "resident", "disk"):
+            report[f"{measure}_reduction"] = round(
+                report["float32"][f"{measure}_bytes_per_chunk"] / report["int8"][f"{measure}_bytes_per_chunk"], 2
+            )
+        report["query_slowdown"] = round(report["int8"]["query_ms"] / report["float32"]["query_ms"], 2)
+        return report
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dimension", type=int, default=int(os.getenv("PINECONE_DIMENSION", "768")))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    text = json.dumps(run(args), indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
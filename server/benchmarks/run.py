@@ -0,0 +1,241 @@
+"""Benchmark the ingest and chat hot paths and print the results as JSON.
+
+Run from the server directory:
+
+    python -m benchmarks.run --synthetic-pages 200 --requests 200 --concurrency 8 --output bench.json
+
+Everything is written to an in-memory database and a local vector index in
+a scratch directory (RAG_BENCH_DIR, or a temporary one that is removed
+afterwards), so numbers measure this code rather than the network and no
+benchmark data reaches a shared index. VECTOR_BACKEND may pick another local
+index; EMBEDDING_PROVIDER and LLM_PROVIDER may be exported to measure the real
+providers, which are only read from.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import shutil
+import contextlib
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+
+# Spawned parse workers re-import this module; they inherit the directory through the environment
+OWNS_BENCH_DIR = "RAG_BENCH_DIR" not in os.environ
+if OWNS_BENCH_DIR:
+    os.environ["RAG_BENCH_DIR"] = tempfile.mkdtemp(prefix="rag-bench-")
+BENCH_DIR = Path(os.environ["RAG_BENCH_DIR"])
+LOCAL_VECTOR_BACKENDS = ("local", "local_compact", "local_ivf")
+# Must be set before any server module reads its configuration. Storage always goes to BENCH_DIR
+os.environ.update({
+    "DB_BACKEND": "memory",
+    "LOCAL_VECTOR_PATH": str(BENCH_DIR / "vector_index"),
+    "LEXICAL_INDEX_PATH": str(BENCH_DIR / "lexical_index"),
+    "EMBEDDING_CACHE_PATH": str(BENCH_DIR / "embedding_cache.sqlite3"),
+})
+for key, value in {"VECTOR_BACKEND": "local", "EMBEDDING_PROVIDER": "fake", "LLM_PROVIDER": "fake"}.items():
+    os.environ.setdefault(key, value)
+
+import numpy as np
+import httpx
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from docs.models import IngestJob
+from docs.parsing import count_pages, plan_shards, iter_parsed_shards, shutdown_parse_pool
+from docs.vectorstore import EMBED_BATCH_SIZE, EMBED_CONCURRENCY, plan_stage, index_stage, finalize_stage
+from monitoring.metrics import stage_seconds
+from main import app, lifespan
+
+BUNDLED_PDFS = ["uploaded_docs/DIABETES.pdf", "uploaded_docs/Plant Epidemiology.pdf"]
+BENCH_ROLE = "doctor"
+QUESTIONS = [
+    "What is diabetes?",
+    "How is blood glucose monitored?",
+    "What are the symptoms of type 2 diabetes?",
+    "How do plant diseases spread?",
+    "What is the role of insulin?",
+    "Which risk factors matter for chronic disease?",
+    "How is an epidemic modelled?",
+    "What treatment options exist?",
+]
+
+
+def _rate(count, seconds):
+    return round(count / seconds, 2) if seconds else None
+
+
+def _percentiles(samples):
+    if not samples:
+        return {}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "p50_ms": round(p50 * 1000, 2), "p95_ms": round(p95 * 1000, 2), "p99_ms": round(p99 * 1000, 2),
+        "mean_ms": round(float(np.mean(samples)) * 1000, 2), "max_ms": round(max(samples) * 1000, 2)
+    }
+
+
+async def bench_parse(paths):
+    """Parse every PDF through the sharded process-pool path used by ingestion"""
+    results = []
+    # Spawning the worker processes is a one-off startup cost, not parse throughput
+    async for _ in iter_parsed_shards(str(paths[0]), [(0, 1)]):
+        pass
+    for path in paths:
+        started = time.perf_counter()
+        page_count = await asyncio.to_thread(count_pages, str(path))
+        pages = chunks = 0
+        async for _, shard_pages, shard_chunks in iter_parsed_shards(str(path), plan_shards(page_count)):
+            pages += shard_pages
+            chunks += len(shard_chunks)
+        seconds = time.perf_counter() - started
+        results.append({
+            "file": path.name, "pages": pages, "chunks": chunks, "seconds": round(seconds, 4),
+            "pages_per_sec": _rate(pages, seconds), "chunks_per_sec": _rate(chunks, seconds)
+        })
+
+    pages = sum(result["pages"] for result in results)
+    chunks = sum(result["chunks"] for result in results)
+    seconds = sum(result["seconds"] for result in results)
+    return {
+        "files": results, "pages": pages, "chunks": chunks, "seconds": round(seconds, 4),
+        "pages_per_sec": _rate(pages, seconds), "chunks_per_sec": _rate(chunks, seconds)
+    }
+
+
+def _stage_totals() -> dict:
+    """Seconds recorded so far per ingestion sub-step"""
+    return {labels["stage"]: value for name, labels, value in stage_seconds.samples() if name.endswith("_sum")}
+
+
+async def bench_index(paths):
+    """Ingest each file through the job pipeline's concurrent index stage, as an upload would.
+
+    `seconds` is the wall time of index_stage, which parses, embeds, upserts
+    and lexically indexes concurrently; `busy_seconds` sums each sub-step
+    across the EMBED_CONCURRENCY workers, so it can exceed the wall time.
+    """
+    results = []
+    before = _stage_totals()
+    for path in paths:
+        job = IngestJob(job_id=f"bench-{path.name}", doc_id=f"bench-{path.name}", role=BENCH_ROLE,
+                        filename=path.name, path=str(path))
+        await plan_stage(job)
+        started = time.perf_counter()
+        await index_stage(job)
+        seconds = time.perf_counter() - started
+        await finalize_stage(job)
+        chunks = job.progress["vectors_upserted"]
+        results.append({
+            "file": path.name, "pages": job.progress["pages_parsed"], "chunks": chunks,
+            "seconds": round(seconds, 4), "chunks_per_sec": _rate(chunks, seconds)
+        })
+
+    after = _stage_totals()
+    chunks = sum(result["chunks"] for result in results)
+    seconds = sum(result["seconds"] for result in results)
+    return {
+        "files": results, "chunks": chunks, "seconds": round(seconds, 4), "chunks_per_sec": _rate(chunks, seconds),
+        "busy_seconds": {
+            stage: round(after.get(stage, 0.0) - before.get(stage, 0.0), 4)
+            for stage in ("embed_batch", "upsert", "lexical_index")
+        },
+        "batch_size": EMBED_BATCH_SIZE,
+        "concurrency": EMBED_CONCURRENCY
+    }
+
+
+async def bench_chat(requests, concurrency, warmup):
+    """Fire /chat requests at the ASGI app in-process and report latency percentiles"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        credentials = {"username": "bench-user", "password": "bench-password"}
+        await client.post("/signup", json={**credentials, "role": BENCH_ROLE})
+        response = await client.post("/login", params=credentials)
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        latencies, errors = [], 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i, record):
+            nonlocal errors
+            async with semaphore:
+                # A unique suffix defeats the answer cache unless questions repeat on purpose
+                message = f"{QUESTIONS[i % len(QUESTIONS)]} (request {i})"
+                started = time.perf_counter()
+                response = await client.post("/chat", headers=headers, data={"message": message})
+                elapsed = time.perf_counter() - started
+                if not record:
+                    return
+                if response.status_code == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(one(i, False) for i in range(warmup)))
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i, True) for i in range(warmup, warmup + requests)))
+        wall = time.perf_counter() - started
+
+    return {
+        "requests": requests, "concurrency": concurrency, "errors": errors, "seconds": round(wall, 4),
+        "requests_per_sec": _rate(requests, wall), "latency": _percentiles(latencies)
+    }
+
+
+async def run(args):
+    paths = [Path(path) for path in BUNDLED_PDFS if Path(path).exists()]
+    for i in range(args.synthetic_files):
+        paths.append(write_synthetic_pdf(BENCH_DIR / f"synthetic-{i}.pdf", args.synthetic_pages, seed=i))
+
+    parse = await bench_parse(paths)
+    async with lifespan(app):
+        index = await bench_index(paths)
+        chat = await bench_chat(args.requests, args.concurrency, args.warmup)
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            **{key: os.environ.get(key) for key in ("DB_BACKEND", "VECTOR_BACKEND", "EMBEDDING_PROVIDER", "LLM_PROVIDER")}
+        },
+        "parse": parse,
+        "index": index,
+        "chat": chat
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--synthetic-files", type=int, default=1, help="number of generated PDFs")
+    parser.add_argument("--synthetic-pages", type=int, default=100, help="pages per generated PDF")
+    parser.add_argument("--requests", type=int, default=100, help="measured /chat requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent /chat requests")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured /chat requests sent first")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    try:
+        args = parser.parse_args()
+        if os.environ["VECTOR_BACKEND"].lower() not in LOCAL_VECTOR_BACKENDS:
+            parser.error(f"VECTOR_BACKEND must be one of {', '.join(LOCAL_VECTOR_BACKENDS)}: "
+                         "the benchmark upserts synthetic chunks and must not write to a shared index")
+        # Keep stdout clean for the JSON report
+        with contextlib.redirect_stdout(sys.stderr):
+            report = asyncio.run(run(args))
+    finally:
+        shutdown_parse_pool()
+        if OWNS_BENCH_DIR:
+            shutil.rmtree(BENCH_DIR, ignore_errors=True)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
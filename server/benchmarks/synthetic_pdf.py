@@ -0,0 +1,57 @@
+import random
+from pathlib import Path
+
+WORDS = (
+    "patient dose insulin glucose blood pressure symptom diagnosis treatment chronic acute therapy "
+    "clinical trial infection pathogen host plant disease epidemic spread rate model risk factor "
+    "monitoring screening prevention diet exercise medication adverse effect hospital nurse doctor "
+    "cell tissue organ immune response vaccine outbreak incidence prevalence population sample"
+).split()
+
+LINES_PER_PAGE = 45
+WORDS_PER_LINE = 12
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_stream(rng: random.Random) -> bytes:
+    lines = [" ".join(rng.choice(WORDS) for _ in range(WORDS_PER_LINE)).capitalize() + "." for _ in range(LINES_PER_PAGE)]
+    body = "\n".join(f"({_escape(line)}) Tj T*" for line in lines)
+    return f"BT /F1 10 Tf 14 TL 50 770 Td\n{body}\nET".encode("latin-1")
+
+
+def write_synthetic_pdf(path: Path, pages: int, seed: int = 0) -> Path:
+    """Write a text-only PDF of `pages` pages of pseudo-medical prose.
+
+    The output is deterministic for a given seed, so runs are comparable.
+    """
+    rng = random.Random(seed)
+    # 1: catalog, 2: page tree, 3: font, then a (page, content) object pair per page
+    page_ids = [4 + 2 * i for i in range(pages)]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {pages} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page_id in page_ids:
+        stream = _page_stream(rng)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    path.write_bytes(out)
+    return path
@@ -0,0 +1,94 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "256"))
+
+
+class SemanticAnswerCache:
+    """Per-role cache of {"answer", "sources"} looked up by query-embedding similarity.
+
+    A lookup hits when a cached query's embedding has cosine similarity of at
+    least `threshold` with the new one. Each role holds at most `max_entries`
+    entries (least recently used evicted first) that expire after `ttl_seconds`.
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, entries: OrderedDict, now: float):
+        for key in [key for key, (_, _, created) in entries.items() if now - created > self.ttl_seconds]:
+            del entries[key]
+
+    def lookup(self, role: str, embedding, scope=None) -> Optional[dict]:
+        """Return the cached result closest to `embedding`, or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries.get((role, scope))
+            if entries:
+                self._expire(entries, now)
+            if not entries:
+                self.misses += 1
+                return None
+
+            keys = list(entries.keys())
+            matrix = np.stack([entries[key][0] for key in keys])
+            scores = matrix @ self._normalize(embedding)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            entries.move_to_end(keys[best])
+            self.hits += 1
+            result = entries[keys[best]][1]
+            return {"answer": result["answer"], "sources": list(result["sources"])}
+
+    def store(self, role: str, embedding, result: dict, query: str, scope=None):
+        with self._lock:
+            entries = self._entries.setdefault((role, scope), OrderedDict())
+            entries[query] = (
+                self._normalize(embedding),
+                {"answer": result["answer"], "sources": list(result["sources"])},
+                time.monotonic(),
+            )
+            entries.move_to_end(query)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def invalidate_role(self, role: str):
+        """Drop every cached answer for a role, e.g. after new documents are ingested for it"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == role]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": sum(len(entries) for entries in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,173 @@
+import os
+import sqlite3
+import hashlib
+import inspect
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./data/embedding_cache.sqlite3")
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+# Providers such as Gemini embed queries and documents with different task types, so they never share entries
+QUERY_TASK = "query"
+DOCUMENT_TASK = "document"
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache with an in-process LRU tier and a SQLite tier.
+
+    Entries are keyed by (model name, dimension, task, sha256 of the text) and stored
+    as packed float32, so a cached 3072-d vector costs 12 KB in either tier.
+    """
+
+    def __init__(self, model_name: str, dimension: int, path: str = EMBEDDING_CACHE_PATH,
+                 max_memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_memory_items = max_memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._conn.commit()
+
+    def key(self, text: str, task: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{self.dimension}:{task}:{digest}"
+
+    def _remember(self, key: str, vector: array):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, texts: List[str], task: str) -> List[Optional[List[float]]]:
+        """Look texts up in memory, then on disk; None marks a miss"""
+        keys = [self.key(text, task) for text in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+
+            pending = [key for key in set(keys) if key not in found]
+            if pending and self._conn is not None:
+                for start in range(0, len(pending), 500):
+                    batch = pending[start:start + 500]
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = array("f")
+                        vector.frombytes(blob)
+                        found[key] = vector
+                        self._remember(key, vector)
+
+            results = []
+            for key in keys:
+                vector = found.get(key)
+                if vector is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    results.append(vector.tolist())
+            self.memory_hits += sum(1 for key in keys if key in found and key not in pending)
+            self.disk_hits += sum(1 for key in keys if key in found and key in pending)
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]], task: str):
+        rows = []
+        with self._lock:
+            for text, values in zip(texts, vectors):
+                key = self.key(text, task)
+                vector = array("f", values)
+                self._remember(key, vector)
+                rows.append((key, vector.tobytes()))
+            if rows and self._conn is not None:
+                self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+                self._conn.commit()
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "model": self.model_name,
+            "dimension": self.dimension,
+            "memory_items": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "hits": hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+
+class CachedEmbeddings:
+    """Wraps a LangChain embeddings model so only cache misses reach the provider"""
+
+    def __init__(self, embed_model, cache: EmbeddingCache):
+        self.embed_model = embed_model
+        self.cache = cache
+        # Gemini's embed_documents takes a task type, so many queries can still go out as one batch
+        self._batch_queries = "task_type" in inspect.signature(embed_model.embed_documents).parameters
+
+    def embed_query(self, text: str) -> List[float]:
+        cached = self.cache.get_many([text], QUERY_TASK)[0]
+        if cached is not None:
+            return cached
+        vector = self.embed_model.embed_query(text)
+        self.cache.put_many([text], [vector], QUERY_TASK)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """embed_query for many texts: query-task vectors, with one provider call when the model allows it"""
+        vectors = self.cache.get_many(texts, QUERY_TASK)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            if self._batch_queries:
+                computed = self.embed_model.embed_documents(missing, task_type="RETRIEVAL_QUERY")
+            else:
+                computed = [self.embed_model.embed_query(text) for text in missing]
+            computed = dict(zip(missing, computed))
+            self.cache.put_many(missing, [computed[text] for text in missing], QUERY_TASK)
+            vectors = [computed[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(texts, DOCUMENT_TASK)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            computed = dict(zip(missing, self.embed_model.embed_documents(missing)))
+            self.cache.put_many(missing, [computed[text] for text in missing], DOCUMENT_TASK)
+            vectors = [computed[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str, dimension: int) -> EmbeddingCache:
+    """Return the process-wide cache for a model/dimension pair"""
+    with _caches_lock:
+        if (model_name, dimension) not in _caches:
+            _caches[(model_name, dimension)] = EmbeddingCache(model_name, dimension)
+        return _caches[(model_name, dimension)]
+
+
+def embedding_cache_stats() -> List[dict]:
+    return [cache.stats() for cache in _caches.values()]
@@ -1,30 +1,36 @@
 import os
 import asyncio
+import logging
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_core.prompts import PromptTemplate
-from langchain_groq import ChatGroq
+from cache.answer_cache import answer_cache
+from config.providers import get_embeddings, get_llm, get_vector_store, get_lexical_index
+from chat.context import build_context
+from chat.rerank import rerank, RERANK_CANDIDATES
+from monitoring.metrics import stage_seconds, in_flight
+from vectordb.filters import build_metadata_filter, matches_filter
 
 load_dotenv()
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
-GOOGLE_EMBEDDING_MODEL = os.getenv("GOOGLE_EMBEDDING_MODEL", "gemini-embedding-001")
+logger = logging.getLogger(__name__)
 
-os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+# Set to "false" for vector backends that cannot filter on metadata server-side;
+# retrieval then over-fetches and filters the matches locally instead.
+VECTOR_NATIVE_FILTER = os.getenv("VECTOR_NATIVE_FILTER", "true").lower() == "true"
+RETRIEVAL_OVERFETCH_FACTOR = int(os.getenv("RETRIEVAL_OVERFETCH_FACTOR", "4"))
+# Fuse BM25 results over chunk text with the vector results (reciprocal rank fusion)
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Skip the embedding call when the best lexical hit contains every query term and
+# outscores the runner-up by this factor; 0 disables the shortcut
+LEXICAL_CONFIDENCE_MARGIN = float(os.getenv("LEXICAL_CONFIDENCE_MARGIN", "1.5"))
+# Over-fetch RERANK_CANDIDATES matches and rerank them down to RETRIEVAL_TOP_K on CPU
+RERANK = os.getenv("RERANK", "true").lower() == "true"
+# LLM calls running at once for one /chat/batch request
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
 
-pc=Pinecone(api_key=PINECONE_API_KEY)
-index=pc.Index(PINECONE_INDEX_NAME)
 
-embed_model = GoogleGenerativeAIEmbeddings(model=GOOGLE_EMBEDDING_MODEL)
-
-llm=ChatGroq(temperature=0.3,model_name="llama-3.1-8b-instant",groq_api_key=GROQ_API_KEY)
-
-
-prompt=PromptTemplate.from_template("""
+PROMPT_TEMPLATE="""
 You are a helpful healthcare assistant. Answer the following question ONLY based on the provided context.
 If the answer cannot be found in the context, say "I don't have enough information to answer this question based on the available documents."
 Do NOT make up information or use general knowledge.
@@ -33,47 +39,302 @@ Question: {question}
                                     
 Context: {context}
                                     
-Answer:""")
+Answer:"""
+
+# Used for chat sessions: the conversation only resolves what the question refers to, facts still come from the context
+SESSION_PROMPT_TEMPLATE="""
+You are a helpful healthcare assistant. Answer the following question ONLY based on the provided context.
+Use the conversation so far only to understand what the question refers to.
+If the answer cannot be found in the context, say "I don't have enough information to answer this question based on the available documents."
+Do NOT make up information or use general knowledge.
+
+Conversation so far:
+{history}
+
+Question: {question}
+
+Context: {context}
+
+Answer:"""
+
+_prompts={}
+
+
+def build_prompt(question:str,context:str,history:str=""):
+    """Fill the RAG template (the session one when there is history); the result is passed straight to the LLM"""
+    template=SESSION_PROMPT_TEMPLATE if history else PROMPT_TEMPLATE
+    if template not in _prompts:
+        from langchain_core.prompts import PromptTemplate
+        _prompts[template]=PromptTemplate.from_template(template)
+    inputs={"question":question,"context":context}
+    if history:
+        inputs["history"]=history
+    return _prompts[template].invoke(inputs)
+
+
+def search_for_role(embedding,user_role:str,top_k:int=RETRIEVAL_TOP_K,doc_ids=None,sources=None):
+    """Return the top_k matches the role is allowed to see, best first"""
+    metadata_filter=build_metadata_filter(user_role,doc_ids,sources)
+
+    index=get_vector_store()
+    if index.supports_filter and VECTOR_NATIVE_FILTER:
+        with stage_seconds.time(stage="search"):
+            return index.query(embedding,top_k,filter=metadata_filter)
+
+    # Backend cannot filter natively: over-fetch and keep the first top_k allowed matches.
+    with stage_seconds.time(stage="search"):
+        matches=index.query(embedding,top_k*RETRIEVAL_OVERFETCH_FACTOR)
+    with stage_seconds.time(stage="filter"):
+        allowed=[match for match in matches if matches_filter(match["metadata"],metadata_filter)]
+    return allowed[:top_k]
+
+
+def search_many_for_role(embeddings,user_role:str,top_k:int=RETRIEVAL_TOP_K,doc_ids=None,sources=None):
+    """search_for_role for several query embeddings at once (a single matrix product on the local backend)"""
+    index=get_vector_store()
+    if index.supports_filter and VECTOR_NATIVE_FILTER:
+        with stage_seconds.time(stage="search_batch"):
+            return index.query_many(embeddings,top_k,filter=build_metadata_filter(user_role,doc_ids,sources))
+    return [search_for_role(embedding,user_role,top_k,doc_ids,sources) for embedding in embeddings]
+
+
+def search_lexical(query:str,user_role:str,top_k:int=RETRIEVAL_TOP_K,doc_ids=None,sources=None):
+    with stage_seconds.time(stage="search_lexical"):
+        return get_lexical_index().search(query,top_k,filter=build_metadata_filter(user_role,doc_ids,sources))
+
+
+def lexical_is_confident(matches)->bool:
+    if not LEXICAL_CONFIDENCE_MARGIN or not matches or matches[0]["term_coverage"]<1.0:
+        return False
+    return len(matches)==1 or matches[0]["score"]>=LEXICAL_CONFIDENCE_MARGIN*matches[1]["score"]
+
+
+def fuse_rankings(rankings,top_k:int,k:int=RRF_K):
+    """Reciprocal rank fusion: score each id by sum(1 / (k + rank)) over the rankings it appears in.
+
+    Metadata comes from whichever ranking carries it; ids only the lexical index found have none yet.
+    """
+    fused={}
+    for ranking in rankings:
+        for rank,match in enumerate(ranking,start=1):
+            entry=fused.setdefault(match["id"],{"id":match["id"],"score":0.0,"metadata":None})
+            entry["metadata"]=entry["metadata"] or match.get("metadata")
+            entry["score"]+=1.0/(k+rank)
+    return sorted(fused.values(),key=lambda match:match["score"],reverse=True)[:top_k]
+
+
+def attach_metadata(matches):
+    """Read text and metadata for matches that lack it (lexical hits) from the vector store.
+
+    A match whose vector has meanwhile been deleted is dropped.
+    """
+    missing=[match["id"] for match in matches if match.get("metadata") is None]
+    if not missing:
+        return matches
+    with stage_seconds.time(stage="fetch_metadata"):
+        found=get_vector_store().fetch(missing)
+    return [
+        match if match.get("metadata") is not None else {**match,"metadata":found[match["id"]]}
+        for match in matches if match.get("metadata") is not None or match["id"] in found
+    ]
+
+
+def _candidate_count()->int:
+    return max(RERANK_CANDIDATES,RETRIEVAL_TOP_K) if RERANK else RETRIEVAL_TOP_K*2
 
-rag_chain=prompt | llm
 
+def _vector_fetch_count(lexical_matches)->int:
+    return _candidate_count() if RERANK or lexical_matches else RETRIEVAL_TOP_K
 
-async def answer_query(query:str,user_role:str):
-    print(f"[DEBUG] Query: {query}")
-    print(f"[DEBUG] User role: {user_role}")
 
-    embedding=await asyncio.to_thread(embed_model.embed_query,query)
-    results=await asyncio.to_thread(index.query, vector=embedding,top_k=5,include_metadata=True)
+def _select_matches(query:str,vector_matches,lexical_matches):
+    """Fuse the two rankings when both exist, then rerank (or cut) to RETRIEVAL_TOP_K"""
+    matches=fuse_rankings([vector_matches,lexical_matches],_candidate_count()) if lexical_matches else vector_matches
+    matches=attach_metadata(matches)
+    if RERANK:
+        with stage_seconds.time(stage="rerank"):
+            return rerank(query,matches,RETRIEVAL_TOP_K)
+    return matches[:RETRIEVAL_TOP_K]
 
-    print(f"[DEBUG] Total matches from Pinecone: {len(results.get('matches', []))}")
-    
-    filtered_contexts=[]
-    sources=set()
 
-    for match in results["matches"]:
+NO_CONTEXT_ANSWER="No relevant information found for your role. Please contact an administrator."
+
+
+async def prepare_query(query:str,user_role:str,doc_ids=None,sources=None,session=None)->dict:
+    """Retrieve for a query (lexical and vector, fused); returns a cached answer or the prompt inputs for the LLM.
+
+    In a chat session, retrieval uses the follow-up condensed into a standalone
+    query and the prompt carries the session history.
+    """
+    history=session.history() if session else ""
+    question=query
+    if session:
+        query=session.condense(question)
+    logger.debug("Query: %s (role: %s)",query,user_role)
+
+    scope=(tuple(doc_ids or ()),tuple(sources or ()))
+    prepared={"embedding":None,"scope":scope,"cached":None,"context":None,"prompt":None,"sources":[],
+              "question":question,"history":history}
+
+    lexical_matches=[]
+    if HYBRID_SEARCH:
+        lexical_matches=await asyncio.to_thread(search_lexical,query,user_role,_candidate_count(),doc_ids,sources)
+        if lexical_is_confident(lexical_matches):
+            # Exact-term hit: no embedding, so the semantic answer cache is bypassed too
+            logger.debug("Confident lexical match, skipping embedding")
+            matches=await asyncio.to_thread(attach_metadata,lexical_matches[:RETRIEVAL_TOP_K])
+            return _build_prepared(prepared,query,matches)
+
+    with stage_seconds.time(stage="embed_query"):
+        embedding=await asyncio.to_thread(get_embeddings().embed_query,query)
+
+    prepared["embedding"]=embedding
+    with stage_seconds.time(stage="answer_cache"):
+        cached=answer_cache.lookup(user_role,embedding,scope)
+    if cached is not None:
+        logger.debug("Served from answer cache")
+        prepared["cached"]=cached
+        return prepared
+
+    vector_matches=await asyncio.to_thread(
+        search_for_role,embedding,user_role,_vector_fetch_count(lexical_matches),doc_ids,sources
+    )
+    matches=await asyncio.to_thread(_select_matches,query,vector_matches,lexical_matches)
+
+    logger.debug("Role-filtered matches: %d",len(matches))
+    return _build_prepared(prepared,query,matches)
+
+
+def _build_prepared(prepared:dict,query:str,matches)->dict:
+    """Pack the matches into the context and prompt; the prompt asks the user's own question when it differs from the query"""
+    for match in matches:
         metadata=match["metadata"]
-        doc_role = metadata.get("role")
-        print(f"[DEBUG] Match score: {match.get('score', 0):.4f}, Doc role: {doc_role}, Has text: {bool(metadata.get('text'))}")
-        
-        if doc_role == user_role:
-            text_content = metadata.get("text","")
-            if text_content:
-                filtered_contexts.append(text_content)
-                sources.add(metadata.get("source"))
-                print(f"[DEBUG] Added context from: {metadata.get('source')}")
-
-    print(f"[DEBUG] Filtered contexts count: {len(filtered_contexts)}")
-
-    if not filtered_contexts:
-        return {"answer":"No relevant information found for your role. Please contact an administrator.","sources":[]}
-    
-    docs_text="\\n\\n".join(filtered_contexts)
-    print(f"[DEBUG] Total context length: {len(docs_text)} chars")
-    
-    final_answer=await asyncio.to_thread(rag_chain.invoke,{"question":query,"context":docs_text})
-
-
-    return {
+        logger.debug("Match score: %.4f, doc role: %s, source: %s",match.get("score",0),metadata.get("role"),metadata.get("source"))
+
+    with stage_seconds.time(stage="prompt_build"):
+        context,sources_found=build_context(matches)
+        if context:
+            prepared["context"]=context
+            prepared["sources"]=sources_found
+            prepared["prompt"]=build_prompt(prepared.get("question",query),context,prepared.get("history",""))
+            logger.debug("Context: %d matches packed into %d chars",len(matches),len(context))
+    return prepared
+
+
+async def answer_query(query:str,user_role:str,doc_ids=None,sources=None,session=None):
+    prepared=await prepare_query(query,user_role,doc_ids,sources,session)
+    result=await _generate_answer(query,user_role,prepared)
+    if session:
+        session.add_turn(query,result["answer"])
+    return result
+
+
+async def _generate_answer(query:str,user_role:str,prepared:dict)->dict:
+    if prepared["cached"] is not None:
+        return prepared["cached"]
+    if prepared["context"] is None:
+        return {"answer":NO_CONTEXT_ANSWER,"sources":[]}
+
+    with in_flight.track(operation="llm"),stage_seconds.time(stage="llm"):
+        final_answer=await asyncio.to_thread(get_llm().invoke,prepared["prompt"])
+
+    result={
         "answer":final_answer.content,
-        "sources":list(sources)
-    }
\ No newline at end of file
+        "sources":prepared["sources"]
+    }
+    if _cacheable(prepared):
+        answer_cache.store(user_role,prepared["embedding"],result,query,prepared["scope"])
+    return result
+
+
+def _cacheable(prepared:dict)->bool:
+    # An answer written with session history in the prompt may lean on that history
+    return prepared["embedding"] is not None and not prepared.get("history")
+
+
+async def stream_answer_query(query:str,user_role:str,doc_ids=None,sources=None,session=None):
+    """Async generator of (event, data) pairs: "sources" once, then "token"s, then "done" """
+    prepared=await prepare_query(query,user_role,doc_ids,sources,session)
+    if prepared["cached"] is not None or prepared["context"] is None:
+        result=prepared["cached"] or {"answer":NO_CONTEXT_ANSWER,"sources":[]}
+        if session:
+            session.add_turn(query,result["answer"])
+        yield "sources",result["sources"]
+        yield "token",result["answer"]
+        yield "done",{"cached":prepared["cached"] is not None}
+        return
+
+    yield "sources",prepared["sources"]
+
+    tokens=[]
+    with in_flight.track(operation="llm"),stage_seconds.time(stage="llm"):
+        async for chunk in get_llm().astream(prepared["prompt"]):
+            if chunk.content:
+                tokens.append(chunk.content)
+                yield "token",chunk.content
+
+    answer="".join(tokens)
+    if session:
+        session.add_turn(query,answer)
+    if _cacheable(prepared):
+        answer_cache.store(user_role,prepared["embedding"],{"answer":answer,"sources":prepared["sources"]},query,prepared["scope"])
+    yield "done",{"cached":False}
+
+
+async def prepare_batch(queries,user_role:str,doc_ids=None,sources=None):
+    """prepare_query for many questions: one query-embedding call, one batched vector search"""
+    scope=(tuple(doc_ids or ()),tuple(sources or ()))
+    with stage_seconds.time(stage="embed_queries"):
+        embeddings=await asyncio.to_thread(get_embeddings().embed_queries,list(queries))
+
+    prepared=[]
+    for embedding in embeddings:
+        prepared.append({"embedding":embedding,"scope":scope,"cached":answer_cache.lookup(user_role,embedding,scope),
+                         "context":None,"prompt":None,"sources":[]})
+    pending=[i for i,item in enumerate(prepared) if item["cached"] is None]
+    if not pending:
+        return prepared
+
+    lexical=[[] for _ in pending]
+    if HYBRID_SEARCH:
+        lexical=await asyncio.to_thread(
+            lambda:[search_lexical(queries[i],user_role,_candidate_count(),doc_ids,sources) for i in pending]
+        )
+    # One fetch size for the whole batch so the backend can score it in one pass
+    vector=await asyncio.to_thread(
+        search_many_for_role,[embeddings[i] for i in pending],user_role,_vector_fetch_count(any(lexical)),doc_ids,sources
+    )
+    selected=await asyncio.to_thread(
+        lambda:[_select_matches(queries[i],vector_matches,lexical_matches) for i,vector_matches,lexical_matches in zip(pending,vector,lexical)]
+    )
+    for i,matches in zip(pending,selected):
+        _build_prepared(prepared[i],queries[i],matches)
+    return prepared
+
+
+async def answer_batch(queries,user_role:str,doc_ids=None,sources=None):
+    """Async generator of (index, result) pairs in completion order.
+
+    Retrieval is shared across the batch; LLM calls run at most
+    BATCH_LLM_CONCURRENCY at a time. A failed question yields {"error": ...}
+    instead of failing the batch.
+    """
+    prepared=await prepare_batch(queries,user_role,doc_ids,sources)
+    semaphore=asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+
+    async def run(i):
+        async with semaphore:
+            try:
+                result=await _generate_answer(queries[i],user_role,prepared[i])
+                return i,{**result,"cached":prepared[i]["cached"] is not None}
+            except Exception as e:
+                logger.warning("Batch question %d failed: %s",i,e)
+                return i,{"error":str(e)}
+
+    tasks=[asyncio.create_task(run(i)) for i in range(len(queries))]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
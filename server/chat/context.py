@@ -0,0 +1,112 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Set, Tuple
+from docs.parsing import CHUNK_OVERLAP
+
+
+# Budget for the retrieved passages only; the template and question come on top
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+# Tokens are estimated from characters; ~4 is typical for English with Llama-family tokenizers
+CONTEXT_CHARS_PER_TOKEN = float(os.getenv("CONTEXT_CHARS_PER_TOKEN", "4"))
+# Word-trigram Jaccard similarity at which two passages count as the same text
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.8"))
+# Shorter suffix/prefix matches are likely coincidence rather than splitter overlap
+MIN_MERGE_OVERLAP = 20
+PASSAGE_SEPARATOR = "\n\n"
+
+
+@dataclass
+class Passage:
+    text: str
+    score: float
+    source: str
+    key: Tuple[str, int]
+    shingles: Set[Tuple[str, ...]] = field(default_factory=set)
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CONTEXT_CHARS_PER_TOKEN) + 1
+
+
+def _shingles(text: str) -> Set[Tuple[str, ...]]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < 3:
+        return {tuple(words)}
+    return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def _overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right`, as the splitter leaves them"""
+    for size in range(min(len(left), len(right), CHUNK_OVERLAP * 2), MIN_MERGE_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge_page(passages: List[Passage]) -> List[Passage]:
+    """Stitch chunks of one page back together where the splitter's overlap shows they were adjacent"""
+    merged = []
+    for passage in passages:
+        for i, existing in enumerate(merged):
+            if passage.text in existing.text:
+                existing.score = max(existing.score, passage.score)
+                break
+            if existing.text in passage.text:
+                merged[i] = Passage(passage.text, max(existing.score, passage.score), passage.source, passage.key)
+                break
+            forward, backward = _overlap(existing.text, passage.text), _overlap(passage.text, existing.text)
+            if forward or backward:
+                text = existing.text + passage.text[forward:] if forward >= backward else passage.text + existing.text[backward:]
+                merged[i] = Passage(text, max(existing.score, passage.score), passage.source, passage.key)
+                break
+        else:
+            merged.append(passage)
+    return merged
+
+
+def _jaccard(a: Set, b: Set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def build_context(matches, token_budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, List[str]]:
+    """Turn retrieval matches into (context, sources) that fit the token budget.
+
+    Adjacent chunks of the same document page are merged, near-duplicate
+    passages (e.g. the same leaflet uploaded twice) are dropped, and the rest
+    are packed best score first until the budget is spent. Sources lists only
+    the documents that made it into the context.
+    """
+    pages = {}
+    for match in matches:
+        metadata = match["metadata"]
+        text = (metadata.get("text") or "").strip()
+        if not text:
+            continue
+        source = metadata.get("source")
+        key = (metadata.get("doc_id") or source, int(metadata.get("page", 0)))
+        pages.setdefault(key, []).append(Passage(text, match.get("score", 0.0), source, key))
+
+    passages = [passage for page in pages.values() for passage in _merge_page(page)]
+    passages.sort(key=lambda passage: passage.score, reverse=True)
+
+    kept = []
+    for passage in passages:
+        passage.shingles = _shingles(passage.text)
+        if all(_jaccard(passage.shingles, other.shingles) < CONTEXT_DUPLICATE_THRESHOLD for other in kept):
+            kept.append(passage)
+
+    packed, used = [], 0
+    for passage in kept:
+        cost = estimate_tokens(passage.text) + (estimate_tokens(PASSAGE_SEPARATOR) if packed else 0)
+        if used + cost <= token_budget:
+            packed.append(passage)
+            used += cost
+        elif not packed:
+            # Even the best passage is over budget on its own: send its head rather than nothing
+            packed.append(Passage(passage.text[:int(token_budget * CONTEXT_CHARS_PER_TOKEN)], passage.score,
+                                  passage.source, passage.key))
+            break
+
+    sources = list(dict.fromkeys(passage.source for passage in packed))
+    return PASSAGE_SEPARATOR.join(passage.text for passage in packed), sources
@@ -0,0 +1,7 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+class BatchChatRequest(BaseModel):
+    questions:List[str]
+    doc_id:Optional[str]=None
+    source:Optional[str]=None
@@ -0,0 +1,57 @@
+import os
+from typing import Dict, List
+import numpy as np
+from vectordb.lexical import tokenize
+
+
+# Candidates retrieved for the role before reranking down to the final top k
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+# Share of the final score taken from the first-stage (vector / fused) rank; the rest is term overlap
+RERANK_RETRIEVAL_WEIGHT = float(os.getenv("RERANK_RETRIEVAL_WEIGHT", "0.5"))
+# Extra weight for query bigrams that appear verbatim ("insulin resistance")
+RERANK_PHRASE_WEIGHT = 0.5
+
+
+def _minmax(values: np.ndarray) -> np.ndarray:
+    spread = values.max() - values.min()
+    return (values - values.min()) / spread if spread > 0 else np.ones_like(values)
+
+
+def rerank(query: str, matches: List[Dict], top_k: int) -> List[Dict]:
+    """Reorder first-stage matches by query term overlap and keep the best top_k.
+
+    Each candidate is scored on the IDF-weighted share of query terms it
+    contains (IDF computed over the candidate set, term frequency saturated)
+    plus query bigrams it contains verbatim, then blended with its normalised
+    first-stage score. Everything is one (candidates x terms) matrix, so 50
+    candidates cost well under a millisecond beyond tokenisation.
+    """
+    if len(matches) <= 1:
+        return matches[:top_k]
+    query_terms = list(dict.fromkeys(tokenize(query)))
+    if not query_terms:
+        return matches[:top_k]
+
+    term_index = {term: i for i, term in enumerate(query_terms)}
+    query_bigrams = set(zip(query_terms, query_terms[1:]))
+    counts = np.zeros((len(matches), len(query_terms)), dtype=np.float32)
+    phrases = np.zeros(len(matches), dtype=np.float32)
+    for row, match in enumerate(matches):
+        tokens = tokenize(match["metadata"].get("text", ""))
+        for token in tokens:
+            column = term_index.get(token)
+            if column is not None:
+                counts[row, column] += 1
+        if query_bigrams:
+            phrases[row] = len(query_bigrams & set(zip(tokens, tokens[1:]))) / len(query_bigrams)
+
+    document_frequency = (counts > 0).sum(axis=0)
+    idf = np.log1p((len(matches) + 1) / (document_frequency + 0.5))
+    overlap = (counts / (counts + 1.0)) @ idf / idf.sum()
+    lexical = overlap + RERANK_PHRASE_WEIGHT * phrases
+
+    retrieval = _minmax(np.asarray([match.get("score", 0.0) for match in matches], dtype=np.float32))
+    scores = RERANK_RETRIEVAL_WEIGHT * retrieval + (1 - RERANK_RETRIEVAL_WEIGHT) * _minmax(lexical)
+
+    order = np.argsort(-scores, kind="stable")[:top_k]
+    return [{**matches[i], "score": float(scores[i])} for i in order]
@@ -1,10 +1,98 @@
-from fastapi import APIRouter, Depends, Form
+import os
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, Form, HTTPException
+from fastapi.responses import StreamingResponse
 from auth.routes import get_current_user
-from chat.chat_query import answer_query
+from chat.chat_query import answer_query, stream_answer_query, answer_batch
+from chat.models import BatchChatRequest
+from chat.sessions import session_store
+
+BATCH_CHAT_MAX_QUESTIONS = int(os.getenv("BATCH_CHAT_MAX_QUESTIONS", "100"))
 
 router = APIRouter()
 
 
+def _session_for(user, session_id: Optional[str]):
+    if not session_id:
+        return None
+    session = session_store.get(session_id, user["username"])
+    if session is None:
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    return session
+
+
+@router.post("/chat/sessions")
+async def create_chat_session(user=Depends(get_current_user)):
+    """Start a conversation; pass the returned session_id to /chat or /chat/stream for follow-ups"""
+    return {"session_id": session_store.create(user["username"]).id}
+
+
+@router.get("/chat/sessions/{session_id}")
+async def get_chat_session(session_id: str, user=Depends(get_current_user)):
+    return _session_for(user, session_id).to_dict()
+
+
+@router.delete("/chat/sessions/{session_id}")
+async def delete_chat_session(session_id: str, user=Depends(get_current_user)):
+    if not session_store.delete(session_id, user["username"]):
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    return {"deleted": session_id}
+
+
 @router.post("/chat")
-async def chat(user=Depends(get_current_user), message: str = Form(...)):
-    return await answer_query(message, user["role"])
+async def chat(
+    user=Depends(get_current_user),
+    message: str = Form(...),
+    doc_id: Optional[str] = Form(None),
+    source: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None)
+):
+    session = _session_for(user, session_id)
+    doc_ids = [doc_id] if doc_id else None
+    sources = [source] if source else None
+    return await answer_query(message, user["role"], doc_ids, sources, session)
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    user=Depends(get_current_user),
+    message: str = Form(...),
+    doc_id: Optional[str] = Form(None),
+    source: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None)
+):
+    """Server-Sent Events: a `sources` event, then `token` events as the LLM generates, then `done`"""
+    session = _session_for(user, session_id)
+    doc_ids = [doc_id] if doc_id else None
+    sources = [source] if source else None
+
+    async def event_stream():
+        try:
+            async for event, data in stream_answer_query(message, user["role"], doc_ids, sources, session):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps(str(e))}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/chat/batch")
+async def chat_batch(req: BatchChatRequest, user=Depends(get_current_user)):
+    """Answer many questions at once; streams one NDJSON line per question as each answer completes"""
+    if not req.questions:
+        raise HTTPException(status_code=400, detail="No questions given")
+    if len(req.questions) > BATCH_CHAT_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_CHAT_MAX_QUESTIONS} questions per batch")
+    doc_ids = [req.doc_id] if req.doc_id else None
+    sources = [req.source] if req.source else None
+
+    async def lines():
+        async for index, result in answer_batch(req.questions, user["role"], doc_ids, sources):
+            yield json.dumps({"index": index, "question": req.questions[index], **result}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,169 @@
+import os
+import re
+import time
+import secrets
+import threading
+from collections import OrderedDict, deque
+from typing import Optional
+from chat.context import CONTEXT_CHARS_PER_TOKEN
+from vectordb.lexical import STOPWORDS
+
+
+# Turns kept verbatim; older ones are folded into the session summary
+CHAT_SESSION_TURNS = int(os.getenv("CHAT_SESSION_TURNS", "4"))
+# Token budgets (estimated from characters like the context builder) for the summary and each stored turn
+CHAT_SESSION_SUMMARY_TOKENS = int(os.getenv("CHAT_SESSION_SUMMARY_TOKENS", "200"))
+CHAT_SESSION_TURN_TOKENS = int(os.getenv("CHAT_SESSION_TURN_TOKENS", "300"))
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "1000"))
+CHAT_SESSION_IDLE_SECONDS = float(os.getenv("CHAT_SESSION_IDLE_SECONDS", "1800"))
+# Recent question terms remembered per session, and how many a follow-up borrows
+TOPIC_TERMS = 16
+CONDENSE_TERMS = 6
+# A question with this few content words, or one that points back ("it", "what about"), is a follow-up
+FOLLOW_UP_MAX_TERMS = 3
+REFERRING_WORDS = frozenset(
+    "it its this that these those they them their he she his her about above previous same also else more".split()
+)
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def _clip(text: str, tokens: int) -> str:
+    limit = int(tokens * CONTEXT_CHARS_PER_TOKEN)
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + " …"
+
+
+def _content_words(text: str):
+    return [word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS and word not in REFERRING_WORDS and len(word) > 1]
+
+
+class ChatSession:
+    """One user's conversation, bounded regardless of its length.
+
+    The last CHAT_SESSION_TURNS (question, answer) pairs are kept verbatim,
+    each clipped to CHAT_SESSION_TURN_TOKENS. A turn pushed out of that
+    window is folded into `summary` as one line (the question and the first
+    sentence of its answer); the oldest lines are dropped once the summary
+    exceeds CHAT_SESSION_SUMMARY_TOKENS. `topics` holds the most recent
+    content words of the user's questions, used to condense follow-ups.
+    """
+
+    __slots__ = ("id", "username", "turns", "summary", "topics", "last_used", "_lock")
+
+    def __init__(self, session_id: str, username: str):
+        self.id = session_id
+        self.username = username
+        self.turns = deque(maxlen=CHAT_SESSION_TURNS)
+        self.summary = deque()
+        self.topics = OrderedDict()
+        self.last_used = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _fold(self, question: str, answer: str):
+        first_sentence = SENTENCE_END.split(answer.strip(), 1)[0]
+        self.summary.append(_clip(f"- {question} → {first_sentence}", CHAT_SESSION_SUMMARY_TOKENS // 2))
+        limit = CHAT_SESSION_SUMMARY_TOKENS * CONTEXT_CHARS_PER_TOKEN
+        while len(self.summary) > 1 and sum(len(line) + 1 for line in self.summary) > limit:
+            self.summary.popleft()
+
+    def add_turn(self, question: str, answer: str):
+        with self._lock:
+            if len(self.turns) == self.turns.maxlen:
+                self._fold(*self.turns[0])
+            self.turns.append((_clip(question, CHAT_SESSION_TURN_TOKENS), _clip(answer, CHAT_SESSION_TURN_TOKENS)))
+            for word in _content_words(question):
+                self.topics.pop(word, None)
+                self.topics[word] = None
+            while len(self.topics) > TOPIC_TERMS:
+                self.topics.popitem(last=False)
+
+    def condense(self, question: str) -> str:
+        """Standalone retrieval query for `question`: follow-ups borrow the most recent topic terms"""
+        words = WORD_PATTERN.findall(question.lower())
+        content = [word for word in words if word not in STOPWORDS]
+        with self._lock:
+            if not self.topics or (len(content) > FOLLOW_UP_MAX_TERMS and not REFERRING_WORDS.intersection(words)):
+                return question
+            borrowed = [term for term in reversed(self.topics) if term not in content][:CONDENSE_TERMS]
+        return f"{question} ({' '.join(reversed(borrowed))})" if borrowed else question
+
+    def history(self) -> str:
+        """Summary and recent turns formatted for the prompt; empty for a new session"""
+        with self._lock:
+            parts = []
+            if self.summary:
+                parts.append("Earlier in this conversation:\n" + "\n".join(self.summary))
+            if self.turns:
+                parts.append("\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in self.turns))
+        return "\n\n".join(parts)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "session_id": self.id,
+                "turns": [{"question": question, "answer": answer} for question, answer in self.turns],
+                "summary": list(self.summary),
+            }
+
+
+class SessionStore:
+    """In-process chat sessions, least recently used first out.
+
+    Holds at most `max_sessions`; a session idle for `idle_seconds` is
+    dropped the next time the store is touched. Sessions are only visible
+    to the user who created them.
+    """
+
+    def __init__(self, max_sessions: int = CHAT_SESSION_MAX, idle_seconds: float = CHAT_SESSION_IDLE_SECONDS):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def _expire(self, now: float):
+        # Ordered by last use, so idle sessions are all at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used <= self.idle_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def create(self, username: str) -> ChatSession:
+        now = time.monotonic()
+        session = ChatSession(secrets.token_urlsafe(16), username)
+        with self._lock:
+            self._expire(now)
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+        return session
+
+    def get(self, session_id: str, username: str) -> Optional[ChatSession]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None or session.username != username:
+                return None
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str, username: str) -> bool:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.username != username:
+                return False
+            del self._sessions[session_id]
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {"sessions": len(self._sessions), "evicted": self.evicted}
+
+
+session_store = SessionStore()
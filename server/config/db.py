@@ -1,13 +1,167 @@
 import os
+import copy
+import itertools
+from types import SimpleNamespace
+from typing import Optional
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, ASCENDING
+from pymongo.errors import DuplicateKeyError
 
 
 load_dotenv()
 MONGO_URI=os.getenv("MONGO_URI")
 DB_NAME=os.getenv("DB_NAME")
+# "mongo" for MongoDB, "memory" for the in-process stand-in used by tests and benchmarks
+DB_BACKEND=os.getenv("DB_BACKEND","mongo").lower()
+MONGO_MAX_POOL_SIZE=int(os.getenv("MONGO_MAX_POOL_SIZE","100"))
+MONGO_MIN_POOL_SIZE=int(os.getenv("MONGO_MIN_POOL_SIZE","0"))
+MONGO_TIMEOUT_MS=int(os.getenv("MONGO_TIMEOUT_MS","5000"))
 
 
-client=MongoClient(MONGO_URI)
-db=client[DB_NAME]
-users_collection=db["users"]
\ No newline at end of file
+class InMemoryCursor:
+    def __init__(self, documents):
+        self._documents = documents
+
+    async def to_list(self, length=None):
+        return self._documents if length is None else self._documents[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self._documents:
+            yield document
+
+
+class InMemoryCollection:
+    """Async stand-in for the subset of AsyncCollection the app uses, including unique indexes"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self):
+        self._documents = []
+        self._unique_keys = []
+
+    @staticmethod
+    def _matches(document, query):
+        return all(document.get(key) == value for key, value in (query or {}).items())
+
+    def _check_unique(self, candidate, ignore=None):
+        for keys in self._unique_keys:
+            for document in self._documents:
+                if document is not ignore and all(document.get(key) == candidate.get(key) for key in keys):
+                    raise DuplicateKeyError(f"E11000 duplicate key on {keys}")
+
+    async def create_index(self, keys, unique=False, **kwargs):
+        if unique:
+            self._unique_keys.append([key for key, _ in keys] if isinstance(keys, list) else [keys])
+
+    async def find_one(self, query=None):
+        for document in self._documents:
+            if self._matches(document, query):
+                return copy.deepcopy(document)
+        return None
+
+    def find(self, query=None):
+        return InMemoryCursor([copy.deepcopy(document) for document in self._documents if self._matches(document, query)])
+
+    async def insert_one(self, document):
+        document = copy.deepcopy(document)
+        document.setdefault("_id", next(self._ids))
+        self._check_unique(document)
+        self._documents.append(document)
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    async def update_one(self, query, update, upsert=False):
+        for document in self._documents:
+            if self._matches(document, query):
+                updated = copy.deepcopy(document)
+                self._apply(updated, update)
+                self._check_unique(updated, ignore=document)
+                document.clear()
+                document.update(updated)
+                return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if not upsert:
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+        document = dict(query)
+        self._apply(document, update)
+        result = await self.insert_one(document)
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=result.inserted_id)
+
+    @staticmethod
+    def _apply(document, update):
+        for key, value in update.get("$set", {}).items():
+            document[key] = copy.deepcopy(value)
+        for key, value in update.get("$push", {}).items():
+            document.setdefault(key, []).append(copy.deepcopy(value))
+
+    async def delete_one(self, query):
+        for i, document in enumerate(self._documents):
+            if self._matches(document, query):
+                del self._documents[i]
+                return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+
+class Database:
+    """Async data-access layer over MongoDB (or the in-memory stand-in)"""
+
+    def __init__(self, backend: str = DB_BACKEND):
+        self.backend = backend
+        self.client = None
+        if backend == "memory":
+            self.users = InMemoryCollection()
+            self.documents = InMemoryCollection()
+            return
+        if not MONGO_URI or not DB_NAME:
+            raise RuntimeError("MONGO_URI and DB_NAME are required for the mongo database backend")
+        self.client = AsyncMongoClient(
+            MONGO_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_TIMEOUT_MS,
+        )
+        db = self.client[DB_NAME]
+        self.users = db["users"]
+        self.documents = db["documents"]
+
+    async def create_indexes(self):
+        await self.users.create_index([("username", ASCENDING)], unique=True)
+        await self.documents.create_index([("source", ASCENDING), ("role", ASCENDING)], unique=True)
+        await self.documents.create_index([("role", ASCENDING), ("current_sha256", ASCENDING)])
+
+    async def ping(self):
+        """Raise if the database cannot be reached"""
+        if self.client is not None:
+            await self.client.admin.command("ping")
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+
+
+_db: Optional[Database] = None
+
+
+async def init_db(backend: str = DB_BACKEND) -> Database:
+    """Create the client and ensure indexes; called from the FastAPI lifespan"""
+    global _db
+    if _db is None:
+        _db = Database(backend)
+        await _db.create_indexes()
+    return _db
+
+
+async def close_db():
+    global _db
+    if _db is not None:
+        await _db.close()
+        _db = None
+
+
+def get_db() -> Database:
+    if _db is None:
+        raise RuntimeError("Database not initialised; init_db() runs in the app lifespan")
+    return _db
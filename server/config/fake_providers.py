@@ -0,0 +1,97 @@
+import re
+import time
+import asyncio
+import hashlib
+from typing import Any, List, Optional
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class HashEmbeddings:
+    """Deterministic offline embeddings via signed feature hashing of word unigrams and bigrams.
+
+    Texts sharing words get similar vectors, so retrieval behaves plausibly
+    without any network access. Vectors are unit-normalised.
+    """
+
+    def __init__(self, dimension: int, latency_ms: float = 0.0):
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+
+    def _embed(self, text: str) -> List[float]:
+        words = re.findall(r"\w+", text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])] or [text]
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dimension] += 1.0 if (value >> 63) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return self._embed(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model with configurable latency and token-by-token streaming.
+
+    mode "canned" always answers `response`; mode "echo" answers with the
+    question found in the prompt. `latency_ms` is the time to first token and
+    `token_delay_ms` the gap between streamed tokens.
+    """
+
+    mode: str = "canned"
+    response: str = "This is a canned answer from the offline fake LLM."
+    latency_ms: float = 0.0
+    token_delay_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        if self.mode != "echo":
+            return self.response
+        prompt = str(messages[-1].content) if messages else ""
+        match = re.search(r"Question:\s*(.*?)\s*(?:\n\s*Context:|$)", prompt, re.S)
+        return f"You asked: {match.group(1) if match else prompt[-200:]}"
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        return re.findall(r"\S+\s*", text)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        time.sleep((self.latency_ms + self.token_delay_ms * len(self._tokens(self._reply(messages)))) / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                         **kwargs: Any) -> ChatResult:
+        await asyncio.sleep((self.latency_ms + self.token_delay_ms * len(self._tokens(self._reply(messages)))) / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                **kwargs: Any):
+        time.sleep(self.latency_ms / 1000)
+        for i, token in enumerate(self._tokens(self._reply(messages))):
+            if i:
+                time.sleep(self.token_delay_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                       **kwargs: Any):
+        await asyncio.sleep(self.latency_ms / 1000)
+        for i, token in enumerate(self._tokens(self._reply(messages))):
+            if i:
+                await asyncio.sleep(self.token_delay_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
@@ -0,0 +1,148 @@
+import os
+import time
+import threading
+from typing import Callable, Dict
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+GOOGLE_EMBEDDING_MODEL = os.getenv("GOOGLE_EMBEDDING_MODEL", "gemini-embedding-001")
+PINECONE_DIMENSION = int(os.getenv("PINECONE_DIMENSION", "3072"))
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+# "google"/"groq" for the real services, "fake" for the deterministic offline stand-ins
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "google").lower()
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq").lower()
+FAKE_EMBEDDING_LATENCY_MS = float(os.getenv("FAKE_EMBEDDING_LATENCY_MS", "0"))
+FAKE_LLM_MODE = os.getenv("FAKE_LLM_MODE", "canned")
+FAKE_LLM_RESPONSE = os.getenv("FAKE_LLM_RESPONSE")
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+FAKE_LLM_TOKEN_DELAY_MS = float(os.getenv("FAKE_LLM_TOKEN_DELAY_MS", "0"))
+
+
+class ProviderRegistry:
+    """Lazily constructed external clients (embeddings, LLM, vector store).
+
+    Nothing is created at import; the first `get` builds the provider (under a
+    per-provider lock) and later calls return the same instance. `status`
+    reports what has been built and how long it took, for the readiness probe.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable] = {}
+        self._instances: Dict[str, object] = {}
+        self._errors: Dict[str, str] = {}
+        self._init_seconds: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+
+    def register(self, name: str, factory: Callable):
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+
+    def get(self, name: str):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._locks[name]:
+            if name not in self._instances:
+                started = time.perf_counter()
+                try:
+                    self._instances[name] = self._factories[name]()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+                self._errors.pop(name, None)
+                self._init_seconds[name] = time.perf_counter() - started
+            return self._instances[name]
+
+    def override(self, name: str, instance):
+        """Install a ready-made provider, e.g. a stand-in for tests"""
+        self._instances[name] = instance
+
+    def names(self):
+        return list(self._factories)
+
+    def status(self) -> dict:
+        return {
+            name: {
+                "initialized": name in self._instances,
+                "init_seconds": self._init_seconds.get(name),
+                "error": self._errors.get(name),
+            }
+            for name in self._factories
+        }
+
+
+def _require_env(*names):
+    missing = [name for name in names if not os.getenv(name)]
+    if missing:
+        raise RuntimeError("Missing required environment variables: " + ", ".join(missing))
+
+
+def _make_embeddings():
+    from cache.embedding_cache import CachedEmbeddings, get_embedding_cache
+
+    if EMBEDDING_PROVIDER == "fake":
+        from config.fake_providers import HashEmbeddings
+        return CachedEmbeddings(
+            HashEmbeddings(PINECONE_DIMENSION, FAKE_EMBEDDING_LATENCY_MS),
+            get_embedding_cache("fake-hash", PINECONE_DIMENSION)
+        )
+
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    _require_env("GOOGLE_API_KEY")
+    return CachedEmbeddings(
+        GoogleGenerativeAIEmbeddings(model=GOOGLE_EMBEDDING_MODEL),
+        get_embedding_cache(GOOGLE_EMBEDDING_MODEL, PINECONE_DIMENSION)
+    )
+
+
+def _make_llm():
+    if LLM_PROVIDER == "fake":
+        from config.fake_providers import FakeChatModel
+        options = {"response": FAKE_LLM_RESPONSE} if FAKE_LLM_RESPONSE else {}
+        return FakeChatModel(
+            mode=FAKE_LLM_MODE,
+            latency_ms=FAKE_LLM_LATENCY_MS,
+            token_delay_ms=FAKE_LLM_TOKEN_DELAY_MS,
+            **options
+        )
+
+    from langchain_groq import ChatGroq
+
+    _require_env("GROQ_API_KEY")
+    return ChatGroq(temperature=0.3, model_name=GROQ_MODEL, groq_api_key=os.getenv("GROQ_API_KEY"))
+
+
+def _make_vector_store():
+    from vectordb.factory import create_vector_store
+    return create_vector_store()
+
+
+def _make_lexical_index():
+    from vectordb.lexical import BM25Index
+    return BM25Index()
+
+
+providers = ProviderRegistry()
+providers.register("embeddings", _make_embeddings)
+providers.register("llm", _make_llm)
+providers.register("vector_store", _make_vector_store)
+providers.register("lexical_index", _make_lexical_index)
+
+
+def get_embeddings():
+    return providers.get("embeddings")
+
+
+def get_llm():
+    return providers.get("llm")
+
+
+def get_vector_store():
+    return providers.get("vector_store")
+
+
+def get_lexical_index():
+    return providers.get("lexical_index")
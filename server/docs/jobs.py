@@ -0,0 +1,132 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional
+from docs.models import IngestJob
+from docs.vectorstore import run_ingest_job, discard_failed_upload
+from monitoring.metrics import in_flight
+
+logger = logging.getLogger(__name__)
+
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_MAX_QUEUED = int(os.getenv("INGEST_MAX_QUEUED", "100"))
+# Finished jobs kept around for status polling
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "500"))
+
+
+class IngestionQueue:
+    """Bounded asyncio queue drained by a fixed pool of ingestion workers.
+
+    Jobs for the same document run one at a time: each reads the version
+    the previous one recorded, so versions never interleave. A job dequeued
+    while its document is busy is parked and run by the worker holding it.
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS, max_queued: int = INGEST_MAX_QUEUED):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # doc_id -> jobs waiting for the one currently ingesting that document
+        self._parked: Dict[str, Deque[IngestJob]] = {}
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.doc_id in self._parked:
+                    self._parked[job.doc_id].append(job)
+                    continue
+                self._parked[job.doc_id] = deque()
+                await self._run_document(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_document(self, job: IngestJob):
+        """Run `job`, then every job parked behind it for the same document"""
+        doc_id = job.doc_id
+        try:
+            while True:
+                await self._run(job)
+                if not self._parked[doc_id]:
+                    break
+                job = self._parked[doc_id].popleft()
+        finally:
+            for parked in self._parked.pop(doc_id):
+                parked.status = "failed"
+                parked.error = "cancelled"
+
+    async def _run(self, job: IngestJob):
+        try:
+            with in_flight.track(operation="ingest_job"):
+                await run_ingest_job(job)
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        if job.status == "failed":
+            try:
+                await discard_failed_upload(job)
+            except Exception as e:
+                logger.warning("Could not discard failed upload of %s: %s", job.filename, e)
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in ("completed", "failed")]
+        for job_id in finished[:max(0, len(self.jobs) - INGEST_JOB_HISTORY)]:
+            del self.jobs[job_id]
+
+    async def submit(self, job: IngestJob) -> IngestJob:
+        """Enqueue a job; raises asyncio.QueueFull when the backlog is at capacity"""
+        await self.start()
+        job.status = "queued"
+        self._queue.put_nowait(job)
+        self.jobs[job.job_id] = job
+        self._forget_finished()
+        return job
+
+    async def retry(self, job_id: str) -> Optional[IngestJob]:
+        """Re-enqueue a failed job; it resumes at the stage that failed (a discarded first upload starts over)"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status != "failed":
+            return job
+        return await self.submit(job)
+
+    def has_active(self, doc_id: str) -> bool:
+        """Whether any queued or running job is ingesting into `doc_id`"""
+        return any(job.doc_id == doc_id and job.status in ("queued", "running") for job in self.jobs.values())
+
+    def find_active(self, sha256: str, role: str) -> Optional[IngestJob]:
+        """A queued or running job ingesting the same file for the same role"""
+        for job in self.jobs.values():
+            if job.sha256 == sha256 and job.role == role and job.status in ("queued", "running"):
+                return job
+        return None
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[IngestJob]:
+        return list(self.jobs.values())
+
+    def stats(self) -> dict:
+        counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.workers, "max_queued": self.max_queued, **counts}
+
+
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,65 @@
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+
+@dataclass
+class IngestJob:
+    """State of one uploaded file moving through the ingestion stages.
+
+    Stage outputs are kept on the job so a retry resumes at the stage that
+    failed instead of starting over.
+    """
+    job_id: str
+    doc_id: str
+    role: str
+    filename: str
+    path: str
+    sha256: Optional[str] = None
+    version: Optional[int] = None
+    status: str = "queued"  # queued | running | completed | failed
+    stage: Optional[str] = None
+    completed_stages: List[str] = field(default_factory=list)
+    progress: Dict[str, int] = field(default_factory=lambda: {
+        "pages_parsed": 0,
+        "chunks_total": 0,
+        "chunks_embedded": 0,
+        "vectors_upserted": 0,
+        "vectors_deleted": 0,
+        "chunks_unchanged": 0,
+    })
+    attempts: Dict[str, int] = field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    page_count: int = 0
+    # (start, end) page ranges parsed independently in the process pool
+    shards: List[Tuple[int, int]] = field(default_factory=list, repr=False)
+    # Chunk hashes of the document version this upload replaces
+    previous_hashes: Set[str] = field(default_factory=set, repr=False)
+    # shard start -> hashes of every chunk in the shard
+    shard_hashes: Dict[int, List[str]] = field(default_factory=dict, repr=False)
+    # shard start -> (pages, chunks needing embedding) once the shard has been parsed
+    shard_stats: Dict[int, Tuple[int, int]] = field(default_factory=dict, repr=False)
+    # (shard start, chunk offset) -> vectors upserted for that batch
+    completed_batches: Dict[Tuple[int, int], int] = field(default_factory=dict, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "doc_id": self.doc_id,
+            "role": self.role,
+            "filename": self.filename,
+            "sha256": self.sha256,
+            "version": self.version,
+            "page_count": self.page_count,
+            "status": self.status,
+            "stage": self.stage,
+            "completed_stages": list(self.completed_stages),
+            "progress": dict(self.progress),
+            "attempts": dict(self.attempts),
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
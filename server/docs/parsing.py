@@ -0,0 +1,94 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+
+PARSE_PROCESSES = int(os.getenv("PARSE_PROCESSES", str(os.cpu_count() or 1)))
+PARSE_PAGES_PER_SHARD = int(os.getenv("PARSE_PAGES_PER_SHARD", "16"))
+# Shards submitted ahead of the consumer; parsed chunks wait in memory until they are embedded
+PARSE_SHARDS_IN_FLIGHT = int(os.getenv("PARSE_SHARDS_IN_FLIGHT", str(PARSE_PROCESSES * 2)))
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that already runs an event loop and threads is unsafe
+        _pool = ProcessPoolExecutor(max_workers=PARSE_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_parse_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+def count_pages(path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def plan_shards(page_count: int, pages_per_shard: int = PARSE_PAGES_PER_SHARD) -> List[Tuple[int, int]]:
+    """Split [0, page_count) into contiguous (start, end) page ranges"""
+    return [(start, min(start + pages_per_shard, page_count)) for start in range(0, page_count, pages_per_shard)]
+
+
+def parse_shard(path: str, start: int, end: int) -> Tuple[int, list]:
+    """Extract and split pages [start, end) of a PDF; runs in a worker process.
+
+    Returns the number of pages read and the chunks, which carry the same
+    `page` metadata PyPDFLoader would have set.
+    """
+    from pypdf import PdfReader
+    from langchain_core.documents import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    reader = PdfReader(path)
+    pages = [
+        Document(
+            page_content=reader.pages[page_number].extract_text(extraction_mode="plain").strip(),
+            metadata={"source": path, "page": page_number},
+        )
+        for page_number in range(start, end)
+    ]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return len(pages), splitter.split_documents(pages)
+
+
+async def iter_parsed_shards(path: str, shards: List[Tuple[int, int]], in_flight: int = PARSE_SHARDS_IN_FLIGHT):
+    """Parse shards in the process pool, yielding (shard_start, pages, chunks) as each finishes.
+
+    At most `in_flight` shards are submitted or waiting to be consumed at a
+    time, and the next one is submitted only once an earlier one has been
+    taken, so a slow consumer bounds how much parsed text is held.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_parse_pool()
+
+    async def run(start, end):
+        pages, chunks = await loop.run_in_executor(pool, parse_shard, path, start, end)
+        return start, pages, chunks
+
+    pending_shards = iter(shards)
+    tasks = set()
+    try:
+        while True:
+            for start, end in pending_shards:
+                tasks.add(asyncio.ensure_future(run(start, end)))
+                if len(tasks) >= max(1, in_flight):
+                    break
+            if not tasks:
+                return
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
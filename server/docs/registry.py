@@ -0,0 +1,113 @@
+import time
+import hashlib
+from typing import Iterable, List, Optional
+from pymongo.errors import DuplicateKeyError
+from config.db import get_db
+
+
+def chunk_hash(text: str, page: int) -> str:
+    """Identity of a chunk across document versions.
+
+    The page is part of the hash so unchanged text that moved to another page
+    gets fresh metadata; its embedding still comes from the embedding cache.
+    """
+    return hashlib.sha256(f"{page}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def vector_id(doc_id: str, hash_: str) -> str:
+    return f"{doc_id}-{hash_}"
+
+
+def _summary(document: dict) -> dict:
+    current = document["versions"][-1] if document.get("versions") else {}
+    return {
+        "doc_id": document["_id"],
+        "source": document["source"],
+        "role": document["role"],
+        "version": current.get("version", 0),
+        "sha256": current.get("sha256"),
+        "chunks": len(current.get("chunk_hashes", [])),
+        "versions": len(document.get("versions", [])),
+        "updated_at": current.get("created_at"),
+    }
+
+
+async def find_document(source: str, role: str) -> Optional[dict]:
+    """The registered document a re-upload of `source` for `role` should replace"""
+    return await get_db().documents.find_one({"source": source, "role": role})
+
+
+async def find_by_sha(sha256: str, role: str) -> Optional[dict]:
+    """A document whose current version is exactly this file"""
+    document = await get_db().documents.find_one({"role": role, "current_sha256": sha256})
+    return _summary(document) if document else None
+
+
+async def get_document(doc_id: str) -> Optional[dict]:
+    return await get_db().documents.find_one({"_id": doc_id})
+
+
+async def current_chunk_hashes(doc_id: str) -> List[str]:
+    document = await get_document(doc_id)
+    if not document or not document.get("versions"):
+        return []
+    return document["versions"][-1]["chunk_hashes"]
+
+
+async def list_documents(role: Optional[str] = None) -> List[dict]:
+    query = {"role": role} if role else {}
+    return [_summary(document) for document in await get_db().documents.find(query).to_list(None)]
+
+
+async def claim_document(source: str, role: str, doc_id: str) -> str:
+    """Register `source` for `role` under `doc_id` before anything is indexed; returns the doc_id that holds it.
+
+    Concurrent first uploads of the same file race on the unique (source, role)
+    index here, so the loser indexes under the winner's doc_id instead of
+    writing vectors for a document that can never be recorded.
+    """
+    existing = await find_document(source, role)
+    if existing:
+        return existing["_id"]
+    try:
+        await get_db().documents.insert_one(
+            {"_id": doc_id, "source": source, "role": role, "current_sha256": None, "versions": []}
+        )
+        return doc_id
+    except DuplicateKeyError:
+        existing = await find_document(source, role)
+        if existing is None:
+            raise
+        return existing["_id"]
+
+
+async def release_claim(doc_id: str) -> None:
+    """Drop a claimed document that never got a version"""
+    await get_db().documents.delete_one({"_id": doc_id, "versions": []})
+
+
+async def record_version(doc_id: str, source: str, role: str, sha256: Optional[str], chunk_hashes: Iterable[str]) -> int:
+    """Append a version holding the document's current chunk hashes; returns its number"""
+    document = await get_document(doc_id)
+    version = len(document["versions"]) + 1 if document else 1
+    await get_db().documents.update_one(
+        {"_id": doc_id},
+        {
+            "$set": {"source": source, "role": role, "current_sha256": sha256},
+            "$push": {"versions": {
+                "version": version,
+                "sha256": sha256,
+                "chunk_hashes": sorted(set(chunk_hashes)),
+                "created_at": time.time(),
+            }},
+        },
+        upsert=True,
+    )
+    return version
+
+
+async def delete_document(doc_id: str) -> Optional[dict]:
+    document = await get_document(doc_id)
+    if document:
+        await get_db().documents.delete_one({"_id": doc_id})
+    return document
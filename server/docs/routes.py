@@ -1,25 +1,133 @@
+import asyncio
+from typing import Optional
 from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
-from auth.routes import get_current_user
-from docs.vectorstore import load_vectorstore
+from fastapi.responses import JSONResponse
+from auth.routes import require_admin
+from docs.models import IngestJob
+from docs.vectorstore import save_upload, find_ingested, UploadTooLarge
+from docs.jobs import ingestion_queue
+from docs import registry
+from cache.answer_cache import answer_cache
+from config.providers import get_vector_store, get_lexical_index
 import uuid
 
 router = APIRouter()
 
 
-@router.post("/upload_docs")
+@router.post("/upload_docs", status_code=202)
 async def upload_docs(
-    user=Depends(get_current_user),
+    user=Depends(require_admin),
     file: UploadFile = File(...),
     role: str = Form(...)
 ):
-    if user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Only admin can upload files")
+    try:
+        path, sha256 = await save_upload(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    # Identical file already ingested (or being ingested) for this role: nothing to do
+    existing_doc_id = await find_ingested(sha256, role)
+    if existing_doc_id:
+        return JSONResponse({
+            "message": f"{file.filename} was already uploaded",
+            "doc_id": existing_doc_id,
+            "accessible_to": role,
+            "duplicate": True
+        })
+    active = ingestion_queue.find_active(sha256, role)
+    if active:
+        return {
+            "message": f"{file.filename} is already being ingested",
+            "job_id": active.job_id,
+            "doc_id": active.doc_id,
+            "accessible_to": role,
+            "duplicate": True,
+            "status_url": f"/upload_docs/jobs/{active.job_id}"
+        }
+
+    # A re-upload of the same source for the same role becomes a new version of that document
+    # Claimed before queueing so concurrent first uploads share one doc_id
+    doc_id = await registry.claim_document(file.filename, role, str(uuid.uuid4()))
+    job = IngestJob(
+        job_id=str(uuid.uuid4()), doc_id=doc_id, role=role, filename=file.filename, path=path, sha256=sha256
+    )
+    try:
+        await ingestion_queue.submit(job)
+    except asyncio.QueueFull:
+        if not ingestion_queue.has_active(doc_id):
+            await registry.release_claim(doc_id)
+        raise HTTPException(status_code=503, detail="Ingestion queue is full, try again later")
 
-    doc_id = str(uuid.uuid4())
-    await load_vectorstore([file], role, doc_id)
     return {
-        "message": f"{file.filename} uploaded successfully",
+        "message": f"{file.filename} accepted for ingestion",
+        "job_id": job.job_id,
         "doc_id": doc_id,
-        "accessible_to": role
+        "accessible_to": role,
+        "status_url": f"/upload_docs/jobs/{job.job_id}"
+    }
+
+
+@router.get("/upload_docs/jobs")
+async def list_jobs(user=Depends(require_admin)):
+    return [job.to_dict() for job in ingestion_queue.list()]
+
+
+@router.get("/upload_docs/jobs/{job_id}")
+async def job_status(job_id: str, user=Depends(require_admin)):
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.post("/upload_docs/jobs/{job_id}/retry", status_code=202)
+async def retry_job(job_id: str, user=Depends(require_admin)):
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "failed":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}, only failed jobs can be retried")
+    try:
+        await ingestion_queue.retry(job_id)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Ingestion queue is full, try again later")
+    return job.to_dict()
+
+
+@router.get("/documents")
+async def list_documents(role: Optional[str] = None, user=Depends(require_admin)):
+    return await registry.list_documents(role)
+
+
+@router.get("/documents/{doc_id}")
+async def get_document(doc_id: str, user=Depends(require_admin)):
+    document = await registry.get_document(doc_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {
+        "doc_id": document["_id"],
+        "source": document["source"],
+        "role": document["role"],
+        "versions": [
+            {key: version[key] for key in ("version", "sha256", "created_at")} | {"chunks": len(version["chunk_hashes"])}
+            for version in document["versions"]
+        ]
     }
 
+
+@router.delete("/documents/{doc_id}")
+async def delete_document(doc_id: str, user=Depends(require_admin)):
+    document = await registry.get_document(doc_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if ingestion_queue.has_active(doc_id):
+        # The job would record a version whose unchanged chunks were just deleted
+        raise HTTPException(status_code=409, detail="A new version of this document is being ingested, try again later")
+
+    hashes = document["versions"][-1]["chunk_hashes"] if document.get("versions") else []
+    ids = [registry.vector_id(doc_id, hash_) for hash_ in hashes]
+    await asyncio.to_thread(get_vector_store().delete, ids)
+    await asyncio.to_thread(get_lexical_index().delete, ids)
+    await registry.delete_document(doc_id)
+    answer_cache.invalidate_role(document["role"])
+    return {"message": f"{document['source']} deleted", "doc_id": doc_id, "vectors_deleted": len(hashes)}
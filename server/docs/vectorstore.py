@@ -1,104 +1,293 @@
 import os
 import time
+import hashlib
+import uuid
+import random
 from pathlib import Path
 from dotenv import load_dotenv
 from tqdm.auto import tqdm
-from pinecone import Pinecone, ServerlessSpec
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from cache.answer_cache import answer_cache
+from config.providers import get_embeddings, get_vector_store, get_lexical_index
+from docs.models import IngestJob
+from docs.parsing import count_pages, plan_shards, iter_parsed_shards
+from docs import registry
+from monitoring.metrics import stage_seconds
 import asyncio
+import logging
 
 
 load_dotenv()
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
-GOOGLE_EMBEDDING_MODEL = os.getenv("GOOGLE_EMBEDDING_MODEL", "gemini-embedding-001")
-PINECONE_DIMENSION = int(os.getenv("PINECONE_DIMENSION", "3072"))
-
-missing = [
-    name
-    for name, value in {
-        "GOOGLE_API_KEY": GOOGLE_API_KEY,
-        "PINECONE_API_KEY": PINECONE_API_KEY,
-        "PINECONE_INDEX_NAME": PINECONE_INDEX_NAME,
-    }.items()
-    if not value
-]
-if missing:
-    raise RuntimeError(
-        "Missing required environment variables: " + ", ".join(missing)
-    )
+logger = logging.getLogger(__name__)
 
-os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
 UPLOAD_DIR = "./uploaded_docs"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_MB", "50")) * 1024 * 1024
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
+INGEST_STAGE_RETRIES = int(os.getenv("INGEST_STAGE_RETRIES", "3"))
+INGEST_RETRY_BACKOFF_SECONDS = float(os.getenv("INGEST_RETRY_BACKOFF_SECONDS", "2"))
+# Chunks per embedding request / upsert; keep within provider batch limits
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_SECONDS = float(os.getenv("EMBED_BACKOFF_SECONDS", "1"))
 
-# Check if index exists, create if not
-existing_indexes = [idx.name for idx in pc.list_indexes()]
+class UploadTooLarge(Exception):
+    pass
 
-if PINECONE_INDEX_NAME not in existing_indexes:
-    from pinecone import ServerlessSpec
-    pc.create_index(
-        name=PINECONE_INDEX_NAME,
-        dimension=PINECONE_DIMENSION,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
-    )
-    print(f"Created new index: {PINECONE_INDEX_NAME}")
-    # Wait for index to be ready
-    import time
-    while not pc.describe_index(PINECONE_INDEX_NAME).status.ready:
-        time.sleep(1)
 
-# Connect to index
-index = pc.Index(PINECONE_INDEX_NAME)
+async def save_upload(file):
+    """Stream an UploadFile to UPLOAD_DIR in chunks, returning (path, sha256).
 
-async def load_vectorstore(uploaded_files, role: str, doc_id: str):
-    embed_model = GoogleGenerativeAIEmbeddings(model=GOOGLE_EMBEDDING_MODEL)
+    The file is stored as <sha256>.pdf, so identical uploads map to the same
+    path; the digest is computed during the copy and reused for dedup.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = Path(UPLOAD_DIR) / f".upload-{uuid.uuid4().hex}.part"
+    try:
+        with open(tmp_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise UploadTooLarge(f"{file.filename} exceeds the {UPLOAD_MAX_BYTES} byte upload limit")
+                digest.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        save_path = Path(UPLOAD_DIR) / f"{digest.hexdigest()}.pdf"
+        os.replace(tmp_path, save_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return str(save_path), digest.hexdigest()
+
+
+async def find_ingested(sha256: str, role: str):
+    """doc_id under which this exact file is the current version for the role, if any"""
+    document = await registry.find_by_sha(sha256, role)
+    return document["doc_id"] if document else None
+
+
+async def plan_stage(job: IngestJob):
+    logger.debug("Loading PDF: %s", job.filename)
+    job.page_count = await asyncio.to_thread(count_pages, job.path)
+    job.shards = plan_shards(job.page_count)
+    # Re-claimed on every run: a failed first upload releases its claim
+    job.doc_id = await registry.claim_document(job.filename, job.role, job.doc_id)
+    logger.debug("%d pages in %d shards", job.page_count, len(job.shards))
+
+
+def is_rate_limited(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    message = str(error).lower()
+    return status == 429 or any(hint in message for hint in ("429", "rate limit", "quota", "resource_exhausted", "resource exhausted"))
+
+
+async def embed_with_backoff(texts):
+    """Embed one batch, backing off exponentially (with jitter) while the provider rate-limits us"""
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        try:
+            with stage_seconds.time(stage="embed_batch"):
+                return await asyncio.to_thread(get_embeddings().embed_documents, texts)
+        except Exception as e:
+            if not is_rate_limited(e) or attempt == EMBED_MAX_RETRIES:
+                raise
+            delay = EMBED_BACKOFF_SECONDS * (2 ** attempt) * (1 + random.random())
+            logger.warning("Embedding rate-limited, retrying in %.1fs", delay)
+            await asyncio.sleep(delay)
+
+
+def _refresh_progress(job: IngestJob):
+    job.progress["pages_parsed"] = sum(pages for pages, _ in job.shard_stats.values())
+    job.progress["chunks_total"] = sum(len(hashes) for hashes in job.shard_hashes.values())
+    job.progress["vectors_upserted"] = sum(job.completed_batches.values())
+    job.updated_at = time.time()
+
+
+def _shard_done(job: IngestJob, start: int) -> bool:
+    if start not in job.shard_stats:
+        return False
+    chunk_count = job.shard_stats[start][1]
+    return all((start, offset) in job.completed_batches for offset in range(0, chunk_count, EMBED_BATCH_SIZE))
+
+
+async def index_stage(job: IngestJob):
+    """Parse, embed and upsert the document as a stream.
+
+    Page shards are parsed in the process pool and, as each finishes, its
+    chunks are cut into EMBED_BATCH_SIZE batches and queued for up to
+    EMBED_CONCURRENCY embedding workers. Every batch is upserted as soon as
+    its embeddings arrive. Parsing runs at most PARSE_SHARDS_IN_FLIGHT shards
+    ahead of the batch queue, so memory is bounded by the shard and batch
+    sizes rather than the document size. Chunks whose hash is already in the previous version
+    are skipped, as are batches and shards finished by an earlier attempt.
+
+    The previous version is read here rather than when the job is planned:
+    jobs for one document run one at a time, so by now any earlier upload
+    of it has been recorded.
+    """
+    if not job.completed_batches:
+        job.previous_hashes = set(await registry.current_chunk_hashes(job.doc_id))
+        logger.debug("%d chunks in the previous version of %s", len(job.previous_hashes), job.filename)
+    shards = [(start, end) for start, end in job.shards if not _shard_done(job, start)]
+    logger.debug("Indexing %d of %d shards, role: %s", len(shards), len(job.shards), job.role)
+
+    # Batches embedded but not upserted before a failure are embedded again
+    _refresh_progress(job)
+    job.progress["chunks_embedded"] = job.progress["vectors_upserted"]
+    batches = asyncio.Queue(maxsize=EMBED_CONCURRENCY * 2)
 
+    async def produce():
+        async for start, pages, chunks in iter_parsed_shards(job.path, shards):
+            hashes = [registry.chunk_hash(chunk.page_content, chunk.metadata.get("page", 0)) for chunk in chunks]
+            job.shard_hashes[start] = hashes
+            chunks = [
+                (hash_, chunk) for hash_, chunk in zip(hashes, chunks) if hash_ not in job.previous_hashes
+            ]
+            job.shard_stats[start] = (pages, len(chunks))
+            _refresh_progress(job)
+            for offset in range(0, len(chunks), EMBED_BATCH_SIZE):
+                if (start, offset) not in job.completed_batches:
+                    await batches.put((start, offset, chunks[offset:offset + EMBED_BATCH_SIZE]))
+        for _ in range(EMBED_CONCURRENCY):
+            await batches.put(None)
+
+    async def consume(progress):
+        while (batch := await batches.get()) is not None:
+            start, offset, batch_chunks = batch
+            chunks = [chunk for _, chunk in batch_chunks]
+            # Chunks already embedded (e.g. moved to another page) are served from the cache
+            embeddings = await embed_with_backoff([chunk.page_content for chunk in chunks])
+            job.progress["chunks_embedded"] += len(embeddings)
+
+            ids = [registry.vector_id(job.doc_id, hash_) for hash_, _ in batch_chunks]
+            metadatas = [
+                {
+                    "text": chunk.page_content,
+                    "source": job.filename,
+                    "doc_id": job.doc_id,
+                    "role": job.role,
+                    "page": chunk.metadata.get("page", 0)
+                }
+                for chunk in chunks
+            ]
+            with stage_seconds.time(stage="upsert"):
+                await asyncio.to_thread(get_vector_store().upsert, zip(ids, embeddings, metadatas))
+            with stage_seconds.time(stage="lexical_index"):
+                await asyncio.to_thread(get_lexical_index().add, zip(ids, metadatas))
+            job.completed_batches[(start, offset)] = len(ids)
+            _refresh_progress(job)
+            progress.update(len(ids))
+
+    with tqdm(initial=job.progress["vectors_upserted"], desc="Embedding + upserting", unit="chunk",
+              disable=not logger.isEnabledFor(logging.INFO)) as progress:
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(consume(progress)) for _ in range(EMBED_CONCURRENCY)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop sibling tasks so a retry does not race with leftovers of this attempt
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+
+async def finalize_stage(job: IngestJob):
+    """Delete chunks that vanished from the document and record the new version"""
+    current_hashes = {hash_ for hashes in job.shard_hashes.values() for hash_ in hashes}
+    vanished = job.previous_hashes - current_hashes
+    if vanished:
+        ids = [registry.vector_id(job.doc_id, hash_) for hash_ in vanished]
+        await asyncio.to_thread(get_vector_store().delete, ids)
+        await asyncio.to_thread(get_lexical_index().delete, ids)
+    job.progress["vectors_deleted"] = len(vanished)
+    job.progress["chunks_unchanged"] = len(job.previous_hashes & current_hashes)
+
+    job.version = await registry.record_version(job.doc_id, job.filename, job.role, job.sha256, current_hashes)
+    logger.info("%s v%d: %d upserted, %d deleted, %d unchanged", job.filename, job.version,
+                job.progress["vectors_upserted"], len(vanished), job.progress["chunks_unchanged"])
+
+    # Answers cached for this role may now be incomplete or stale
+    answer_cache.invalidate_role(job.role)
+
+
+INGEST_STAGES = [
+    ("plan", plan_stage),
+    ("index", index_stage),
+    ("finalize", finalize_stage),
+]
+
+
+async def run_ingest_job(job: IngestJob) -> IngestJob:
+    """Run the stages a job has not completed yet, retrying each with backoff"""
+    job.status = "running"
+    job.error = None
+    for name, stage in INGEST_STAGES:
+        if name in job.completed_stages:
+            continue
+        job.stage = name
+        job.updated_at = time.time()
+        while True:
+            job.attempts[name] = job.attempts.get(name, 0) + 1
+            try:
+                await stage(job)
+                break
+            except Exception as e:
+                logger.warning("Stage %s failed for %s (attempt %d): %s", name, job.filename, job.attempts[name], e)
+                # Each (re)submission of the job gets INGEST_STAGE_RETRIES attempts per stage
+                if job.attempts[name] % INGEST_STAGE_RETRIES == 0:
+                    job.status = "failed"
+                    job.error = f"{name}: {e}"
+                    job.updated_at = time.time()
+                    return job
+                await asyncio.sleep(INGEST_RETRY_BACKOFF_SECONDS * job.attempts[name])
+        job.completed_stages.append(name)
+        job.updated_at = time.time()
+
+    job.status = "completed"
+    job.stage = None
+    job.updated_at = time.time()
+    logger.info("Upload complete for %s", job.filename)
+    return job
+
+
+async def discard_failed_upload(job: IngestJob):
+    """Delete the vectors a failed job wrote that no recorded version references.
+
+    A failed first upload also releases its registry claim. Either way the
+    job starts over from the plan stage if it is retried; unchanged chunks
+    come back from the embedding cache.
+    """
+    current = set(await registry.current_chunk_hashes(job.doc_id))
+    written = {hash_ for hashes in job.shard_hashes.values() for hash_ in hashes} - current
+    if written:
+        ids = [registry.vector_id(job.doc_id, hash_) for hash_ in written]
+        await asyncio.to_thread(get_vector_store().delete, ids)
+        await asyncio.to_thread(get_lexical_index().delete, ids)
+        logger.info("Discarded %d vectors of failed upload %s", len(ids), job.filename)
+    if not current:
+        await registry.release_claim(job.doc_id)
+    job.completed_stages.clear()
+    job.shard_hashes.clear()
+    job.shard_stats.clear()
+    job.completed_batches.clear()
+    job.progress["chunks_embedded"] = 0
+    _refresh_progress(job)
+
+
+async def load_vectorstore(uploaded_files, role: str, doc_id: str):
+    """Ingest files inline, without going through the background job queue"""
     for file in uploaded_files:
-        save_path = Path(UPLOAD_DIR) / file.filename
-        with open(save_path, "wb") as f:
-            f.write(file.file.read())
-
-        print(f"[UPLOAD DEBUG] Loading PDF: {file.filename}")
-        loader = PyPDFLoader(str(save_path))
-        documents = loader.load()
-        print(f"[UPLOAD DEBUG] Loaded {len(documents)} pages")
-
-        splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-        chunks = splitter.split_documents(documents)
-        print(f"[UPLOAD DEBUG] Split into {len(chunks)} chunks")
-
-        texts = [chunk.page_content for chunk in chunks]
-        ids = [f"{doc_id}-{i}" for i in range(len(chunks))]
-        metadatas = [
-            {
-                "text": chunk.page_content,
-                "source": file.filename,
-                "doc_id": doc_id,
-                "role": role,
-                "page": chunk.metadata.get("page", 0)
-            }
-            for i, chunk in enumerate(chunks)
-        ]
-        
-        print(f"[UPLOAD DEBUG] Sample metadata: {metadatas[0] if metadatas else 'None'}")
-        print(f"[UPLOAD DEBUG] Role assigned: {role}")
-
-        print(f"Embedding {len(texts)} chunks...")
-        # Run embedding in main thread
-        embeddings = await asyncio.to_thread(embed_model.embed_documents,texts)
-        print(f"[UPLOAD DEBUG] Created {len(embeddings)} embeddings")
-
-        print("Uploading to Pinecone...")
-        with tqdm(total=len(embeddings), desc="Upserting to Pinecone") as progress:
-            index.upsert(vectors=zip(ids, embeddings, metadatas))
-            progress.update(len(embeddings))
-
-        print(f"Upload complete for {file.filename}")
+        path, sha256 = await save_upload(file)
+        if await find_ingested(sha256, role):
+            logger.info("%s already ingested for %s, skipping", file.filename, role)
+            continue
+        job = IngestJob(
+            job_id=str(uuid.uuid4()), doc_id=await registry.claim_document(file.filename, role, doc_id), role=role,
+            filename=file.filename, path=path, sha256=sha256
+        )
+        await run_ingest_job(job)
+        if job.status == "failed":
+            await discard_failed_upload(job)
+            raise RuntimeError(f"Ingestion of {file.filename} failed at {job.error}")
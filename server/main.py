@@ -1,13 +1,67 @@
-from fastapi import FastAPI
+import time
+
+_import_started = time.perf_counter()
+
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from auth.routes import router as auth_router
 from docs.routes import router as docs_router
 from chat.routes import router as chat_router
+from chat.sessions import session_store
+from cache.embedding_cache import embedding_cache_stats
+from cache.answer_cache import answer_cache
+from auth.user_cache import auth_cache_stats
+from auth.hash_utils import hashing_stats
+from docs.jobs import ingestion_queue
+from docs.parsing import shutdown_parse_pool
+from config.db import init_db, close_db, get_db
+from config.providers import providers
+from monitoring.metrics import metrics, Counter, Gauge, http_in_flight, http_requests, http_seconds
+
+# DEBUG logs every query and retrieved chunk; use WARNING in production to keep request paths quiet
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+# Build external clients in the background at startup instead of on the first request
+WARMUP_PROVIDERS = os.getenv("WARMUP_PROVIDERS", "false").lower() == "true"
+
+cold_start = {"import_seconds": None, "startup_seconds": None}
+
+
+async def warm_up_providers():
+    for name in providers.names():
+        try:
+            await asyncio.to_thread(providers.get, name)
+        except Exception as e:
+            logger.warning("Provider %s failed to initialise: %s", name, e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    await init_db()
+    await ingestion_queue.start()
+    if WARMUP_PROVIDERS:
+        asyncio.create_task(warm_up_providers())
+    cold_start["startup_seconds"] = time.perf_counter() - started
+    logger.info("Cold start: import %.3fs, startup %.3fs", cold_start["import_seconds"], cold_start["startup_seconds"])
+    yield
+    await ingestion_queue.stop()
+    shutdown_parse_pool()
+    await close_db()
+
 
 app = FastAPI(
     title="Healthcare RBAC Assistant API",
     description="RAG-based healthcare assistant with role-based access control",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Enable CORS for Streamlit frontend
@@ -19,17 +73,95 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+
+@app.middleware("http")
+async def record_http_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    with http_in_flight.track(method=request.method):
+        response = await call_next(request)
+    # Label by route template, not raw path, so ids in URLs do not explode the series count
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    http_requests.inc(method=request.method, route=route, status=response.status_code)
+    http_seconds.observe(time.perf_counter() - started, method=request.method, route=route)
+    return response
+
+
 app.include_router(auth_router)
 app.include_router(docs_router)
 app.include_router(chat_router)
 
+cold_start["import_seconds"] = time.perf_counter() - _import_started
+
 
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "message": "Healthcare RBAC API is running"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Ready when the database answers and every external provider can be constructed"""
+    checks = {}
+    try:
+        await asyncio.wait_for(get_db().ping(), timeout=5)
+        checks["database"] = {"ok": True}
+    except Exception as e:
+        checks["database"] = {"ok": False, "error": str(e)}
+
+    for name in providers.names():
+        try:
+            await asyncio.to_thread(providers.get, name)
+        except Exception:
+            pass
+    for name, status in providers.status().items():
+        checks[name] = {"ok": status["initialized"], **status}
+
+    ready = all(check["ok"] for check in checks.values())
+    return JSONResponse(
+        {"ready": ready, "checks": checks, "cold_start": cold_start},
+        status_code=200 if ready else 503
+    )
+
+
 @app.get("/")
 def root():
     return {"message": "Healthcare RBAC RAG Assistant API", "docs": "/docs"}
 
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {"embeddings": embedding_cache_stats(), "answers": answer_cache.stats(), "auth": auth_cache_stats(), "hashing": hashing_stats()}
+
+
+def collect_component_metrics():
+    """Cache hit ratios and queue gauges, read from each component's stats at scrape time"""
+    hits = Counter("rag_cache_hits_total", "Cache hits since startup", ("cache",))
+    misses = Counter("rag_cache_misses_total", "Cache misses since startup", ("cache",))
+    ratio = Gauge("rag_cache_hit_ratio", "Fraction of cache lookups served from the cache", ("cache",))
+    caches = {f"embeddings:{stats['model']}": stats for stats in embedding_cache_stats()}
+    caches["answers"] = answer_cache.stats()
+    caches.update({f"auth_{name}": stats for name, stats in auth_cache_stats().items()})
+    for cache, stats in caches.items():
+        hits.inc(stats["hits"], cache=cache)
+        misses.inc(stats["misses"], cache=cache)
+        ratio.set(stats["hit_rate"], cache=cache)
+
+    jobs = Gauge("rag_ingest_jobs", "Ingestion jobs known to the queue, by status", ("status",))
+    job_stats = ingestion_queue.stats()
+    for status in ("queued", "running", "completed", "failed"):
+        jobs.set(job_stats[status], status=status)
+    hashing = Gauge("rag_password_hashes_pending", "Password hash/verify calls queued or running")
+    hashing.set(hashing_stats()["pending"])
+    sessions = Gauge("rag_chat_sessions", "Chat sessions held in memory")
+    sessions.set(session_store.stats()["sessions"])
+    return [hits, misses, ratio, jobs, hashing, sessions]
+
+
+metrics.add_collector(collect_component_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus text exposition format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
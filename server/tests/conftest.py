@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import time
+import pytest
+
+# Offline providers and scratch storage; set before any app module reads its configuration
+DATA_DIR = tempfile.mkdtemp(prefix="medical-assistant-tests-")
+os.environ.update({
+    "DB_BACKEND": "memory",
+    "VECTOR_BACKEND": "local",
+    "EMBEDDING_PROVIDER": "fake",
+    "LLM_PROVIDER": "fake",
+    "FAKE_LLM_MODE": "echo",
+    "PINECONE_DIMENSION": "256",
+    "LOCAL_VECTOR_PATH": os.path.join(DATA_DIR, "vector_index"),
+    "LEXICAL_INDEX_PATH": os.path.join(DATA_DIR, "lexical_index"),
+    "EMBEDDING_CACHE_PATH": os.path.join(DATA_DIR, "embedding_cache.sqlite3"),
+    "INGEST_RETRY_BACKOFF_SECONDS": "0",
+    "LOG_LEVEL": "WARNING",
+})
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploaded_docs")
+SAMPLE_PDF = os.path.join(SAMPLE_DIR, "DIABETES.pdf")
+OTHER_PDF = os.path.join(SAMPLE_DIR, "Plant Epidemiology.pdf")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    from fastapi.testclient import TestClient
+    from docs import vectorstore
+    import main
+
+    upload_dir = vectorstore.UPLOAD_DIR
+    vectorstore.UPLOAD_DIR = str(tmp_path_factory.mktemp("uploads"))
+    try:
+        with TestClient(main.app) as test_client:
+            yield test_client
+    finally:
+        vectorstore.UPLOAD_DIR = upload_dir
+
+
+def signup_and_login(client, username: str, role: str, password: str = "secret") -> dict:
+    """Authorization header for a freshly created user"""
+    client.post("/signup", json={"username": username, "password": password, "role": role})
+    response = client.post("/login", params={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def wait_for_job(client, headers, job_id, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/upload_docs/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} did not finish")
@@ -0,0 +1,72 @@
+import time
+from cache.answer_cache import SemanticAnswerCache, answer_cache
+from config.providers import get_embeddings
+from conftest import SAMPLE_PDF, signup_and_login, wait_for_job
+
+RESULT = {"answer": "Metformin.", "sources": ["DIABETES.pdf"]}
+
+
+def test_lookup_hits_similar_queries_of_the_same_role_and_scope():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store("doctor", [1.0, 0.0], RESULT, "q")
+
+    assert cache.lookup("doctor", [0.99, 0.1]) == RESULT
+    assert cache.lookup("doctor", [0.0, 1.0]) is None
+    assert cache.lookup("nurse", [1.0, 0.0]) is None
+    assert cache.lookup("doctor", [1.0, 0.0], scope=("d1",)) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+
+
+def test_entries_expire_and_are_evicted_least_recent_first():
+    cache = SemanticAnswerCache(threshold=0.99, ttl_seconds=60, max_entries=2)
+    cache.store("doctor", [1.0, 0.0], RESULT, "a")
+    cache.store("doctor", [0.0, 1.0], RESULT, "b")
+    cache.lookup("doctor", [1.0, 0.0])
+    cache.store("doctor", [-1.0, 0.0], RESULT, "c")
+    assert cache.lookup("doctor", [0.0, 1.0]) is None
+    assert cache.lookup("doctor", [1.0, 0.0]) == RESULT
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.lookup("doctor", [1.0, 0.0]) is None
+
+
+def test_invalidate_role_keeps_other_roles():
+    cache = SemanticAnswerCache()
+    cache.store("doctor", [1.0, 0.0], RESULT, "q")
+    cache.store("doctor", [1.0, 0.0], RESULT, "q", scope=("d1",))
+    cache.store("nurse", [1.0, 0.0], RESULT, "q")
+    cache.invalidate_role("doctor")
+    assert cache.lookup("doctor", [1.0, 0.0]) is None
+    assert cache.lookup("doctor", [1.0, 0.0], scope=("d1",)) is None
+    assert cache.lookup("nurse", [1.0, 0.0]) == RESULT
+
+
+def _upload(client, admin, data):
+    response = client.post("/upload_docs", headers=admin, data={"role": "cache-role"},
+                           files={"file": ("cache.pdf", data, "application/pdf")})
+    assert response.status_code == 202, response.text
+    assert wait_for_job(client, admin, response.json()["job_id"])["status"] == "completed"
+    return response.json()["doc_id"]
+
+
+def test_reingest_and_delete_drop_the_roles_cached_answers(client):
+    admin = signup_and_login(client, "cache-admin", "admin")
+    user = signup_and_login(client, "cache-user", "cache-role")
+    question = "Which treatment options are described for diabetes mellitus?"
+    embedding = get_embeddings().embed_query(question)
+    unscoped = ((), ())
+    data = open(SAMPLE_PDF, "rb").read()
+    doc_id = _upload(client, admin, data)
+
+    def ask():
+        client.post("/chat", headers=user, data={"message": question})
+        return answer_cache.lookup("cache-role", embedding, unscoped) is not None
+
+    assert ask()
+    _upload(client, admin, data + b"\n%v2\n")
+    assert answer_cache.lookup("cache-role", embedding, unscoped) is None
+
+    assert ask()
+    assert client.delete(f"/documents/{doc_id}", headers=admin).status_code == 200
+    assert answer_cache.lookup("cache-role", embedding, unscoped) is None
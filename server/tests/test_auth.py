@@ -0,0 +1,50 @@
+from auth.user_cache import user_cache
+from conftest import signup_and_login
+
+
+def test_role_change_revokes_existing_tokens(client):
+    admin = signup_and_login(client, "auth-admin", "admin")
+    nurse = signup_and_login(client, "auth-nurse", "nurse")
+    assert client.get("/me", headers=nurse).json() == {"username": "auth-nurse", "role": "nurse"}
+
+    response = client.patch("/users/auth-nurse/role", headers=admin, params={"role": "doctor"})
+    assert response.status_code == 200
+    assert client.get("/me", headers=nurse).status_code == 401
+
+    doctor = signup_and_login(client, "auth-nurse", "doctor")
+    assert client.get("/me", headers=doctor).json()["role"] == "doctor"
+
+
+def test_revocation_survives_a_cold_cache(client):
+    admin = signup_and_login(client, "cold-admin", "admin")
+    old = signup_and_login(client, "cold-user", "nurse")
+    client.patch("/users/cold-user/role", headers=admin, params={"role": "doctor"})
+    # A restarted or different worker only has the database to go on
+    user_cache.clear()
+    assert client.get("/me", headers=old).status_code == 401
+
+
+def test_deleted_user_tokens_stay_revoked_after_signup_again(client):
+    admin = signup_and_login(client, "delete-admin", "admin")
+    old = signup_and_login(client, "recycled", "doctor")
+    assert client.delete("/users/recycled", headers=admin).status_code == 200
+    assert client.get("/me", headers=old).status_code == 401
+
+    client.post("/signup", json={"username": "recycled", "password": "secret", "role": "admin"})
+    user_cache.clear()
+    assert client.get("/me", headers=old).status_code == 401
+
+
+def test_only_admins_manage_users(client):
+    doctor = signup_and_login(client, "plain-doctor", "doctor")
+    response = client.patch("/users/plain-doctor/role", headers=doctor, params={"role": "admin"})
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Admin access required"
+    assert client.get("/upload_docs/jobs", headers=doctor).status_code == 403
+
+
+def test_token_signs_no_role(client):
+    from auth.jwt_utils import verify_token
+    headers = signup_and_login(client, "claims-user", "nurse")
+    payload = verify_token(headers["Authorization"].split(" ")[1])
+    assert "role" not in payload and payload["sub"] == "claims-user"
@@ -0,0 +1,63 @@
+import json
+from chat import chat_query, routes as chat_routes
+from config.providers import get_llm
+from conftest import SAMPLE_PDF, signup_and_login, wait_for_job
+
+QUESTIONS = [
+    "What are the symptoms of diabetes?",
+    "How is type 2 diabetes treated?",
+    "What is a normal blood glucose level?",
+]
+
+
+def ask(client, headers, questions, **filters):
+    response = client.post("/chat/batch", headers=headers, json={"questions": questions, **filters})
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    return {line["index"]: line for line in lines}
+
+
+def test_batch_streams_one_line_per_question(client):
+    admin = signup_and_login(client, "batch-admin", "admin")
+    user = signup_and_login(client, "batch-user", "batch-role")
+    with open(SAMPLE_PDF, "rb") as f:
+        response = client.post("/upload_docs", headers=admin, data={"role": "batch-role"},
+                               files={"file": ("DIABETES.pdf", f, "application/pdf")})
+    wait_for_job(client, admin, response.json()["job_id"])
+
+    results = ask(client, user, QUESTIONS)
+    assert sorted(results) == [0, 1, 2]
+    for index, question in enumerate(QUESTIONS):
+        assert results[index]["question"] == question
+        assert results[index]["answer"] == f"You asked: {question}"
+        assert results[index]["sources"] == ["DIABETES.pdf"]
+
+    # Scoped to a document the role cannot see: nothing is retrieved
+    results = ask(client, user, QUESTIONS[:1], source="other.pdf")
+    assert results[0]["sources"] == []
+
+
+def test_failed_question_does_not_fail_the_batch(client, monkeypatch):
+    user = signup_and_login(client, "batch-user", "batch-role")
+    llm = get_llm()
+
+    class FlakyLLM:
+        def invoke(self, prompt):
+            if "glucose" in prompt.to_string():
+                raise RuntimeError("model overloaded")
+            return llm.invoke(prompt)
+
+    monkeypatch.setattr(chat_query, "get_llm", FlakyLLM)
+    # Fresh phrasing so no answer comes from the cache
+    questions = [question.replace("What", "Which") for question in QUESTIONS]
+    results = ask(client, user, questions)
+    assert results[2] == {"index": 2, "question": questions[2], "error": "model overloaded"}
+    assert results[0]["answer"] == f"You asked: {questions[0]}"
+
+
+def test_batch_size_is_checked(client, monkeypatch):
+    user = signup_and_login(client, "batch-user", "batch-role")
+    assert client.post("/chat/batch", headers=user, json={"questions": []}).status_code == 400
+    monkeypatch.setattr(chat_routes, "BATCH_CHAT_MAX_QUESTIONS", 2)
+    assert client.post("/chat/batch", headers=user, json={"questions": QUESTIONS}).status_code == 400
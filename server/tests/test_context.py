@@ -0,0 +1,59 @@
+import random
+import string
+from chat.context import build_context, estimate_tokens, PASSAGE_SEPARATOR
+
+# Random words of one length: passages share no trigrams and all cost the same tokens
+_rng = random.Random(0)
+SENTENCES = [
+    " ".join("".join(_rng.choices(string.ascii_lowercase, k=7)) for _ in range(10)) + "." for _ in range(12)
+]
+
+
+def match(text, score=1.0, source="guide.pdf", doc_id="d1", page=0):
+    return {"id": f"{doc_id}-{page}-{score}", "score": score,
+            "metadata": {"text": text, "source": source, "doc_id": doc_id, "page": page}}
+
+
+def test_overlapping_chunks_of_a_page_are_merged():
+    text = " ".join(SENTENCES)
+    # Split the way the text splitter does: the second chunk repeats the tail of the first
+    first, second = text[:400], text[300:]
+    context, sources = build_context([match(second, 0.9), match(first, 0.8)], token_budget=10000)
+    assert context == text
+    assert sources == ["guide.pdf"]
+
+
+def test_chunks_of_different_pages_are_not_merged():
+    text = " ".join(SENTENCES)
+    context, _ = build_context([match(text[:400], 0.9, page=1), match(text[300:], 0.8, page=2)], token_budget=10000)
+    assert context == text[:400] + PASSAGE_SEPARATOR + text[300:]
+
+
+def test_near_duplicates_across_documents_are_dropped():
+    text = " ".join(SENTENCES[:6])
+    copy = text.replace(text.split()[-1], "changed")
+    context, sources = build_context([match(text, 0.9, "a.pdf", "d1"), match(copy, 0.8, "b.pdf", "d2")],
+                                     token_budget=10000)
+    assert context == text
+    assert sources == ["a.pdf"]
+
+
+def test_passages_are_packed_best_first_within_the_budget():
+    matches = [match(sentence, score=i, page=i, source=f"{i}.pdf") for i, sentence in enumerate(SENTENCES)]
+    budget = 3 * estimate_tokens(SENTENCES[0]) + 2 * estimate_tokens(PASSAGE_SEPARATOR)
+
+    context, sources = build_context(matches, token_budget=budget)
+
+    assert context.split(PASSAGE_SEPARATOR) == SENTENCES[11:8:-1]
+    assert sources == ["11.pdf", "10.pdf", "9.pdf"]
+
+
+def test_oversized_best_passage_is_truncated_not_dropped():
+    text = " ".join(SENTENCES)
+    context, sources = build_context([match(text)], token_budget=10)
+    assert context == text[:40]
+    assert sources == ["guide.pdf"]
+
+
+def test_empty_matches_give_empty_context():
+    assert build_context([match("   ")]) == ("", [])
@@ -0,0 +1,61 @@
+from cache.embedding_cache import EmbeddingCache, CachedEmbeddings, QUERY_TASK, DOCUMENT_TASK
+
+
+class RecordingEmbeddings:
+    """Distinguishable query and document vectors, counting provider calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_query(self, text):
+        self.calls.append(("query", text))
+        return [1.0, 0.0]
+
+    def embed_documents(self, texts):
+        self.calls.append(("documents", list(texts)))
+        return [[0.0, 1.0] for _ in texts]
+
+
+class TaskTypeEmbeddings(RecordingEmbeddings):
+    def embed_documents(self, texts, task_type=None):
+        self.calls.append((task_type or "documents", list(texts)))
+        return [[1.0, 0.0] if task_type == "RETRIEVAL_QUERY" else [0.0, 1.0] for _ in texts]
+
+
+def test_key_includes_model_dimension_and_task():
+    cache = EmbeddingCache("model-a", 2, path=None)
+    assert cache.key("text", QUERY_TASK) != cache.key("text", DOCUMENT_TASK)
+    assert cache.key("text", QUERY_TASK) != EmbeddingCache("model-b", 2, path=None).key("text", QUERY_TASK)
+    assert cache.key("text", QUERY_TASK) != EmbeddingCache("model-a", 3, path=None).key("text", QUERY_TASK)
+
+
+def test_query_and_document_vectors_never_share_entries():
+    model = RecordingEmbeddings()
+    embeddings = CachedEmbeddings(model, EmbeddingCache("recording", 2, path=None))
+    assert embeddings.embed_documents(["chest pain"]) == [[0.0, 1.0]]
+    assert embeddings.embed_query("chest pain") == [1.0, 0.0]
+    assert embeddings.embed_query("chest pain") == [1.0, 0.0]
+    assert embeddings.embed_documents(["chest pain"]) == [[0.0, 1.0]]
+    assert model.calls == [("documents", ["chest pain"]), ("query", "chest pain")]
+
+
+def test_embed_queries_uses_the_query_task():
+    model = RecordingEmbeddings()
+    embeddings = CachedEmbeddings(model, EmbeddingCache("recording", 2, path=None))
+    embeddings.embed_documents(["fever"])
+    assert embeddings.embed_queries(["fever", "cough", "fever"]) == [[1.0, 0.0]] * 3
+    assert model.calls[1:] == [("query", "fever"), ("query", "cough")]
+
+    batched = TaskTypeEmbeddings()
+    embeddings = CachedEmbeddings(batched, EmbeddingCache("task-type", 2, path=None))
+    assert embeddings.embed_queries(["fever", "cough"]) == [[1.0, 0.0]] * 2
+    assert batched.calls == [("RETRIEVAL_QUERY", ["fever", "cough"])]
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    EmbeddingCache("model", 2, path=path).put_many(["a"], [[0.5, 0.5]], DOCUMENT_TASK)
+    reopened = EmbeddingCache("model", 2, path=path)
+    assert reopened.get_many(["a", "b"], DOCUMENT_TASK) == [[0.5, 0.5], None]
+    assert reopened.get_many(["a"], QUERY_TASK) == [None]
+    assert reopened.disk_hits == 1
@@ -0,0 +1,50 @@
+import numpy as np
+from langchain_core.messages import HumanMessage
+from config.fake_providers import HashEmbeddings, FakeChatModel
+from conftest import SAMPLE_PDF, signup_and_login, wait_for_job
+
+
+def test_hash_embeddings_are_deterministic_and_normalised():
+    embeddings = HashEmbeddings(256)
+    first = embeddings.embed_query("insulin dosage for type 2 diabetes")
+    assert first == HashEmbeddings(256).embed_documents(["insulin dosage for type 2 diabetes"])[0]
+    assert len(first) == 256
+    assert np.isclose(np.linalg.norm(first), 1.0)
+
+
+def test_hash_embeddings_rank_shared_words_higher():
+    embeddings = HashEmbeddings(256)
+    query = np.array(embeddings.embed_query("insulin dosage"))
+    related, unrelated = (np.array(vector) for vector in embeddings.embed_documents(
+        ["recommended insulin dosage for adults", "crop rotation and soil health"]
+    ))
+    assert query @ related > query @ unrelated
+
+
+def test_fake_chat_model_modes():
+    prompt = [HumanMessage(content="Question: what is HbA1c?\nContext: ...")]
+    assert FakeChatModel(mode="echo").invoke(prompt).content == "You asked: what is HbA1c?"
+    assert FakeChatModel(response="fixed").invoke(prompt).content == "fixed"
+    streamed = "".join(chunk.content for chunk in FakeChatModel(response="one two three").stream(prompt))
+    assert streamed == "one two three"
+
+
+def test_upload_and_chat_offline(client):
+    admin = signup_and_login(client, "fake-admin", "admin")
+    doctor = signup_and_login(client, "fake-doctor", "doctor")
+    with open(SAMPLE_PDF, "rb") as f:
+        response = client.post("/upload_docs", headers=admin, data={"role": "doctor"},
+                               files={"file": ("DIABETES.pdf", f, "application/pdf")})
+    assert response.status_code == 202, response.text
+    job = wait_for_job(client, admin, response.json()["job_id"])
+    assert job["status"] == "completed", job["error"]
+    assert job["progress"]["vectors_upserted"] > 0
+
+    answer = client.post("/chat", headers=doctor, data={"message": "What are the symptoms of diabetes?"}).json()
+    assert answer["answer"] == "You asked: What are the symptoms of diabetes?"
+    assert answer["sources"]
+
+    # Documents are only retrieved for the role they were uploaded for
+    nurse = signup_and_login(client, "fake-nurse", "nurse")
+    answer = client.post("/chat", headers=nurse, data={"message": "What are the symptoms of diabetes?"}).json()
+    assert answer["sources"] == []
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from vectordb.filters import build_metadata_filter, matches_filter
+from vectordb.local_store import LocalVectorStore
+from chat import chat_query
+from chat.chat_query import search_for_role, search_many_for_role
+
+DIMENSION = 8
+
+
+def test_build_metadata_filter():
+    assert build_metadata_filter("nurse") == {"role": {"$eq": "nurse"}}
+    assert build_metadata_filter("nurse", doc_ids=["d1"], sources=("a.pdf",)) == {
+        "role": {"$eq": "nurse"}, "doc_id": {"$in": ["d1"]}, "source": {"$in": ["a.pdf"]},
+    }
+
+
+def test_matches_filter():
+    metadata = {"role": "nurse", "doc_id": "d1", "source": "a.pdf"}
+    assert matches_filter(metadata, build_metadata_filter("nurse", ["d1", "d2"]))
+    assert not matches_filter(metadata, build_metadata_filter("doctor"))
+    assert not matches_filter(metadata, build_metadata_filter("nurse", sources=["b.pdf"]))
+
+
+@pytest.fixture
+def query(tmp_path, monkeypatch):
+    """A query whose nearest chunks are doctor chunks, with nurse chunks further away"""
+    rng = np.random.default_rng(0)
+    center = rng.standard_normal(DIMENSION)
+    records = []
+    for i in range(12):
+        role = "doctor" if i < 8 else "nurse"
+        vector = center + (0.01 if role == "doctor" else 1.0) * rng.standard_normal(DIMENSION)
+        records.append((f"{role}-{i}", vector.tolist(), {"role": role, "doc_id": f"d{i % 2}", "text": str(i)}))
+    store = LocalVectorStore(str(tmp_path), DIMENSION)
+    store.upsert(records)
+    monkeypatch.setattr(chat_query, "get_vector_store", lambda: store)
+    return center.tolist()
+
+
+@pytest.mark.parametrize("native", [True, False])
+def test_search_only_returns_the_roles_chunks(query, monkeypatch, native):
+    monkeypatch.setattr(chat_query, "VECTOR_NATIVE_FILTER", native)
+    # The doctor chunks crowd the unfiltered top results; the fallback over-fetches past them
+    monkeypatch.setattr(chat_query, "RETRIEVAL_OVERFETCH_FACTOR", 4)
+
+    matches = search_for_role(query, "nurse", top_k=3)
+
+    assert len(matches) == 3
+    assert all(match["metadata"]["role"] == "nurse" for match in matches)
+
+
+@pytest.mark.parametrize("native", [True, False])
+def test_search_applies_document_filter(query, monkeypatch, native):
+    monkeypatch.setattr(chat_query, "VECTOR_NATIVE_FILTER", native)
+    matches = search_for_role(query, "doctor", top_k=3, doc_ids=["d1"])
+    assert [match["metadata"]["doc_id"] for match in matches] == ["d1"] * 3
+
+
+def test_fallback_returns_fewer_when_overfetch_misses(query, monkeypatch):
+    monkeypatch.setattr(chat_query, "VECTOR_NATIVE_FILTER", False)
+    monkeypatch.setattr(chat_query, "RETRIEVAL_OVERFETCH_FACTOR", 1)
+    # Only the 3 nearest are fetched, all of them doctor chunks
+    assert search_for_role(query, "nurse", top_k=3) == []
+
+
+def test_search_many_matches_search_for_role(query, monkeypatch):
+    monkeypatch.setattr(chat_query, "VECTOR_NATIVE_FILTER", False)
+    single = search_for_role(query, "nurse", top_k=2)
+    assert search_many_for_role([query, query], "nurse", top_k=2) == [single, single]
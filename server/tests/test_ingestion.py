@@ -0,0 +1,92 @@
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from config.providers import get_vector_store, get_embeddings, get_lexical_index
+from docs import registry
+from conftest import SAMPLE_PDF, OTHER_PDF, signup_and_login, wait_for_job
+
+
+def upload(client, headers, data, filename, role):
+    response = client.post("/upload_docs", headers=headers, data={"role": role},
+                           files={"file": (filename, data, "application/pdf")})
+    assert response.status_code == 202, response.text
+    return response.json()
+
+
+def indexed_ids(doc_id):
+    matches = get_vector_store().query(get_embeddings().embed_query("diabetes"), top_k=100000,
+                                       filter={"doc_id": {"$eq": doc_id}})
+    return {match["id"] for match in matches}
+
+
+def current_ids(client, doc_id):
+    hashes = client.portal.call(registry.current_chunk_hashes, doc_id)
+    return {registry.vector_id(doc_id, hash_) for hash_ in hashes}
+
+
+def test_back_to_back_reuploads_leave_only_the_current_version(client):
+    admin = signup_and_login(client, "ingest-admin", "admin")
+    first, second = open(SAMPLE_PDF, "rb").read(), open(OTHER_PDF, "rb").read()
+    initial = upload(client, admin, first, "guide.pdf", "ingest-role")
+    doc_id = initial["doc_id"]
+    assert wait_for_job(client, admin, initial["job_id"])["status"] == "completed"
+
+    jobs = [upload(client, admin, data, "guide.pdf", "ingest-role") for data in (second, first + b"\n%v3\n")]
+    assert {job["doc_id"] for job in jobs} == {doc_id}
+    assert [wait_for_job(client, admin, job["job_id"])["status"] for job in jobs] == ["completed", "completed"]
+
+    versions = client.get(f"/documents/{doc_id}", headers=admin).json()["versions"]
+    assert [version["version"] for version in versions] == [1, 2, 3]
+    assert indexed_ids(doc_id) == current_ids(client, doc_id)
+
+
+def synthetic(tmp_path, pages):
+    # Pages are generated in sequence from the seed, so a longer document extends a shorter one
+    return write_synthetic_pdf(tmp_path / f"{pages}.pdf", pages).read_bytes()
+
+
+def lexical_ids(doc_id):
+    return {match["id"] for match in get_lexical_index().search("patient dose insulin glucose", 100000,
+                                                                filter={"doc_id": {"$eq": doc_id}})}
+
+
+def test_new_versions_embed_changed_chunks_and_delete_vanished_ones(client, tmp_path):
+    admin = signup_and_login(client, "version-admin", "admin")
+    first = upload(client, admin, synthetic(tmp_path, 3), "versioned.pdf", "version-role")
+    doc_id = first["doc_id"]
+    v1 = wait_for_job(client, admin, first["job_id"])
+    v1_ids = current_ids(client, doc_id)
+    assert v1["version"] == 1 and indexed_ids(doc_id) == v1_ids
+
+    # The same bytes again are not ingested twice
+    duplicate = client.post("/upload_docs", headers=admin, data={"role": "version-role"},
+                            files={"file": ("versioned.pdf", synthetic(tmp_path, 3), "application/pdf")})
+    assert duplicate.json()["duplicate"] and duplicate.json()["doc_id"] == doc_id
+
+    # One more page: only its chunks are embedded
+    v2 = wait_for_job(client, admin, upload(client, admin, synthetic(tmp_path, 4), "versioned.pdf", "version-role")["job_id"])
+    v2_ids = current_ids(client, doc_id)
+    assert v2["version"] == 2
+    assert v2["progress"]["chunks_unchanged"] == len(v1_ids)
+    assert v2["progress"]["vectors_upserted"] == len(v2_ids - v1_ids) > 0
+    assert v2["progress"]["vectors_deleted"] == 0
+
+    # Two pages fewer: the chunks of the dropped pages are deleted from both indexes
+    v3 = wait_for_job(client, admin, upload(client, admin, synthetic(tmp_path, 2), "versioned.pdf", "version-role")["job_id"])
+    v3_ids = current_ids(client, doc_id)
+    assert v3["progress"]["vectors_upserted"] == 0
+    assert v3["progress"]["vectors_deleted"] == len(v2_ids - v3_ids) > 0
+    assert indexed_ids(doc_id) == v3_ids
+    assert lexical_ids(doc_id) == v3_ids
+
+
+def test_delete_document_removes_its_vectors(client, tmp_path):
+    admin = signup_and_login(client, "delete-doc-admin", "admin")
+    job = upload(client, admin, synthetic(tmp_path, 2), "deleted.pdf", "delete-role")
+    wait_for_job(client, admin, job["job_id"])
+    doc_id = job["doc_id"]
+    count = len(current_ids(client, doc_id))
+
+    response = client.delete(f"/documents/{doc_id}", headers=admin)
+    assert response.status_code == 200 and response.json()["vectors_deleted"] == count
+    assert indexed_ids(doc_id) == set() and lexical_ids(doc_id) == set()
+    assert client.get(f"/documents/{doc_id}", headers=admin).status_code == 404
+    assert client.delete(f"/documents/{doc_id}", headers=admin).status_code == 404
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from vectordb import ivf_store
+from vectordb.ivf_store import IVFVectorStore, train_kmeans
+from vectordb.local_store import LocalVectorStore
+
+DIMENSION = 16
+
+
+def clustered(count, role, start=0, seed=0):
+    """Vectors around 40 random centres, like chunks of related documents"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((40, DIMENSION))
+    vectors = centres[rng.integers(0, 40, count)] + 0.3 * rng.standard_normal((count, DIMENSION))
+    return [(f"{role}-{start + i}", vector.tolist(), {"role": role, "doc_id": f"d{i % 3}", "text": f"chunk {i}"})
+            for i, vector in enumerate(vectors)]
+
+
+@pytest.fixture(autouse=True)
+def small_partitions(monkeypatch):
+    monkeypatch.setattr(ivf_store, "IVF_MIN_TRAIN_ROWS", 200)
+
+
+def ids(matches):
+    return [match["id"] for match in matches]
+
+
+def test_train_kmeans_returns_unit_centroids():
+    vectors = np.asarray([vector for _, vector, _ in clustered(300, "r")], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    centroids = train_kmeans(vectors, 10)
+    assert centroids.shape == (10, DIMENSION)
+    assert np.allclose(np.linalg.norm(centroids, axis=1), 1.0, atol=1e-5)
+
+
+def test_large_roles_get_an_index_small_ones_stay_exact(tmp_path):
+    store = IVFVectorStore(str(tmp_path), DIMENSION)
+    store.upsert(clustered(400, "doctor") + clustered(50, "nurse"))
+    assert store.index_stats() == {"doctor": {"nlist": 20, "trained_rows": 400, "rows": 400, "nprobe": 8}}
+
+    query = clustered(1, "nurse", seed=7)[0][1]
+    nurse = store.query(query, top_k=5, filter={"role": {"$eq": "nurse"}})
+    assert all(match["id"].startswith("nurse-") for match in nurse)
+    doctor = store.query(query, top_k=5, filter={"role": {"$eq": "doctor"}})
+    assert all(match["id"].startswith("doctor-") for match in doctor)
+
+
+def test_probing_every_list_matches_exact_search(tmp_path):
+    records = clustered(400, "doctor")
+    exact = LocalVectorStore(str(tmp_path / "exact"), DIMENSION)
+    exact.upsert(records)
+    ivf = IVFVectorStore(str(tmp_path / "ivf"), DIMENSION, nprobe=1000)
+    ivf.upsert(records)
+    role = {"role": {"$eq": "doctor"}}
+    queries = [vector for _, vector, _ in clustered(20, "q", seed=3)]
+
+    assert [ids(m) for m in ivf.query_many(queries, 5, filter=role)] == [ids(m) for m in exact.query_many(queries, 5, filter=role)]
+    # Extra filters apply within the probed lists
+    narrowed = ivf.query(queries[0], 5, filter={**role, "doc_id": {"$eq": "d1"}})
+    assert ids(narrowed) == ids(exact.query(queries[0], 5, filter={**role, "doc_id": {"$eq": "d1"}}))
+
+
+def test_probes_scale_with_the_list_count(tmp_path):
+    store = IVFVectorStore(str(tmp_path), DIMENSION, nprobe=0, probe_fraction=0.4)
+    assert [store.probes_for(nlist) for nlist in (1, 8, 100, 134)] == [1, 4, 40, 54]
+    store.nprobe = 16
+    assert [store.probes_for(nlist) for nlist in (8, 100)] == [8, 16]
+
+
+def test_default_probe_recall(tmp_path):
+    records = clustered(2000, "doctor")
+    exact = LocalVectorStore(str(tmp_path / "exact"), DIMENSION)
+    exact.upsert(records)
+    ivf = IVFVectorStore(str(tmp_path / "ivf"), DIMENSION)
+    ivf.upsert(records)
+    role = {"role": {"$eq": "doctor"}}
+    queries = [vector for _, vector, _ in clustered(50, "q", seed=3)]
+
+    found = sum(len(set(ids(a)) & set(ids(e))) for a, e in zip(ivf.query_many(queries, 5, filter=role),
+                                                               exact.query_many(queries, 5, filter=role)))
+    assert found / (5 * len(queries)) >= 0.95
+
+
+def test_index_survives_reload_deletes_and_growth(tmp_path):
+    store = IVFVectorStore(str(tmp_path), DIMENSION)
+    store.upsert(clustered(400, "doctor"))
+    query = clustered(1, "q", seed=5)[0][1]
+    role = {"role": {"$eq": "doctor"}}
+    before = ids(store.query(query, 5, filter=role))
+
+    store.delete(before[:1])
+    reopened = IVFVectorStore(str(tmp_path), DIMENSION)
+    assert reopened.index_stats()["doctor"]["trained_rows"] == 400
+    assert ids(reopened.query(query, 4, filter=role)) == before[1:]
+
+    # Doubling the partition retrains its centroids
+    reopened.upsert(clustered(401, "doctor", start=400, seed=1))
+    assert reopened.index_stats()["doctor"] == {"nlist": 28, "trained_rows": 800, "rows": 800, "nprobe": 12}
+    assert before[0] not in ids(reopened.query(query, 20, filter=role))
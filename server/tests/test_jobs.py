@@ -0,0 +1,111 @@
+import asyncio
+import pytest
+from docs import jobs, vectorstore
+from docs.jobs import IngestionQueue
+from docs.models import IngestJob
+from docs.vectorstore import run_ingest_job, INGEST_STAGE_RETRIES
+
+
+def make_job(doc_id="doc", job_id="job"):
+    return IngestJob(job_id=job_id, doc_id=doc_id, role="doctor", filename="guide.pdf", path="guide.pdf")
+
+
+class Stages:
+    """Stand-ins for the ingestion stages that record their calls and fail on demand"""
+
+    def __init__(self):
+        self.calls = []
+        self.failures = {}
+
+    def stage(self, name):
+        async def run(job):
+            self.calls.append(name)
+            if self.failures.get(name):
+                self.failures[name] -= 1
+                raise RuntimeError(f"{name} broke")
+        return run
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    stages = Stages()
+    monkeypatch.setattr(vectorstore, "INGEST_STAGES", [(name, stages.stage(name)) for name in ("plan", "index", "finalize")])
+    monkeypatch.setattr(vectorstore, "INGEST_RETRY_BACKOFF_SECONDS", 0)
+    return stages
+
+
+def test_transient_stage_failure_is_retried(stages):
+    stages.failures["index"] = INGEST_STAGE_RETRIES - 1
+    job = asyncio.run(run_ingest_job(make_job()))
+
+    assert job.status == "completed" and job.error is None
+    assert stages.calls == ["plan"] + ["index"] * INGEST_STAGE_RETRIES + ["finalize"]
+    assert job.attempts == {"plan": 1, "index": INGEST_STAGE_RETRIES, "finalize": 1}
+    assert job.completed_stages == ["plan", "index", "finalize"]
+
+
+def test_retry_resumes_at_the_failed_stage(stages):
+    stages.failures["finalize"] = INGEST_STAGE_RETRIES
+    job = asyncio.run(run_ingest_job(make_job()))
+
+    assert job.status == "failed"
+    assert job.stage == "finalize"
+    assert job.error == "finalize: finalize broke"
+    assert job.completed_stages == ["plan", "index"]
+
+    stages.calls.clear()
+    job = asyncio.run(run_ingest_job(job))
+    assert job.status == "completed"
+    assert stages.calls == ["finalize"]
+
+
+def test_queue_runs_one_job_per_document_at_a_time(monkeypatch):
+    running, order = set(), []
+
+    async def fake_run(job):
+        assert job.doc_id not in running
+        running.add(job.doc_id)
+        await asyncio.sleep(0.01)
+        order.append(job.job_id)
+        running.discard(job.doc_id)
+        job.status = "completed"
+
+    monkeypatch.setattr(jobs, "run_ingest_job", fake_run)
+
+    async def main():
+        queue = IngestionQueue(workers=3, max_queued=10)
+        for job in [make_job("a", "a1"), make_job("a", "a2"), make_job("b", "b1"), make_job("a", "a3")]:
+            await queue.submit(job)
+        await queue._queue.join()
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(main())
+    assert [job_id for job_id in order if job_id.startswith("a")] == ["a1", "a2", "a3"]
+    assert queue.stats()["completed"] == 4
+
+
+def test_queue_discards_failed_jobs_and_rejects_overflow(monkeypatch):
+    discarded = []
+
+    async def failing_run(job):
+        raise RuntimeError("parse error")
+
+    async def discard(job):
+        discarded.append(job.job_id)
+
+    monkeypatch.setattr(jobs, "run_ingest_job", failing_run)
+    monkeypatch.setattr(jobs, "discard_failed_upload", discard)
+
+    async def main():
+        queue = IngestionQueue(workers=1, max_queued=1)
+        job = await queue.submit(make_job())
+        with pytest.raises(asyncio.QueueFull):
+            await queue.submit(make_job(job_id="overflow"))
+        await queue._queue.join()
+        await queue.stop()
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "failed" and job.error == "parse error"
+    assert discarded == ["job"]
@@ -0,0 +1,106 @@
+import json
+import os
+from vectordb.lexical import BM25Index, tokenize
+from vectordb.local_store import LocalVectorStore
+from chat import chat_query
+from chat.chat_query import fuse_rankings, attach_metadata
+
+CHUNKS = {
+    "a": {"role": "doctor", "doc_id": "d1", "source": "diabetes.pdf", "text": "Metformin lowers HbA1c in type-2 diabetes."},
+    "b": {"role": "doctor", "doc_id": "d1", "source": "diabetes.pdf", "text": "Insulin therapy for type-1 diabetes patients."},
+    "c": {"role": "nurse", "doc_id": "d2", "source": "care.pdf", "text": "Check blood glucose before insulin doses."},
+    "d": {"role": "doctor", "doc_id": "d3", "source": "plants.pdf", "text": "Leaf blight spreads in wet weather."},
+}
+
+
+def build(path):
+    index = BM25Index(str(path))
+    index.add(CHUNKS.items())
+    return index
+
+
+def test_tokenize_keeps_compound_terms():
+    assert tokenize("The HbA1c of E11.9 type-2") == ["hba1c", "e11.9", "e11", "9", "type-2", "type", "2"]
+
+
+def test_search_ranks_by_bm25_and_reports_coverage(tmp_path):
+    index = build(tmp_path)
+    matches = index.search("metformin diabetes", top_k=3)
+
+    assert [m["id"] for m in matches] == ["a", "b"]
+    assert matches[0]["score"] > matches[1]["score"] > 0
+    assert matches[0]["term_coverage"] == 1.0
+    assert matches[1]["term_coverage"] == 0.5
+    assert "metadata" not in matches[0]
+
+
+def test_rare_terms_outweigh_common_ones(tmp_path):
+    index = build(tmp_path)
+    # "insulin" is in two chunks, "glucose" in one
+    assert index.search("insulin glucose", top_k=1)[0]["id"] == "c"
+
+
+def test_search_applies_filter_before_ranking(tmp_path):
+    index = build(tmp_path)
+    matches = index.search("insulin", top_k=5, filter={"role": {"$eq": "nurse"}})
+    assert [m["id"] for m in matches] == ["c"]
+    matches = index.search("diabetes insulin", top_k=5, filter={"doc_id": {"$in": ["d2", "d3"]}})
+    assert [m["id"] for m in matches] == ["c"]
+
+
+def test_delete_and_reload_from_log(tmp_path):
+    index = build(tmp_path)
+    index.delete(["a"])
+
+    reopened = BM25Index(str(tmp_path))
+    assert len(reopened) == 3
+    assert [m["id"] for m in reopened.search("metformin diabetes", top_k=3)] == ["b"]
+    assert reopened.search("metformin diabetes", top_k=3)[0]["score"] == index.search("metformin diabetes", top_k=3)[0]["score"]
+
+
+def test_log_holds_term_counts_not_text(tmp_path):
+    build(tmp_path)
+    log = open(os.path.join(tmp_path, "log.jsonl")).read()
+    assert "Metformin" not in log
+    entry = json.loads(log.splitlines()[0])
+    assert entry == {"op": "add", "id": "a", "fields": ["doctor", "d1", "diabetes.pdf"],
+                     "terms": {term: 1 for term in tokenize(CHUNKS["a"]["text"])}}
+
+
+def test_legacy_log_is_converted_on_load(tmp_path):
+    with open(os.path.join(tmp_path, "log.jsonl"), "w") as f:
+        for record_id, metadata in CHUNKS.items():
+            f.write(json.dumps({"op": "add", "id": record_id, "metadata": metadata}) + "\n")
+
+    index = BM25Index(str(tmp_path))
+    assert index.search("leaf blight", top_k=1)[0]["id"] == "d"
+    assert "metadata" not in open(os.path.join(tmp_path, "log.jsonl")).read()
+
+
+def test_fuse_rankings_sums_reciprocal_ranks():
+    vector = [{"id": "a", "score": 0.9, "metadata": CHUNKS["a"]}, {"id": "b", "score": 0.8, "metadata": CHUNKS["b"]}]
+    lexical = [{"id": "b", "score": 7.0}, {"id": "c", "score": 3.0}]
+
+    fused = fuse_rankings([vector, lexical], top_k=3, k=60)
+
+    assert [m["id"] for m in fused] == ["b", "a", "c"]
+    assert fused[0]["score"] == 1 / 62 + 1 / 61
+    assert fused[1]["score"] == 1 / 61
+    # Metadata from the vector ranking; ids only the lexical index found have none yet
+    assert fused[0]["metadata"] is CHUNKS["b"]
+    assert fused[2]["metadata"] is None
+    assert len(fuse_rankings([vector, lexical], top_k=1)) == 1
+
+
+def test_attach_metadata_reads_lexical_hits_from_vector_store(tmp_path, monkeypatch):
+    store = LocalVectorStore(str(tmp_path), 4)
+    store.upsert([("a", [1.0, 0, 0, 0], CHUNKS["a"]), ("c", [0, 1.0, 0, 0], CHUNKS["c"])])
+    monkeypatch.setattr(chat_query, "get_vector_store", lambda: store)
+    matches = [{"id": "b", "score": 1.0, "metadata": CHUNKS["b"]},
+               {"id": "c", "score": 0.5, "metadata": None},
+               {"id": "gone", "score": 0.2, "metadata": None}]
+
+    attached = attach_metadata(matches)
+
+    assert [m["id"] for m in attached] == ["b", "c"]
+    assert attached[1]["metadata"]["text"] == CHUNKS["c"]["text"]
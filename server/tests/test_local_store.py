@@ -0,0 +1,116 @@
+import json
+import os
+import numpy as np
+import pytest
+from vectordb.local_store import LocalVectorStore, INITIAL_CAPACITY
+from vectordb.compact_store import CompactVectorStore
+from vectordb import ivf_store
+from vectordb.ivf_store import IVFVectorStore
+from vectordb.text_store import TextStore
+
+DIMENSION = 16
+
+
+def records(count, start=0, role="doctor"):
+    rng = np.random.default_rng(start)
+    return [
+        (f"doc-{i}", rng.standard_normal(DIMENSION).tolist(), {"role": role, "doc_id": "doc", "text": f"chunk {i}"})
+        for i in range(start, start + count)
+    ]
+
+
+def top_id(store, vector, **kwargs):
+    return store.query(vector, top_k=1, **kwargs)[0]["id"]
+
+
+@pytest.mark.parametrize("store_class", [LocalVectorStore, CompactVectorStore])
+def test_reload_restores_rows_and_metadata(tmp_path, store_class):
+    batch = records(20)
+    store = store_class(str(tmp_path), DIMENSION)
+    store.upsert(batch)
+    store.delete(["doc-3"])
+
+    reopened = store_class(str(tmp_path), DIMENSION)
+    assert len(reopened) == 19
+    match = reopened.query(batch[5][1], top_k=1)[0]
+    assert match["id"] == "doc-5"
+    assert match["metadata"]["text"] == "chunk 5"
+    assert all(m["id"] != "doc-3" for m in reopened.query(batch[3][1], top_k=20))
+
+
+def test_reload_after_crash_mid_write(tmp_path):
+    batch = records(10)
+    LocalVectorStore(str(tmp_path), DIMENSION).upsert(batch)
+    with open(tmp_path / "metadata.jsonl", "a") as f:
+        # Logged after the last state update, then a torn line from the crash itself
+        f.write(json.dumps({"op": "upsert", "row": 10, "id": "ghost", "metadata": {"role": "doctor"}}) + "\n")
+        f.write('{"op": "upsert", "row": 11, "id": "torn"')
+
+    reopened = LocalVectorStore(str(tmp_path), DIMENSION)
+    assert len(reopened) == 10
+    assert top_id(reopened, batch[7][1]) == "doc-7"
+
+    # Writes after recovery land on fresh rows and survive the next reload
+    extra = records(5, start=10)
+    reopened.upsert(extra)
+    reloaded = LocalVectorStore(str(tmp_path), DIMENSION)
+    assert len(reloaded) == 15
+    assert top_id(reloaded, extra[2][1]) == "doc-12"
+    assert top_id(reloaded, batch[0][1]) == "doc-0"
+
+
+def test_growth_keeps_existing_vectors(tmp_path):
+    first = records(INITIAL_CAPACITY - 1)
+    store = LocalVectorStore(str(tmp_path), DIMENSION)
+    store.upsert(first)
+    second = records(INITIAL_CAPACITY + 10, start=INITIAL_CAPACITY - 1, role="nurse")
+    store.upsert(second)
+
+    reopened = LocalVectorStore(str(tmp_path), DIMENSION)
+    assert len(reopened) == len(first) + len(second)
+    assert top_id(reopened, first[0][1]) == "doc-0"
+    assert top_id(reopened, second[-1][1], filter={"role": {"$eq": "nurse"}}) == second[-1][0]
+
+
+def test_text_store_recovers_from_a_torn_index(tmp_path):
+    store = TextStore(str(tmp_path))
+    assert [store.put("alpha"), store.put("beta")] == [0, 1]
+    with open(tmp_path / "texts.idx", "a") as f:
+        f.write("0123abcd 42")
+    with open(tmp_path / "texts.bin", "ab") as f:
+        f.write(b"unindexed blob")
+
+    reopened = TextStore(str(tmp_path))
+    assert len(reopened) == 2
+    assert reopened.put("gamma") == 2
+    assert reopened.put("alpha") == 0
+
+    reloaded = TextStore(str(tmp_path))
+    assert [reloaded.get(i) for i in range(len(reloaded))] == ["alpha", "beta", "gamma"]
+    assert os.path.getsize(tmp_path / "texts.bin") == reloaded.stats()["bytes"]
+
+
+@pytest.mark.parametrize("store_class", [LocalVectorStore, CompactVectorStore, IVFVectorStore])
+def test_deleted_rows_are_reused(tmp_path, store_class, monkeypatch):
+    monkeypatch.setattr(ivf_store, "IVF_MIN_TRAIN_ROWS", 100)
+    store = store_class(str(tmp_path), DIMENSION)
+    # Re-ingesting a document: its old chunks are deleted and new ones take their rows
+    for version in range(5):
+        old = records(300, start=300 * (version - 1)) if version else []
+        store.upsert(records(300, start=300 * version))
+        store.delete([record[0] for record in old])
+    rows = json.load(open(tmp_path / "state.json"))["rows"]
+    assert rows == 600
+
+    latest = records(300, start=1200)
+    role = {"role": {"$eq": "doctor"}}
+    for reopened in (store, store_class(str(tmp_path), DIMENSION)):
+        assert len(reopened) == 300
+        assert [top_id(reopened, vector, filter=role) for _, vector, _ in latest[::50]] == [r[0] for r in latest[::50]]
+        match = reopened.query(latest[7][1], top_k=1)[0]
+        assert match["metadata"]["text"] == "chunk 1207"
+        assert all(m["id"].startswith("doc-1") and int(m["id"][4:]) >= 1200
+                   for m in reopened.query(latest[0][1], top_k=300))
+
+    reopened.upsert(records(10, start=2000))
+    assert json.load(open(tmp_path / "state.json"))["rows"] == 600
@@ -0,0 +1,43 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from docs import parsing
+
+
+def test_plan_shards_covers_every_page():
+    assert parsing.plan_shards(35, 16) == [(0, 16), (16, 32), (32, 35)]
+    assert parsing.plan_shards(0, 16) == []
+
+
+def test_parsing_stays_a_bounded_distance_ahead_of_the_consumer(monkeypatch):
+    lock = threading.Lock()
+    state = {"submitted": 0, "consumed": 0, "max_ahead": 0}
+
+    def fake_parse(path, start, end):
+        with lock:
+            state["submitted"] += 1
+            state["max_ahead"] = max(state["max_ahead"], state["submitted"] - state["consumed"])
+        return end - start, [f"chunk {start}"]
+
+    pool = ThreadPoolExecutor(max_workers=4)
+    monkeypatch.setattr(parsing, "get_parse_pool", lambda: pool)
+    monkeypatch.setattr(parsing, "parse_shard", fake_parse)
+
+    async def consume():
+        starts = []
+        async for start, pages, chunks in parsing.iter_parsed_shards("doc.pdf", parsing.plan_shards(200, 10), in_flight=3):
+            starts.append(start)
+            with lock:
+                state["consumed"] += 1
+            # A slow embedder: parsing must wait for it rather than run ahead
+            time.sleep(0.005)
+            await asyncio.sleep(0)
+        return starts
+
+    try:
+        starts = asyncio.run(consume())
+    finally:
+        pool.shutdown()
+    assert sorted(starts) == list(range(0, 200, 10))
+    assert state["max_ahead"] <= 3
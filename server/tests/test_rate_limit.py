@@ -0,0 +1,61 @@
+from auth import rate_limit
+from auth.rate_limit import FailedLoginLimiter, LOGIN_MAX_FAILURES
+from conftest import signup_and_login
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lockout_lifts_as_failures_age_out(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    limiter = FailedLoginLimiter(max_failures=3, window_seconds=60)
+
+    for _ in range(3):
+        assert limiter.retry_after("alice") == 0
+        limiter.record_failure("alice")
+        clock.now += 10
+    assert limiter.retry_after("alice") == 30
+    assert limiter.retry_after("bob") == 0
+
+    clock.now += 31
+    assert limiter.retry_after("alice") == 0
+    limiter.record_failure("alice")
+    assert limiter.retry_after("alice") > 0
+
+
+def test_reset_and_tracking_cap():
+    limiter = FailedLoginLimiter(max_failures=1, window_seconds=60, max_tracked=2)
+    limiter.record_failure("alice")
+    limiter.reset("alice")
+    assert limiter.retry_after("alice") == 0
+
+    for username in ("a", "b", "c"):
+        limiter.record_failure(username)
+    # The least recently failing username is forgotten first
+    assert limiter.retry_after("a") == 0
+    assert limiter.retry_after("c") > 0
+
+
+def test_login_is_refused_with_429_after_repeated_failures(client):
+    signup_and_login(client, "limited", "nurse")
+    for _ in range(LOGIN_MAX_FAILURES):
+        response = client.post("/login", params={"username": "limited", "password": "wrong"})
+        assert response.status_code == 401
+
+    # Even the right password is refused until the window passes
+    response = client.post("/login", params={"username": "limited", "password": "secret"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+    # Other users are unaffected, and a successful login clears the count
+    signup_and_login(client, "unlimited", "nurse")
+    for _ in range(2):
+        for _ in range(LOGIN_MAX_FAILURES - 1):
+            client.post("/login", params={"username": "unlimited", "password": "wrong"})
+        signup_and_login(client, "unlimited", "nurse")
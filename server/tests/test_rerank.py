@@ -0,0 +1,40 @@
+from chat import rerank as rerank_module
+from chat.rerank import rerank
+
+
+def match(record_id, text, score):
+    return {"id": record_id, "score": score, "metadata": {"text": text}}
+
+
+MATCHES = [
+    match("vague", "Patients should follow the advice of their care team.", 0.90),
+    match("partial", "Insulin is stored in the refrigerator.", 0.85),
+    match("phrase", "Insulin resistance develops when cells respond poorly to insulin.", 0.80),
+    match("scattered", "Resistance training helps; insulin doses may change.", 0.79),
+]
+
+
+def test_term_and_phrase_overlap_lift_candidates():
+    ranked = rerank("What causes insulin resistance?", MATCHES, top_k=4)
+    assert ranked[0]["id"] == "phrase"
+    assert ranked[0]["score"] > ranked[1]["score"]
+    assert ranked[0]["metadata"] is MATCHES[2]["metadata"]
+
+
+def test_lexical_score_orders_by_coverage_then_phrase(monkeypatch):
+    monkeypatch.setattr(rerank_module, "RERANK_RETRIEVAL_WEIGHT", 0.0)
+    ranked = rerank("What causes insulin resistance?", MATCHES, top_k=4)
+    assert [m["id"] for m in ranked] == ["phrase", "scattered", "partial", "vague"]
+
+
+def test_retrieval_weight_blends_first_stage_order(monkeypatch):
+    monkeypatch.setattr(rerank_module, "RERANK_RETRIEVAL_WEIGHT", 1.0)
+    ranked = rerank("What causes insulin resistance?", MATCHES, top_k=4)
+    assert [m["id"] for m in ranked] == ["vague", "partial", "phrase", "scattered"]
+
+
+def test_cuts_to_top_k_and_passes_trivial_input_through():
+    assert len(rerank("insulin resistance", MATCHES, top_k=2)) == 2
+    assert rerank("insulin", MATCHES[:1], top_k=5) == MATCHES[:1]
+    # Only stopwords: first-stage order is kept
+    assert rerank("what is the", MATCHES, top_k=2) == MATCHES[:2]
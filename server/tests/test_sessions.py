@@ -0,0 +1,74 @@
+from chat import sessions
+from chat.sessions import ChatSession, SessionStore, CHAT_SESSION_TURNS, CHAT_SESSION_SUMMARY_TOKENS
+from chat.context import CONTEXT_CHARS_PER_TOKEN
+from conftest import signup_and_login
+
+
+def test_old_turns_are_folded_into_a_bounded_summary():
+    session = ChatSession("s", "alice")
+    for i in range(CHAT_SESSION_TURNS + 50):
+        session.add_turn(f"Question {i} about insulin?", f"Answer {i}. More detail that is not kept.")
+
+    assert len(session.turns) == CHAT_SESSION_TURNS
+    assert session.turns[-1] == (f"Question {CHAT_SESSION_TURNS + 49} about insulin?",
+                                 f"Answer {CHAT_SESSION_TURNS + 49}. More detail that is not kept.")
+    assert sum(len(line) + 1 for line in session.summary) <= CHAT_SESSION_SUMMARY_TOKENS * CONTEXT_CHARS_PER_TOKEN
+    # Only the first sentence of a folded answer is kept, newest lines last
+    assert session.summary[-1] == "- Question 49 about insulin? → Answer 49."
+
+    history = session.history()
+    assert history.startswith("Earlier in this conversation:\n")
+    assert history.endswith(f"User: Question {CHAT_SESSION_TURNS + 49} about insulin?\n"
+                            f"Assistant: Answer {CHAT_SESSION_TURNS + 49}. More detail that is not kept.")
+
+
+def test_long_turns_are_clipped():
+    session = ChatSession("s", "alice")
+    session.add_turn("short", "word " * 10000)
+    answer = session.turns[0][1]
+    assert len(answer) <= sessions.CHAT_SESSION_TURN_TOKENS * CONTEXT_CHARS_PER_TOKEN + 2
+    assert answer.endswith(" …")
+
+
+def test_follow_ups_borrow_recent_topic_terms():
+    session = ChatSession("s", "alice")
+    assert session.condense("How is it treated?") == "How is it treated?"
+
+    session.add_turn("What are the symptoms of gestational diabetes?", "Often none.")
+    assert session.condense("How is it treated?") == "How is it treated? (symptoms gestational diabetes)"
+    # A self-contained question is searched as asked
+    question = "What dose of metformin suits elderly patients with kidney disease?"
+    assert session.condense(question) == question
+    # A pointing word makes even a long question a follow-up
+    assert session.condense("Which medications interact badly with those treatments?").endswith("(symptoms gestational diabetes)")
+
+
+def test_store_evicts_least_recent_and_idle_sessions_and_checks_owner(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(sessions.time, "monotonic", lambda: clock[0])
+    store = SessionStore(max_sessions=2, idle_seconds=60)
+    first, second = store.create("alice"), store.create("bob")
+    assert store.get(first.id, "bob") is None
+    assert store.get(first.id, "alice") is first
+
+    third = store.create("carol")
+    assert store.get(second.id, "bob") is None
+    assert store.stats() == {"sessions": 2, "evicted": 1}
+
+    clock[0] = 61
+    assert store.get(third.id, "carol") is None
+    assert not store.delete(first.id, "alice")
+
+
+def test_session_routes(client):
+    headers = signup_and_login(client, "session-user", "session-role")
+    other = signup_and_login(client, "session-other", "session-role")
+    session_id = client.post("/chat/sessions", headers=headers).json()["session_id"]
+
+    client.post("/chat", headers=headers, data={"message": "What is HbA1c?", "session_id": session_id})
+    assert client.get(f"/chat/sessions/{session_id}", headers=headers).json()["turns"][0]["question"] == "What is HbA1c?"
+    assert client.get(f"/chat/sessions/{session_id}", headers=other).status_code == 404
+    assert client.post("/chat", headers=other, data={"message": "hi", "session_id": session_id}).status_code == 404
+
+    assert client.delete(f"/chat/sessions/{session_id}", headers=headers).status_code == 200
+    assert client.get(f"/chat/sessions/{session_id}", headers=headers).status_code == 404
@@ -0,0 +1,37 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# (id, values, metadata), the tuple shape Pinecone's upsert accepts
+VectorRecord = Tuple[str, Sequence[float], Dict]
+
+
+class VectorStore(ABC):
+    """Minimal vector index interface shared by the Pinecone and local backends.
+
+    `query` returns matches as {"id", "score", "metadata"} dicts ordered by
+    descending cosine similarity.
+    """
+
+    # Whether `query` can apply a metadata filter itself
+    supports_filter: bool = True
+
+    @abstractmethod
+    def upsert(self, vectors: Iterable[VectorRecord]) -> int:
+        """Insert or overwrite vectors, returning how many were written"""
+
+    @abstractmethod
+    def query(self, vector: Sequence[float], top_k: int, filter: Optional[Dict] = None) -> List[Dict]:
+        """Return the top_k matches satisfying `filter`"""
+
+    def query_many(self, vectors: Sequence[Sequence[float]], top_k: int, filter: Optional[Dict] = None) -> List[List[Dict]]:
+        """Run several queries with the same filter; backends that can batch override this"""
+        return [self.query(vector, top_k, filter) for vector in vectors]
+
+    @abstractmethod
+    def fetch(self, ids: Sequence[str]) -> Dict[str, Dict]:
+        """Metadata of the ids that exist, keyed by id"""
+
+    @abstractmethod
+    def delete(self, ids: Iterable[str]) -> None:
+        """Remove vectors by id; unknown ids are ignored"""
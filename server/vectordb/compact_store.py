@@ -0,0 +1,83 @@
+import os
+from typing import Dict, List
+import numpy as np
+from .local_store import LocalVectorStore
+from .text_store import ExternalTextMixin
+
+
+# Shortlist size, as a multiple of top_k, re-scored with the float16 vectors
+COMPACT_RESCORE_FACTOR = int(os.getenv("COMPACT_RESCORE_FACTOR", "4"))
+# Rows dequantised per matrix product; small enough for the float32 copy to stay in cache
+COMPACT_SCAN_BLOCK_ROWS = 2048
+# Dequantising dominates the scan and gathering int8 rows is cheap, so only near-contiguous candidates use slices
+COMPACT_DENSE_SCAN_RATIO = 0.9
+
+
+class CompactVectorStore(ExternalTextMixin, LocalVectorStore):
+    """LocalVectorStore variant that scans int8 codes and keeps chunk text out of memory.
+
+    Layout under `path`, in addition to the local store's log and state:
+      codes.i8    (capacity, dimension) int8, each unit vector scaled by 127 / max|v|
+      scales.f32  (capacity,) float32 per-row dequantisation scale
+      vectors.f16 float16 unit vectors, only read for the rescoring shortlist
+      texts/      deduplicated, compressed chunk text (see TextStore)
+
+    Queries score the candidate rows on the int8 codes, which is 1/4 of the
+    bytes the float32 store scans, take the best top_k * COMPACT_RESCORE_FACTOR
+    and re-score only those with the float16 vectors (2 bytes per dimension
+    read per shortlisted row). On disk a row costs 3 * dimension + 4 bytes
+    against 4 * dimension for float32. Chunk text and metadata are kept as
+    described in ExternalTextMixin.
+    """
+
+    # "int8" indexes kept a float32 rescoring copy and must be rebuilt
+    FORMAT = "int8+f16"
+    scan_block_rows = COMPACT_SCAN_BLOCK_ROWS
+    dense_scan_ratio = COMPACT_DENSE_SCAN_RATIO
+
+    def __init__(self, path: str, dimension: int, rescore_factor: int = COMPACT_RESCORE_FACTOR):
+        self.rescore_factor = rescore_factor
+        self._open_text_store(path)
+        super().__init__(path, dimension)
+
+    def _array_specs(self) -> Dict[str, tuple]:
+        return {
+            "_codes": ("codes.i8", np.int8, (self.dimension,)),
+            "_scales": ("scales.f32", np.float32, ()),
+            "_rescore": ("vectors.f16", np.float16, (self.dimension,)),
+        }
+
+    def _write_row(self, row: int, vector: np.ndarray):
+        peak = float(np.abs(vector).max()) or 1.0
+        self._codes[row] = np.round(vector * (127.0 / peak)).astype(np.int8)
+        self._scales[row] = peak / 127.0
+        self._rescore[row] = vector
+
+    def _score_block(self, index, query_matrix: np.ndarray) -> np.ndarray:
+        return (self._codes[index].astype(np.float32) @ query_matrix.T) * self._scales[index][:, None]
+
+    def _top_k(self, rows: np.ndarray, query_matrix: np.ndarray, k: int) -> List[tuple]:
+        approximate = self._scores(rows, query_matrix)
+        shortlist_size = min(len(rows), k * self.rescore_factor)
+        shortlist = np.argpartition(-approximate, shortlist_size - 1, axis=0)[:shortlist_size]
+
+        results = []
+        for column in range(query_matrix.shape[0]):
+            positions = shortlist[:, column]
+            exact = self._rescore[rows[positions]].astype(np.float32) @ query_matrix[column]
+            best = np.argsort(-exact)[:k]
+            results.append((positions[best], exact[best]))
+        return results
+
+    def memory_stats(self) -> dict:
+        """Bytes per stored chunk: scanned by every query, read per shortlisted row, and on disk"""
+        rows = max(len(self), 1)
+        return {
+            "chunks": len(self),
+            "scan_bytes_per_chunk": self.dimension + 4,
+            "rescore_bytes_per_row": self.dimension * 2,
+            "vector_disk_bytes_per_chunk": self.dimension * 3 + 4,
+            "float32_bytes_per_chunk": self.dimension * 4,
+            "text_bytes_per_chunk": self.texts.stats()["bytes"] / rows,
+            "unique_texts": len(self.texts),
+        }
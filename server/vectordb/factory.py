@@ -0,0 +1,24 @@
+import os
+from .base import VectorStore
+
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+LOCAL_VECTOR_PATH = os.getenv("LOCAL_VECTOR_PATH", "./data/vector_index")
+
+
+def create_vector_store(backend: str = VECTOR_BACKEND) -> VectorStore:
+    """Build the backend selected by VECTOR_BACKEND; use config.providers.get_vector_store for the shared one"""
+    dimension = int(os.getenv("PINECONE_DIMENSION", "3072"))
+    if backend == "local":
+        from .local_store import LocalVectorStore
+        return LocalVectorStore(LOCAL_VECTOR_PATH, dimension)
+    if backend == "local_ivf":
+        from .ivf_store import IVFVectorStore
+        return IVFVectorStore(LOCAL_VECTOR_PATH, dimension)
+    if backend == "local_compact":
+        from .compact_store import CompactVectorStore
+        return CompactVectorStore(LOCAL_VECTOR_PATH, dimension)
+    if backend == "pinecone":
+        from .pinecone_store import PineconeVectorStore
+        return PineconeVectorStore(os.getenv("PINECONE_API_KEY"), os.getenv("PINECONE_INDEX_NAME"), dimension)
+    raise RuntimeError(f"Unknown VECTOR_BACKEND: {backend}")
@@ -0,0 +1,19 @@
+def build_metadata_filter(user_role: str, doc_ids=None, sources=None) -> dict:
+    """Build a Pinecone-style metadata filter restricting matches to what the role may see"""
+    metadata_filter = {"role": {"$eq": user_role}}
+    if doc_ids:
+        metadata_filter["doc_id"] = {"$in": list(doc_ids)}
+    if sources:
+        metadata_filter["source"] = {"$in": list(sources)}
+    return metadata_filter
+
+
+def matches_filter(metadata: dict, metadata_filter: dict) -> bool:
+    """Evaluate a filter built by build_metadata_filter against match metadata"""
+    for field, condition in metadata_filter.items():
+        value = metadata.get(field)
+        if "$eq" in condition and value != condition["$eq"]:
+            return False
+        if "$in" in condition and value not in condition["$in"]:
+            return False
+    return True
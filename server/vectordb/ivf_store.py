@@ -0,0 +1,274 @@
+import os
+import json
+import math
+import hashlib
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from .local_store import LocalVectorStore
+from .text_store import ExternalTextMixin
+
+
+# Roles with fewer rows are scanned exactly; an IVF index only pays off on larger partitions
+IVF_MIN_TRAIN_ROWS = int(os.getenv("IVF_MIN_TRAIN_ROWS", "4096"))
+# A role's centroids are retrained once it has grown this many times past its last training
+IVF_RETRAIN_GROWTH = float(os.getenv("IVF_RETRAIN_GROWTH", "2"))
+# Share of a role's inverted lists scanned per query, so recall holds as nlist (~sqrt(rows)) grows.
+# Target: recall@5 >= 0.95 against exact search. Measured with benchmarks.ann_recall on 768-dim
+# hash embeddings: 0.4 gives 0.953 at 25k rows per role (54 of 134 lists, 1.75x faster than exact)
+# and 0.952 at 10k rows (38 of 94 lists); a fixed 16 lists gave 0.725 and 0.773.
+IVF_PROBE_FRACTION = float(os.getenv("IVF_PROBE_FRACTION", "0.4"))
+# Fixed number of lists scanned per query instead; 0 scales with the list count as above
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "0"))
+KMEANS_ITERATIONS = 12
+# Training sample per centroid; more adds time without moving the centroids much
+KMEANS_SAMPLE_PER_LIST = 64
+ASSIGN_BLOCK_ROWS = 16384
+
+
+def train_kmeans(vectors: np.ndarray, nlist: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """Spherical k-means (Lloyd's, cosine) on unit vectors; returns (nlist, dimension) unit centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=nlist)
+        # Empty clusters restart from a random point instead of collapsing
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class IVFVectorStore(ExternalTextMixin, LocalVectorStore):
+    """LocalVectorStore with an inverted-file ANN index per role.
+
+    Each role is its own partition: once it holds IVF_MIN_TRAIN_ROWS vectors
+    its rows are clustered with k-means into ~sqrt(n) inverted lists, and a
+    query for that role scores only the rows in the lists closest to the
+    query (IVF_PROBE_FRACTION of them, or IVF_NPROBE), so it never touches other roles' chunks. New rows are
+    assigned to their nearest centroid on insert, and the centroids are
+    retrained when the partition has grown IVF_RETRAIN_GROWTH-fold. Training
+    runs on a snapshot of the partition outside the store lock and is swapped
+    in when done, so queries keep being served from the previous lists.
+
+    Chunk text lives in a TextStore (see ExternalTextMixin), so loading
+    replays a log of ids and short metadata fields and memory-maps the
+    vectors, list assignments and centroids without recomputing anything.
+
+    Extra files under `path`:
+      lists.i32         (capacity,) inverted-list id per row, -1 if its role is untrained
+      ivf.json          per-role list count and size at training time
+      centroids/*.npy   per-role centroids, memory-mapped on load
+      texts/            deduplicated, compressed chunk text
+    """
+
+    FORMAT = "ivf-float32"
+    # Set while the base class replays the log, so assignments are read rather than recomputed
+    _loading = False
+
+    def __init__(self, path: str, dimension: int, nprobe: int = IVF_NPROBE, probe_fraction: float = IVF_PROBE_FRACTION):
+        self.nprobe = nprobe
+        self.probe_fraction = probe_fraction
+        self._centroids: Dict[str, np.ndarray] = {}
+        self._partitions: Dict[str, dict] = {}
+        # role -> list id -> rows
+        self._lists: Dict[str, Dict[int, set]] = {}
+        self._list_arrays: Dict[tuple, np.ndarray] = {}
+        # role -> rows written or cleared while that role is being trained
+        self._training: Dict[str, set] = {}
+        self._ivf_path = os.path.join(path, "ivf.json")
+        self._centroid_dir = os.path.join(path, "centroids")
+        os.makedirs(self._centroid_dir, exist_ok=True)
+        if os.path.exists(self._ivf_path):
+            with open(self._ivf_path) as f:
+                self._partitions = json.load(f)
+            for role in self._partitions:
+                self._centroids[role] = np.load(self._centroid_file(role), mmap_mode="r")
+        self._open_text_store(path)
+        super().__init__(path, dimension)
+
+    def _array_specs(self) -> Dict[str, tuple]:
+        return {**super()._array_specs(), "_assignments": ("lists.i32", np.int32, ())}
+
+    def _centroid_file(self, role: str) -> str:
+        return os.path.join(self._centroid_dir, hashlib.sha1(role.encode("utf-8")).hexdigest() + ".npy")
+
+    # -- inverted lists ----------------------------------------------------
+
+    def _role_of(self, row: int) -> Optional[str]:
+        packed = self._metadata[row] if row < len(self._metadata) else None
+        return self._unpack_metadata(packed).get("role") if packed is not None else None
+
+    def _unlist(self, row: int):
+        role = self._role_of(row)
+        list_id = int(self._assignments[row])
+        if role in self._lists and list_id >= 0:
+            self._lists[role].get(list_id, set()).discard(row)
+            self._list_arrays.pop((role, list_id), None)
+
+    def _list(self, role: str, row: int, list_id: int):
+        self._assignments[row] = list_id
+        if list_id >= 0:
+            self._lists.setdefault(role, {}).setdefault(list_id, set()).add(row)
+            self._list_arrays.pop((role, list_id), None)
+
+    def _note_change(self, role: Optional[str], row: int):
+        if role in self._training:
+            self._training[role].add(row)
+
+    def _set_row(self, row: int, vector_id: str, metadata: Dict):
+        if row < len(self._metadata) and self._metadata[row] is not None:
+            self._note_change(self._role_of(row), row)
+            self._unlist(row)
+        super()._set_row(row, vector_id, metadata)
+        role = metadata.get("role")
+        self._note_change(role, row)
+        if self._loading:
+            # Replaying the log: the assignment was persisted with the row
+            list_id = int(self._assignments[row]) if role in self._centroids else -1
+        elif role in self._centroids:
+            list_id = int(np.argmax(self._centroids[role] @ self._matrix[row]))
+        else:
+            list_id = -1
+        self._list(role, row, list_id)
+
+    def _clear_row(self, row: int):
+        if self._metadata[row] is not None:
+            self._note_change(self._role_of(row), row)
+            self._unlist(row)
+            if not self._loading:
+                # On replay the row may since have been reused; its persisted assignment is the new row's
+                self._assignments[row] = -1
+        super()._clear_row(row)
+
+    def _load(self):
+        self._loading = True
+        try:
+            super()._load()
+        finally:
+            self._loading = False
+
+    # -- training ----------------------------------------------------------
+
+    def _train(self, role: str, rows: np.ndarray, matrix: np.ndarray):
+        """Cluster a snapshot of the role's rows without holding the lock, then swap the lists in"""
+        nlist = max(8, int(np.sqrt(len(rows))))
+        # Gather only the training sample; the partition itself may be far larger than memory
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(rows, min(len(rows), nlist * KMEANS_SAMPLE_PER_LIST), replace=False))
+        centroids = train_kmeans(np.asarray(matrix[sample]), nlist)
+        assignments = np.empty(len(rows), dtype=np.int32)
+        for start in range(0, len(rows), ASSIGN_BLOCK_ROWS):
+            block = rows[start:start + ASSIGN_BLOCK_ROWS]
+            assignments[start:start + len(block)] = np.argmax(matrix[block] @ centroids.T, axis=1)
+
+        # Replace rather than overwrite: the previous centroids may still be memory-mapped
+        tmp_path = self._centroid_file(role) + ".tmp.npy"
+        np.save(tmp_path, centroids)
+        os.replace(tmp_path, self._centroid_file(role))
+        mapped = np.load(self._centroid_file(role), mmap_mode="r")
+
+        with self._lock:
+            current = self._field_rows["role"].get(role, set())
+            changed = self._training[role]
+            # Every row written, moved or deleted since the snapshot is in `changed`; the rest keep their assignment
+            keep = ~np.isin(rows, np.fromiter(changed, dtype=np.int64, count=len(changed)))
+            self._centroids[role] = mapped
+            self._partitions[role] = {"nlist": nlist, "trained_rows": len(rows)}
+            self._list_arrays = {key: value for key, value in self._list_arrays.items() if key[0] != role}
+            self._assignments[rows[keep]] = assignments[keep]
+            order = np.argsort(assignments[keep], kind="stable")
+            kept_rows, kept_lists = rows[keep][order], assignments[keep][order]
+            bounds = np.flatnonzero(np.diff(kept_lists)) + 1
+            self._lists[role] = {
+                int(list_rows[0]): set(group.tolist())
+                for list_rows, group in zip(np.split(kept_lists, bounds), np.split(kept_rows, bounds))
+                if len(group)
+            }
+            # Rows added or rewritten during training are assigned against the new centroids here
+            for row in changed & current:
+                self._list(role, row, int(np.argmax(centroids @ self._matrix[row])))
+            self._assignments.flush()
+
+            tmp_path = self._ivf_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._partitions, f)
+            os.replace(tmp_path, self._ivf_path)
+
+    def _maybe_train(self, roles):
+        for role in roles:
+            with self._lock:
+                size = len(self._field_rows["role"].get(role, ()))
+                partition = self._partitions.get(role)
+                due = (size >= IVF_MIN_TRAIN_ROWS) if partition is None else (size >= IVF_RETRAIN_GROWTH * partition["trained_rows"])
+                if not due or role in self._training:
+                    continue
+                rows = np.fromiter(sorted(self._field_rows["role"][role]), dtype=np.int64, count=size)
+                # The mapped matrix is only ever extended, so this reference stays valid while the store grows
+                matrix = self._matrix
+                self._training[role] = set()
+            try:
+                self._train(role, rows, matrix)
+            finally:
+                with self._lock:
+                    self._training.pop(role, None)
+
+    def upsert(self, vectors) -> int:
+        records = list(vectors)
+        written = super().upsert(records)
+        self._maybe_train({record[2].get("role") for record in records} - {None})
+        return written
+
+    # -- queries -----------------------------------------------------------
+
+    def probes_for(self, nlist: int) -> int:
+        """Inverted lists scanned per query in a partition of `nlist` lists"""
+        nprobe = self.nprobe or math.ceil(self.probe_fraction * nlist)
+        return max(1, min(nprobe, nlist))
+
+    def _probe_rows(self, role: str, query_vector: np.ndarray) -> np.ndarray:
+        centroids = self._centroids[role]
+        nprobe = self.probes_for(len(centroids))
+        probes = np.argpartition(-(centroids @ query_vector), nprobe - 1)[:nprobe]
+        arrays = []
+        for list_id in probes.tolist():
+            key = (role, list_id)
+            if key not in self._list_arrays:
+                rows = self._lists.get(role, {}).get(list_id, ())
+                self._list_arrays[key] = np.fromiter(sorted(rows), dtype=np.int64, count=len(rows))
+            arrays.append(self._list_arrays[key])
+        return np.sort(np.concatenate(arrays)) if arrays else np.empty(0, dtype=np.int64)
+
+    def query_many(self, vectors: Sequence[Sequence[float]], top_k: int, filter: Optional[Dict] = None) -> List[List[Dict]]:
+        role = (filter or {}).get("role", {}).get("$eq")
+        if role not in self._centroids:
+            # No single trained role partition to probe: exact scan
+            return super().query_many(vectors, top_k, filter)
+
+        query_matrix = self._normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension))
+        results = []
+        with self._lock:
+            candidates = self._candidate_rows(filter) if len(filter) > 1 else None
+            for query_vector in query_matrix:
+                rows = self._probe_rows(role, query_vector)
+                if candidates is not None:
+                    rows = np.intersect1d(rows, candidates, assume_unique=True)
+                if not len(rows) or top_k <= 0:
+                    results.append([])
+                    continue
+                (positions, scores), = self._top_k(rows, query_vector[None, :], min(top_k, len(rows)))
+                results.append([
+                    {"id": self._ids[rows[i]], "score": float(score), "metadata": self._result_metadata(rows[i])}
+                    for i, score in zip(positions, scores)
+                ])
+        return results
+
+    def index_stats(self) -> dict:
+        return {
+            role: {**partition, "rows": len(self._field_rows["role"].get(role, ())), "nprobe": self.probes_for(partition["nlist"])}
+            for role, partition in self._partitions.items()
+        }
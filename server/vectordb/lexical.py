@@ -0,0 +1,191 @@
+import os
+import re
+import json
+import math
+import sys
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from .filters import matches_filter
+
+
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "./data/lexical_index")
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Keeps drug names, lab codes and ICD codes intact: "HbA1c" -> "hba1c", "E11.9" -> "e11.9"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its of on or that the their "
+    "there these this to was what when where which who why will with you your".split()
+)
+
+LexicalRecord = Tuple[str, Dict]
+# Metadata kept per record so role / document filters apply before ranking (see build_metadata_filter)
+FILTER_FIELDS = ("role", "doc_id", "source")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms without stopwords; compound terms also yield their parts ("type-2" -> "type", "2")"""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if "-" in token or "." in token:
+            terms += [part for part in re.split(r"[.\-]", token) if part and part not in STOPWORDS]
+    return terms
+
+
+class BM25Index:
+    """In-process BM25 inverted index over chunk text, persisted as an append-only log.
+
+    Only term statistics are kept: per record its vector id, term counts,
+    length and the FILTER_FIELDS needed to apply the role filter before
+    ranking. Chunk text and the rest of the metadata stay in the vector
+    store, which callers read for the matches they keep. The log at
+    `path/log.jsonl` stores the same (id, fields, term counts), is replayed
+    on load and is compacted when deletes dominate.
+    """
+
+    def __init__(self, path: str = LEXICAL_INDEX_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        # record id -> (filter field values, terms, length); term counts live in the postings
+        self._docs: Dict[str, Tuple[Tuple, Tuple[str, ...], int]] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+
+        os.makedirs(path, exist_ok=True)
+        self._log_path = os.path.join(path, "log.jsonl")
+        if os.path.exists(self._log_path):
+            self._load()
+
+    # -- persistence -------------------------------------------------------
+
+    def _load(self):
+        entries = legacy = 0
+        with open(self._log_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn final line from a crash mid-append
+                    continue
+                entries += 1
+                if entry["op"] == "delete":
+                    self._remove(entry["id"])
+                elif "metadata" in entry:
+                    # Written before the log dropped chunk text
+                    legacy += 1
+                    self._add(entry["id"], *self._statistics(entry["metadata"]))
+                else:
+                    self._add(entry["id"], tuple(entry["fields"]), entry["terms"])
+        if legacy or entries > 2 * len(self._docs) + 1000:
+            self._compact()
+
+    def _compact(self):
+        tmp_path = self._log_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for record_id in self._docs:
+                f.write(json.dumps(self._log_entry(record_id)) + "\n")
+        os.replace(tmp_path, self._log_path)
+
+    def _log_entry(self, record_id: str) -> Dict:
+        fields, terms, _ = self._docs[record_id]
+        return {"op": "add", "id": record_id, "fields": list(fields),
+                "terms": {term: self._postings[term][record_id] for term in terms}}
+
+    def _append_log(self, entries: List[Dict]):
+        with open(self._log_path, "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+
+    # -- bookkeeping -------------------------------------------------------
+
+    @staticmethod
+    def _statistics(metadata: Dict) -> Tuple[Tuple, Dict[str, int]]:
+        """(filter field values, term counts) of a record"""
+        return tuple(metadata.get(field) for field in FILTER_FIELDS), Counter(tokenize(metadata.get("text", "")))
+
+    def _add(self, record_id: str, fields: Tuple, terms: Dict[str, int]):
+        self._remove(record_id)
+        # Field values and terms repeat across chunks; interning shares one string per value
+        fields = tuple(sys.intern(value) if isinstance(value, str) else value for value in fields)
+        length = sum(terms.values())
+        self._docs[record_id] = (fields, tuple(sys.intern(term) for term in terms), length)
+        self._total_length += length
+        for term, count in terms.items():
+            self._postings.setdefault(term, {})[record_id] = count
+
+    def _remove(self, record_id: str):
+        existing = self._docs.pop(record_id, None)
+        if existing is None:
+            return
+        _, terms, length = existing
+        self._total_length -= length
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(record_id, None)
+            if not postings:
+                del self._postings[term]
+
+    # -- index API ---------------------------------------------------------
+
+    def add(self, records: Iterable[LexicalRecord]) -> int:
+        """Index (vector id, metadata) records; only the text's term counts and FILTER_FIELDS are kept"""
+        records = [(record_id, *self._statistics(metadata)) for record_id, metadata in records]
+        with self._lock:
+            for record_id, fields, terms in records:
+                self._add(record_id, fields, terms)
+            self._append_log([self._log_entry(record_id) for record_id, _, _ in records])
+        return len(records)
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            log = [{"op": "delete", "id": record_id} for record_id in ids if record_id in self._docs]
+            for entry in log:
+                self._remove(entry["id"])
+            if log:
+                self._append_log(log)
+
+    def search(self, query: str, top_k: int, filter: Optional[Dict] = None) -> List[Dict]:
+        """Top BM25 matches as {id, score, term_coverage}, restricted to records passing the filter.
+
+        Matches carry no metadata; read it from the vector store for the ones kept.
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            if not self._docs or not query_terms or top_k <= 0:
+                return []
+            total = len(self._docs)
+            average_length = self._total_length / total or 1.0
+            scores: Dict[str, float] = {}
+            matched: Counter = Counter()
+            allowed: Dict[str, bool] = {}
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for record_id, count in postings.items():
+                    if record_id not in allowed:
+                        allowed[record_id] = not filter or matches_filter(
+                            dict(zip(FILTER_FIELDS, self._docs[record_id][0])), filter
+                        )
+                    if not allowed[record_id]:
+                        continue
+                    length = self._docs[record_id][2]
+                    norm = count + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                    scores[record_id] = scores.get(record_id, 0.0) + idf * count * (BM25_K1 + 1) / norm
+                    matched[record_id] += 1
+
+            best = heapq.nlargest(top_k, scores, key=scores.get)
+            return [
+                {"id": record_id, "score": scores[record_id], "term_coverage": matched[record_id] / len(query_terms)}
+                for record_id in best
+            ]
+
+    def __len__(self) -> int:
+        return len(self._docs)
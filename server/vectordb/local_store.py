@@ -0,0 +1,354 @@
+import os
+import json
+import heapq
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from .base import VectorStore, VectorRecord
+from .filters import matches_filter
+
+
+# Metadata fields kept in an inverted index so filtered queries only score candidate rows
+INDEXED_FIELDS = ("role", "doc_id", "source")
+INITIAL_CAPACITY = 1024
+# Rows scored per matrix product; bounds the scratch copy of a scan
+SCAN_BLOCK_ROWS = 16384
+# Candidates at least this dense within their row span are scored on contiguous slices instead of gathered
+DENSE_SCAN_RATIO = 0.25
+
+
+class LocalVectorStore(VectorStore):
+    """In-process cosine index over a memory-mapped float32 matrix.
+
+    Layout under `path`:
+      vectors.f32     row-major (capacity, dimension) float32, unit-normalised
+      metadata.jsonl  append-only log of upserts/deletes, replayed on load and
+                      compacted when superseded entries dominate
+      state.json      dimension, capacity and number of used rows
+
+    Vectors are normalised on insert so cosine similarity is a single
+    matrix-vector product followed by an argpartition for the top k.
+    Rows freed by deletes are reused by later upserts, lowest first, so a
+    corpus that is re-ingested keeps the matrix at its live size.
+    """
+
+    supports_filter = True
+    scan_block_rows = SCAN_BLOCK_ROWS
+    dense_scan_ratio = DENSE_SCAN_RATIO
+    # Recorded in state.json so an index is never opened by the wrong storage class
+    FORMAT = "float32"
+
+    def __init__(self, path: str, dimension: int):
+        self.path = path
+        self.dimension = dimension
+        self._lock = threading.RLock()
+        self._ids: List[Optional[str]] = []
+        self._metadata: List[Optional[Dict]] = []
+        self._rows: Dict[str, int] = {}
+        # Heap of cleared rows below len(self._ids), handed out before the matrix grows
+        self._free_rows: List[int] = []
+        self._field_rows = {field: {} for field in INDEXED_FIELDS}
+        # Candidate row arrays per filter, cleared on every write
+        self._candidate_cache: Dict[str, np.ndarray] = {}
+
+        os.makedirs(path, exist_ok=True)
+        self._log_path = os.path.join(path, "metadata.jsonl")
+        self._state_path = os.path.join(path, "state.json")
+
+        if os.path.exists(self._state_path):
+            self._load()
+        else:
+            self._capacity = INITIAL_CAPACITY
+            self._open_arrays(self._capacity, create=True)
+            self._live = np.zeros(self._capacity, dtype=bool)
+            self._write_state()
+
+    # -- persistence -------------------------------------------------------
+
+    def _array_specs(self) -> Dict[str, tuple]:
+        """attribute -> (file name, dtype, row shape) of the per-row memory-mapped arrays"""
+        return {"_matrix": ("vectors.f32", np.float32, (self.dimension,))}
+
+    def _open_arrays(self, capacity: int, create: bool = False):
+        mode = "w+" if create else "r+"
+        for attr, (filename, dtype, row_shape) in self._array_specs().items():
+            path = os.path.join(self.path, filename)
+            setattr(self, attr, np.memmap(path, dtype=dtype, mode=mode, shape=(capacity,) + row_shape))
+
+    def _flush_arrays(self):
+        for attr in self._array_specs():
+            getattr(self, attr).flush()
+
+    def _write_state(self):
+        tmp_path = self._state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"format": self.FORMAT, "dimension": self.dimension, "capacity": self._capacity,
+                       "rows": len(self._ids)}, f)
+        os.replace(tmp_path, self._state_path)
+
+    def _load(self):
+        with open(self._state_path) as f:
+            state = json.load(f)
+        if state.get("format", "float32") != self.FORMAT:
+            raise RuntimeError(f"Local index at {self.path} uses the {state.get('format', 'float32')} format, "
+                               f"expected {self.FORMAT}")
+        if state["dimension"] != self.dimension:
+            raise RuntimeError(
+                f"Local index at {self.path} has dimension {state['dimension']}, expected {self.dimension}"
+            )
+        self._capacity = state["capacity"]
+        self._open_arrays(self._capacity)
+        self._live = np.zeros(self._capacity, dtype=bool)
+
+        entries = 0
+        if os.path.exists(self._log_path):
+            with open(self._log_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn final line from a crash mid-append
+                        continue
+                    entries += 1
+                    if entry["row"] >= state["rows"]:
+                        # Log entry written after the last state update (crash mid-write)
+                        continue
+                    if entry["op"] == "upsert":
+                        self._set_row(entry["row"], entry["id"], entry["metadata"])
+                    else:
+                        self._clear_row(entry["row"])
+        # A reused row is logged as delete then upsert, so only rows cleared last are free
+        self._free_rows = [row for row, vector_id in enumerate(self._ids) if vector_id is None]
+        if entries > 2 * len(self._rows) + 1000:
+            self._compact_log()
+
+    def _compact_log(self):
+        """Rewrite the log as one upsert per live row"""
+        tmp_path = self._log_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for row in np.flatnonzero(self._live[:len(self._ids)]).tolist():
+                metadata = self._unpack_metadata(self._metadata[row])
+                f.write(json.dumps({"op": "upsert", "row": row, "id": self._ids[row], "metadata": metadata}) + "\n")
+        os.replace(tmp_path, self._log_path)
+
+    def _append_log(self, entries: List[Dict]):
+        with open(self._log_path, "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+
+    def _grow(self, needed: int):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+        # Extend each file in place (the new tail reads as zeros) and remap it; stored rows are
+        # never rewritten, so a crash mid-growth leaves them intact
+        self._flush_arrays()
+        for attr, (filename, dtype, row_shape) in self._array_specs().items():
+            delattr(self, attr)
+            with open(os.path.join(self.path, filename), "r+b") as f:
+                f.truncate(capacity * int(np.prod(row_shape, dtype=np.int64)) * np.dtype(dtype).itemsize)
+        self._open_arrays(capacity)
+        live = np.zeros(capacity, dtype=bool)
+        live[:len(self._live)] = self._live
+        self._live = live
+        self._capacity = capacity
+
+    # -- bookkeeping -------------------------------------------------------
+
+    def _set_row(self, row: int, vector_id: str, metadata: Dict):
+        self._candidate_cache.clear()
+        while len(self._ids) <= row:
+            self._ids.append(None)
+            self._metadata.append(None)
+        if self._metadata[row] is not None:
+            self._unindex(row)
+        self._ids[row] = vector_id
+        self._metadata[row] = self._pack_metadata(metadata)
+        self._rows[vector_id] = row
+        self._live[row] = True
+        for field in INDEXED_FIELDS:
+            value = metadata.get(field)
+            if value is not None:
+                self._field_rows[field].setdefault(value, set()).add(row)
+
+    def _unindex(self, row: int):
+        metadata = self._unpack_metadata(self._metadata[row])
+        for field in INDEXED_FIELDS:
+            value = metadata.get(field)
+            rows = self._field_rows[field].get(value)
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self._field_rows[field][value]
+
+    def _clear_row(self, row: int):
+        if self._metadata[row] is None:
+            return
+        self._candidate_cache.clear()
+        self._unindex(row)
+        self._rows.pop(self._ids[row], None)
+        self._ids[row] = None
+        self._metadata[row] = None
+        self._live[row] = False
+
+    def _candidate_rows(self, metadata_filter: Optional[Dict]) -> Optional[np.ndarray]:
+        """Rows that may satisfy the filter, or None when every live row qualifies"""
+        if not metadata_filter:
+            return None
+        cache_key = json.dumps(metadata_filter, sort_keys=True)
+        cached = self._candidate_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        candidates = None
+        residual = {}
+        for field, condition in metadata_filter.items():
+            if field not in self._field_rows:
+                residual[field] = condition
+                continue
+            values = [condition["$eq"]] if "$eq" in condition else condition.get("$in", [])
+            rows = set()
+            for value in values:
+                rows |= self._field_rows[field].get(value, set())
+            candidates = rows if candidates is None else candidates & rows
+        if candidates is None:
+            candidates = set(np.flatnonzero(self._live[:len(self._ids)]).tolist())
+        if residual:
+            candidates = {row for row in candidates if matches_filter(self._unpack_metadata(self._metadata[row]), residual)}
+        rows = np.fromiter(sorted(candidates), dtype=np.int64, count=len(candidates))
+        self._candidate_cache[cache_key] = rows
+        return rows
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    # -- storage hooks (overridden by the compact format) ------------------
+
+    def _write_row(self, row: int, vector: np.ndarray):
+        self._matrix[row] = vector
+
+    def _stored_metadata(self, vector_id: str, metadata: Dict) -> Dict:
+        """Metadata as written to the log"""
+        return dict(metadata)
+
+    def _pack_metadata(self, metadata: Dict):
+        """In-memory form of logged metadata"""
+        return metadata
+
+    def _unpack_metadata(self, packed) -> Dict:
+        return packed
+
+    def _result_metadata(self, row: int) -> Dict:
+        """Metadata as returned from queries"""
+        return dict(self._unpack_metadata(self._metadata[row]))
+
+    def _score_block(self, index, query_matrix: np.ndarray) -> np.ndarray:
+        """(rows, queries) scores for the rows selected by `index`, a slice or an array of rows"""
+        return self._matrix[index] @ query_matrix.T
+
+    def _scores(self, rows: np.ndarray, query_matrix: np.ndarray) -> np.ndarray:
+        """(candidates, queries) scores for sorted `rows`, a block of the matrix at a time"""
+        scores = np.empty((len(rows), query_matrix.shape[0]), dtype=np.float32)
+        low, high = int(rows[0]), int(rows[-1]) + 1
+        if len(rows) >= self.dense_scan_ratio * (high - low):
+            # Slices of the mapped matrix are views, so nothing is copied but the block's scores
+            for start in range(low, high, self.scan_block_rows):
+                stop = min(start + self.scan_block_rows, high)
+                left, right = np.searchsorted(rows, [start, stop])
+                if left < right:
+                    scores[left:right] = self._score_block(slice(start, stop), query_matrix)[rows[left:right] - start]
+        else:
+            for start in range(0, len(rows), self.scan_block_rows):
+                block = rows[start:start + self.scan_block_rows]
+                scores[start:start + len(block)] = self._score_block(block, query_matrix)
+        return scores
+
+    def _top_k(self, rows: np.ndarray, query_matrix: np.ndarray, k: int) -> List[tuple]:
+        """Per query: (positions into `rows`, scores), best first"""
+        scores = self._scores(rows, query_matrix)
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        results = []
+        for column in range(scores.shape[1]):
+            column_top = top[:, column]
+            column_top = column_top[np.argsort(-scores[column_top, column])]
+            results.append((column_top, scores[column_top, column]))
+        return results
+
+    # -- VectorStore -------------------------------------------------------
+
+    def upsert(self, vectors: Iterable[VectorRecord]) -> int:
+        records = list(vectors)
+        if not records:
+            return 0
+        values = self._normalize(np.asarray([record[1] for record in records], dtype=np.float32))
+        if values.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-d vectors, got {values.shape[1]}-d")
+
+        with self._lock:
+            new_ids = {record[0] for record in records if record[0] not in self._rows}
+            reused = [heapq.heappop(self._free_rows) for _ in range(min(len(new_ids), len(self._free_rows)))]
+            self._grow(len(self._ids) + len(new_ids) - len(reused))
+            log = []
+            free = iter(reused)
+            next_row = len(self._ids)
+            for (vector_id, _, metadata), vector in zip(records, values):
+                row = self._rows.get(vector_id)
+                if row is None:
+                    row = next(free, None)
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                self._write_row(row, vector)
+                metadata = self._stored_metadata(vector_id, metadata)
+                self._set_row(row, vector_id, metadata)
+                log.append({"op": "upsert", "row": row, "id": vector_id, "metadata": metadata})
+            self._flush_arrays()
+            self._append_log(log)
+            self._write_state()
+        return len(records)
+
+    def query(self, vector: Sequence[float], top_k: int, filter: Optional[Dict] = None) -> List[Dict]:
+        return self.query_many([vector], top_k, filter)[0]
+
+    def query_many(self, vectors: Sequence[Sequence[float]], top_k: int, filter: Optional[Dict] = None) -> List[List[Dict]]:
+        """Score every query against the candidate rows in one matrix product"""
+        query_matrix = self._normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension))
+        with self._lock:
+            rows = self._candidate_rows(filter)
+            if rows is None:
+                rows = np.flatnonzero(self._live[:len(self._ids)])
+            if not len(rows) or top_k <= 0:
+                return [[] for _ in range(len(query_matrix))]
+
+            return [
+                [
+                    {"id": self._ids[rows[i]], "score": float(score), "metadata": self._result_metadata(rows[i])}
+                    for i, score in zip(positions, scores)
+                ]
+                for positions, scores in self._top_k(rows, query_matrix, min(top_k, len(rows)))
+            ]
+
+    def fetch(self, ids: Sequence[str]) -> Dict[str, Dict]:
+        with self._lock:
+            rows = {vector_id: self._rows.get(vector_id) for vector_id in ids}
+            return {vector_id: self._result_metadata(row) for vector_id, row in rows.items() if row is not None}
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            log = []
+            for vector_id in ids:
+                row = self._rows.get(vector_id)
+                if row is not None:
+                    self._clear_row(row)
+                    heapq.heappush(self._free_rows, row)
+                    log.append({"op": "delete", "row": row, "id": vector_id})
+            if log:
+                self._append_log(log)
+
+    def __len__(self) -> int:
+        return len(self._rows)
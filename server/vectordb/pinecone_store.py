@@ -0,0 +1,65 @@
+import time
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence
+from pinecone import Pinecone, ServerlessSpec
+from .base import VectorStore, VectorRecord
+
+logger = logging.getLogger(__name__)
+
+# Pinecone rejects fetch and delete requests naming more than 1000 ids
+PINECONE_ID_BATCH = 1000
+
+
+class PineconeVectorStore(VectorStore):
+    """Pinecone serverless index, created on first use if it does not exist"""
+
+    supports_filter = True
+
+    def __init__(self, api_key: str, index_name: str, dimension: int):
+        if not api_key or not index_name:
+            raise RuntimeError("PINECONE_API_KEY and PINECONE_INDEX_NAME are required for the Pinecone backend")
+
+        pc = Pinecone(api_key=api_key)
+
+        # Check if index exists, create if not
+        existing_indexes = [idx.name for idx in pc.list_indexes()]
+        if index_name not in existing_indexes:
+            pc.create_index(
+                name=index_name,
+                dimension=dimension,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region="us-east-1")
+            )
+            logger.info("Created new index: %s", index_name)
+            # Wait for index to be ready
+            while not pc.describe_index(index_name).status.ready:
+                time.sleep(1)
+
+        self.index = pc.Index(index_name)
+
+    def upsert(self, vectors: Iterable[VectorRecord]) -> int:
+        vectors = list(vectors)
+        if vectors:
+            self.index.upsert(vectors=vectors)
+        return len(vectors)
+
+    def query(self, vector: Sequence[float], top_k: int, filter: Optional[Dict] = None) -> List[Dict]:
+        kwargs = {"filter": filter} if filter else {}
+        results = self.index.query(vector=list(vector), top_k=top_k, include_metadata=True, **kwargs)
+        return [
+            {"id": match["id"], "score": match["score"], "metadata": match["metadata"]}
+            for match in results["matches"]
+        ]
+
+    def fetch(self, ids: Sequence[str]) -> Dict[str, Dict]:
+        ids = list(ids)
+        found = {}
+        for start in range(0, len(ids), PINECONE_ID_BATCH):
+            response = self.index.fetch(ids=ids[start:start + PINECONE_ID_BATCH])
+            found.update({vector_id: vector["metadata"] for vector_id, vector in response["vectors"].items()})
+        return found
+
+    def delete(self, ids: Iterable[str]) -> None:
+        ids = list(ids)
+        for start in range(0, len(ids), PINECONE_ID_BATCH):
+            self.index.delete(ids=ids[start:start + PINECONE_ID_BATCH])
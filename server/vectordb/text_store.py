@@ -0,0 +1,150 @@
+import os
+import zlib
+import hashlib
+import logging
+import threading
+from array import array
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TextStore:
+    """Append-only, content-addressed store of zlib-compressed chunk text.
+
+    Layout under `path`:
+      texts.bin   concatenated compressed blobs
+      texts.idx   one "<digest> <offset> <length>" line per blob; the line number is the text id
+
+    Identical texts are stored once, so re-ingesting a document only appends
+    chunks whose text changed. In memory each text costs two array slots; the
+    digest -> id map used for deduplication is only built on the first write.
+    Reads use pread and are safe from any thread.
+    """
+
+    def __init__(self, path: str, level: int = 6):
+        self.path = path
+        self.level = level
+        self._lock = threading.Lock()
+        self._offsets = array("q")
+        self._lengths = array("l")
+        self._ids: Optional[Dict[bytes, int]] = None
+        os.makedirs(path, exist_ok=True)
+        self._data_path = os.path.join(path, "texts.bin")
+        self._index_path = os.path.join(path, "texts.idx")
+
+        self._data = open(self._data_path, "a+b")
+        self._size = 0
+        if os.path.exists(self._index_path):
+            self._recover()
+        else:
+            self._data.truncate(0)
+
+    def _recover(self):
+        """Load the index, cutting both files back to the last complete record.
+
+        A crash can leave a torn last index line (which the next append would
+        run into, shifting every later id) or blobs with no index line at all.
+        """
+        data_size = os.fstat(self._data.fileno()).st_size
+        valid_bytes = 0
+        with open(self._index_path, "rb") as f:
+            for line in f:
+                parts = line.split()
+                if not line.endswith(b"\n") or len(parts) != 3 or not (parts[1].isdigit() and parts[2].isdigit()):
+                    break
+                offset, length = int(parts[1]), int(parts[2])
+                if offset != self._size or offset + length > data_size:
+                    break
+                self._offsets.append(offset)
+                self._lengths.append(length)
+                self._size = offset + length
+                valid_bytes += len(line)
+        if valid_bytes < os.path.getsize(self._index_path):
+            logger.warning("Truncating torn text index %s to %d texts", self._index_path, len(self._offsets))
+            with open(self._index_path, "r+b") as f:
+                f.truncate(valid_bytes)
+        self._data.truncate(self._size)
+
+    @staticmethod
+    def digest(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _load_ids(self) -> Dict[bytes, int]:
+        if self._ids is None:
+            self._ids = {}
+            if os.path.exists(self._index_path):
+                with open(self._index_path) as f:
+                    for line in f:
+                        parts = line.split()
+                        if len(parts) == 3:
+                            self._ids[bytes.fromhex(parts[0])] = len(self._ids)
+        return self._ids
+
+    def put(self, text: str) -> int:
+        """Store text if new and return its id"""
+        digest = self.digest(text)
+        with self._lock:
+            ids = self._load_ids()
+            if digest in ids:
+                return ids[digest]
+            blob = zlib.compress(text.encode("utf-8"), self.level)
+            self._data.seek(0, os.SEEK_END)
+            self._data.write(blob)
+            self._data.flush()
+            with open(self._index_path, "a") as f:
+                f.write(f"{digest.hex()} {self._size} {len(blob)}\n")
+            text_id = len(self._offsets)
+            ids[digest] = text_id
+            self._offsets.append(self._size)
+            self._lengths.append(len(blob))
+            self._size += len(blob)
+        return text_id
+
+    def get(self, text_id: int) -> str:
+        offset, length = self._offsets[text_id], self._lengths[text_id]
+        return zlib.decompress(os.pread(self._data.fileno(), length, offset)).decode("utf-8")
+
+    def stats(self) -> dict:
+        return {"texts": len(self._offsets), "bytes": self._size}
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+
+class ExternalTextMixin:
+    """LocalVectorStore hooks that keep chunk text in a TextStore and metadata as interned tuples.
+
+    "text" is replaced by a "text_ref" id in the log, so replaying it on load
+    reads ids and short fields only; the text is read back for returned
+    results alone. Call `_open_text_store` before LocalVectorStore.__init__.
+    """
+
+    def _open_text_store(self, path: str):
+        self.texts = TextStore(os.path.join(path, "texts"))
+        # One shared object per distinct key tuple / string value (sources, roles, doc ids repeat per chunk)
+        self._interned = {}
+
+    def _stored_metadata(self, vector_id: str, metadata: Dict) -> Dict:
+        metadata = dict(metadata)
+        text = metadata.pop("text", None)
+        if text is not None:
+            metadata["text_ref"] = self.texts.put(text)
+        return metadata
+
+    def _intern(self, value):
+        return self._interned.setdefault(value, value) if isinstance(value, (str, tuple)) else value
+
+    def _pack_metadata(self, metadata: Dict):
+        # A (keys, *values) tuple is about a third of the size of the equivalent dict
+        return (self._intern(tuple(metadata)),) + tuple(self._intern(value) for value in metadata.values())
+
+    def _unpack_metadata(self, packed) -> Dict:
+        return dict(zip(packed[0], packed[1:]))
+
+    def _result_metadata(self, row: int) -> Dict:
+        metadata = self._unpack_metadata(self._metadata[row])
+        ref = metadata.pop("text_ref", None)
+        if ref is not None:
+            metadata["text"] = self.texts.get(ref)
+        return metadata